@@ -0,0 +1,78 @@
+"""Measure how long importing the api module takes, using python -X importtime.
+
+Usage (from ViewComfy_API/Python):
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 10 --module viewcomfy.api
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+HEAVY_MODULES = ["httpx", "socketio", "engineio", "aiohttp"]
+
+SCENARIOS = {
+    "interpreter only": "pass",
+    "import": "import {module}",
+    "polling client": (
+        "import {module}; "
+        "{module}.ComfyAPIClient(infer_url='x', client_id='x', client_secret='x')._get_http_client()"
+    ),
+    "live-log client": (
+        "import {module}; {module}.ComfyAPIClient(infer_url='x', client_id='x', client_secret='x').sio"
+    ),
+}
+
+
+def measure(code: str, cwd: Path) -> tuple[float, set[str]]:
+    """Run code in a fresh interpreter and return (total import time in ms, heavy modules loaded)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total_us = 0
+    loaded = set()
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        total_us += int(self_us)
+        top_level = name.strip().split(".")[0]
+        if top_level in HEAVY_MODULES:
+            loaded.add(top_level)
+    return total_us / 1000, loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the import time of the api module")
+    parser.add_argument("--module", type=str, default="viewcomfy.api", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters per scenario")
+    args = parser.parse_args()
+
+    cwd = Path(__file__).resolve().parent.parent
+    print(f"{'scenario':<18}{'median ms':>12}{'min ms':>10}{'added ms':>10}  heavy modules loaded")
+    baseline = None
+    for name, template in SCENARIOS.items():
+        code = template.format(module=args.module)
+        timings = []
+        loaded: set[str] = set()
+        for _ in range(args.runs):
+            total_ms, loaded = measure(code, cwd)
+            timings.append(total_ms)
+        median = statistics.median(timings)
+        if baseline is None:
+            baseline = median
+        heavy = ", ".join(sorted(loaded)) or "-"
+        print(f"{name:<18}{median:>12.1f}{min(timings):>10.1f}{median - baseline:>10.1f}  {heavy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Compare the peak memory of parsing an infer_info response in full and record by record.
+
+Builds a response like the API's, where every record carries its workflow, and
+parses it with _json.loads (what _infer_info used to do) and with the
+ArrayRecordParser used by iter_infer_info, fed in network-sized chunks.
+
+Usage (from ViewComfy_API/Python):
+
+    python benchmarks/infer_info_memory.py --prompts 100 1000 3000
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from viewcomfy import _json
+from viewcomfy.api import _INFER_INFO_DROPPED_KEYS, _prompt_result_from_record
+
+DEFAULT_WORKFLOW = (
+    Path(__file__).resolve().parents[3] / "workflows" / "flux-consistent-characters" / "python" / "workflow_api.json"
+)
+CHUNK_BYTES = 64 * 1024
+
+
+def make_body(workflow_api: dict, prompts: int) -> bytes:
+    records = [
+        {
+            "promptId": f"prompt-{index}",
+            "status": "success",
+            "completed": True,
+            "executionTimeSeconds": 12.5,
+            "prompt": {"6-inputs-text": f"prompt {index}"},
+            "outputs": [{"filename": f"output_{index}.png", "contentType": "image/png", "size": 1024}],
+            "createdAt": "2025-01-01T00:00:00Z",
+            "workflow": workflow_api,
+            "clientId": "client",
+            "user": {"id": "user", "email": "user@example.com"},
+        }
+        for index in range(prompts)
+    ]
+    return json.dumps(records).encode()
+
+
+def parse_full(body: bytes) -> int:
+    count = 0
+    for record in _json.loads(body):
+        _prompt_result_from_record(record)
+        count += 1
+    return count
+
+
+def parse_streaming(body: bytes) -> int:
+    parser = _json.ArrayRecordParser(drop_keys=_INFER_INFO_DROPPED_KEYS)
+    count = 0
+    for start in range(0, len(body), CHUNK_BYTES):
+        for record in parser.feed(body[start : start + CHUNK_BYTES]):
+            _prompt_result_from_record(record)
+            count += 1
+    parser.close()
+    return count
+
+
+def measure(parse, body: bytes) -> tuple[float, float]:
+    """Return (peak MiB allocated while parsing, seconds). Timed without tracemalloc, which slows parsing down."""
+    started = time.perf_counter()
+    parse(body)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    parse(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark infer_info response parsing")
+    parser.add_argument("--prompts", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--workflow", type=Path, default=DEFAULT_WORKFLOW, help="A workflow_api.json")
+    args = parser.parse_args()
+
+    with open(args.workflow) as f:
+        workflow_api = json.load(f)
+
+    print(f"{'prompts':>8}{'body MiB':>10}{'full peak MiB':>15}{'full s':>8}{'stream peak MiB':>17}{'stream s':>10}")
+    for prompts in args.prompts:
+        body = make_body(workflow_api, prompts)
+        full_peak, full_seconds = measure(parse_full, body)
+        stream_peak, stream_seconds = measure(parse_streaming, body)
+        print(
+            f"{prompts:>8}{len(body) / 1024 / 1024:>10.1f}{full_peak:>15.1f}{full_seconds:>8.2f}"
+            f"{stream_peak:>17.2f}{stream_seconds:>10.2f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
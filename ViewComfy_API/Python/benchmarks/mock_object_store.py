@@ -0,0 +1,229 @@
+"""Local stand-in for an S3-compatible object store such as MinIO, used to test S3Sink.
+
+It serves path-style requests (/<bucket>/<key>) for PutObject, GetObject and the
+multipart upload calls (create, upload part, complete, abort), checks their
+SigV4 signature, and keeps the objects in memory. The signature is recomputed from
+the request as received, independently of viewcomfy.sinks.sign_v4, which it tests. It also serves files for the
+outputs' S3 filepaths under /files/<name>, of a configurable size.
+
+Requires aiohttp (pip install aiohttp). Run it standalone with:
+
+    python benchmarks/mock_object_store.py --port 9000
+
+and point the sink at it with S3Sink(endpoint_url="http://127.0.0.1:9000", ...).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import uuid
+from collections.abc import Mapping
+from urllib.parse import quote, unquote
+
+from aiohttp import web
+
+ACCESS_KEY = "minioadmin"
+SECRET_KEY = "minioadmin"
+FILE_CHUNK_BYTES = 64 * 1024
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+
+def _uri_encode(value: str) -> str:
+    return quote(value, safe="-_.~")
+
+
+def canonical_query(raw_query: str) -> str:
+    """Canonical query string of a raw query string, as an S3 server builds it."""
+    pairs = []
+    for item in raw_query.split("&"):
+        if item:
+            key, _, value = item.partition("=")
+            pairs.append((_uri_encode(unquote(key)), _uri_encode(unquote(value))))
+    return "&".join(f"{key}={value}" for key, value in sorted(pairs))
+
+
+def aws_v4_signature(
+    *,
+    secret_key: str,
+    region: str,
+    method: str,
+    raw_path: str,
+    raw_query: str,
+    headers: Mapping[str, str],
+    signed_headers: list[str],
+    payload_hash: str,
+    amz_date: str,
+) -> str:
+    """Signature Version 4 of a request to the s3 service.
+
+    Args:
+        headers (Mapping): Headers of the request as received, looked up by lowercase name
+        signed_headers (list[str]): Names listed in the SignedHeaders of the request
+
+    """
+    canonical_headers = "".join(f"{name}:{' '.join(headers.get(name, '').split())}\n" for name in signed_headers)
+    canonical_request = "\n".join(
+        [method, raw_path, canonical_query(raw_query), canonical_headers, ";".join(signed_headers), payload_hash],
+    )
+    date = amz_date[:8]
+    string_to_sign = "\n".join(
+        [
+            "AWS4-HMAC-SHA256",
+            amz_date,
+            f"{date}/{region}/s3/aws4_request",
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ],
+    )
+    key = hmac.new(f"AWS4{secret_key}".encode(), date.encode(), hashlib.sha256).digest()
+    key = hmac.new(key, region.encode(), hashlib.sha256).digest()
+    key = hmac.new(key, b"s3", hashlib.sha256).digest()
+    key = hmac.new(key, b"aws4_request", hashlib.sha256).digest()
+    return hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+
+class MockObjectStore:
+    def __init__(self, *, access_key: str = ACCESS_KEY, secret_key: str = SECRET_KEY, region: str = "us-east-1") -> None:
+        """Initialize the mock object store.
+
+        Args:
+            access_key (str): Access key the requests must be signed with
+            secret_key (str): Secret key the requests must be signed with
+            region (str): Region the requests must be signed for
+
+        """
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        # (bucket, key) -> content
+        self.objects: dict[tuple[str, str], bytes] = {}
+        # upload id -> (bucket, key, {part number: content})
+        self.uploads: dict[str, tuple[str, str, dict[int, bytes]]] = {}
+        # name -> size of the files served under /files/
+        self.files: dict[str, int] = {}
+        self.requests: list[dict[str, object]] = []
+
+        self.app = web.Application(client_max_size=1024**3)
+        self.app.router.add_get("/files/{name}", self.handle_file)
+        self.app.router.add_route("*", "/{bucket}/{key:.+}", self.handle_object)
+        self._runner: web.AppRunner | None = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def add_file(self, name: str, size: int) -> str:
+        """Serve a file of size bytes under /files/<name> and return its path."""
+        self.files[name] = size
+        return f"/files/{name}"
+
+    @staticmethod
+    def file_content(name: str, size: int) -> bytes:
+        pattern = hashlib.sha256(name.encode()).digest()
+        return (pattern * (size // len(pattern) + 1))[:size]
+
+    async def handle_file(self, request: web.Request) -> web.StreamResponse:
+        name = request.match_info["name"]
+        if name not in self.files:
+            return web.Response(status=404)
+        content = self.file_content(name, self.files[name])
+        response = web.StreamResponse(headers={"content-length": str(len(content))})
+        await response.prepare(request)
+        for offset in range(0, len(content), FILE_CHUNK_BYTES):
+            await response.write(content[offset : offset + FILE_CHUNK_BYTES])
+        await response.write_eof()
+        return response
+
+    def check_signature(self, request: web.Request, body: bytes) -> bool:
+        authorization = request.headers.get("authorization", "")
+        if not authorization.startswith("AWS4-HMAC-SHA256 "):
+            return False
+        fields = dict(
+            item.strip().split("=", 1) for item in authorization.removeprefix("AWS4-HMAC-SHA256 ").split(",") if "=" in item
+        )
+        if not {"Credential", "SignedHeaders", "Signature"} <= fields.keys():
+            return False
+        amz_date = request.headers.get("x-amz-date", "")
+        if fields["Credential"] != f"{self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request":
+            return False
+        signed_headers = fields["SignedHeaders"].split(";")
+        if signed_headers != sorted(signed_headers):
+            return False
+        if not {"host", "x-amz-date", "x-amz-content-sha256"} <= set(signed_headers):
+            return False
+        payload_hash = request.headers.get("x-amz-content-sha256", "")
+        if payload_hash != UNSIGNED_PAYLOAD and payload_hash != hashlib.sha256(body).hexdigest():
+            return False
+        raw_path, _, raw_query = request.raw_path.partition("?")
+        expected = aws_v4_signature(
+            secret_key=self.secret_key,
+            region=self.region,
+            method=request.method,
+            raw_path=raw_path,
+            raw_query=raw_query,
+            headers=request.headers,
+            signed_headers=signed_headers,
+            payload_hash=payload_hash,
+            amz_date=amz_date,
+        )
+        return hmac.compare_digest(expected, fields["Signature"])
+
+    async def handle_object(self, request: web.Request) -> web.Response:
+        bucket, key = request.match_info["bucket"], request.match_info["key"]
+        body = await request.read()
+        self.requests.append({"method": request.method, "key": key, "query": dict(request.query), "bytes": len(body)})
+        if not self.check_signature(request, body):
+            return web.Response(status=403, text="<Error><Code>SignatureDoesNotMatch</Code></Error>")
+
+        query = request.query
+        if request.method == "POST" and "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            self.uploads[upload_id] = (bucket, key, {})
+            return web.Response(
+                text=f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>",
+                content_type="application/xml",
+            )
+        if request.method == "PUT" and "uploadId" in query:
+            if query["uploadId"] not in self.uploads:
+                return web.Response(status=404, text="<Error><Code>NoSuchUpload</Code></Error>")
+            self.uploads[query["uploadId"]][2][int(query["partNumber"])] = body
+            return web.Response(headers={"etag": f'"{hashlib.md5(body).hexdigest()}"'})
+        if request.method == "POST" and "uploadId" in query:
+            upload = self.uploads.pop(query["uploadId"], None)
+            if upload is None:
+                return web.Response(status=404, text="<Error><Code>NoSuchUpload</Code></Error>")
+            parts = upload[2]
+            self.objects[(bucket, key)] = b"".join(parts[number] for number in sorted(parts))
+            return web.Response(text="<CompleteMultipartUploadResult/>", content_type="application/xml")
+        if request.method == "DELETE" and "uploadId" in query:
+            self.uploads.pop(query["uploadId"], None)
+            return web.Response(status=204)
+        if request.method == "PUT":
+            self.objects[(bucket, key)] = body
+            return web.Response(headers={"etag": f'"{hashlib.md5(body).hexdigest()}"'})
+        if request.method == "GET":
+            if (bucket, key) not in self.objects:
+                return web.Response(status=404, text="<Error><Code>NoSuchKey</Code></Error>")
+            return web.Response(body=self.objects[(bucket, key)])
+        return web.Response(status=405)
+
+
+async def serve(args: argparse.Namespace) -> None:
+    store = MockObjectStore()
+    url = await store.start(port=args.port)
+    print(f"Mock object store listening on {url} (access key and secret key: {ACCESS_KEY})")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local S3-compatible mock object store")
+    parser.add_argument("--port", type=int, default=9000)
+    asyncio.run(serve(parser.parse_args()))
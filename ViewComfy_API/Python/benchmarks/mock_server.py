@@ -0,0 +1,287 @@
+"""Local stand-in for the ViewComfy API, used by the benchmarks.
+
+It implements the endpoints used by the viewcomfy client: infer (plain, socket.io
+and Server-Sent Events, gzip request bodies, override workflows in full or as a
+patch against a registered base), infer info and cancel. Jobs "run" for a configurable
+number of log messages and return a fake result.
+
+Requires aiohttp (pip install aiohttp). Run it standalone with:
+
+    python benchmarks/mock_server.py --port 8765
+
+and point the client at it with ComfyAPIClient(..., api_url="http://127.0.0.1:8765").
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+import socketio
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from viewcomfy.workflow_delta import apply_patch, workflow_hash
+
+
+class MockViewComfyServer:
+    def __init__(
+        self,
+        *,
+        log_messages: int = 5,
+        log_interval: float = 0.01,
+        sse: bool = True,
+        drop_after: int | None = None,
+        capacity: int | None = None,
+        max_queue: int | None = None,
+        output_bytes: int = 0,
+        deployments: dict[str, dict[str, Any]] | None = None,
+    ) -> None:
+        """Initialize the mock server.
+
+        Args:
+            log_messages (int): Number of infer_log_message events sent per job
+            log_interval (float): Seconds between two log messages
+            sse (bool): Whether to answer "Accept: text/event-stream" with an event stream
+            drop_after (int, optional): Disconnect the socket.io client of a job after this
+                many log messages, to exercise reconnection
+            capacity (int, optional): Number of jobs that run at the same time, like GPU
+                workers. Other jobs wait in a queue before their first log message.
+            max_queue (int, optional): Answer 503 when this many jobs are already queued
+            output_bytes (int): Size of an output inlined in each successful result, none when 0
+            deployments (dict, optional): Settings of individual view_comfy_api_urls, to emulate
+                several deployments: "log_interval", "capacity", and "unavailable" to answer 503
+
+        """
+        self.log_messages = log_messages
+        self.log_interval = log_interval
+        self.sse = sse
+        self.drop_after = drop_after
+        self.max_queue = max_queue
+        self.output_bytes = output_bytes
+        self._workers = asyncio.Semaphore(capacity) if capacity is not None else None
+        self.deployments = deployments or {}
+        self._deployment_workers = {
+            url: asyncio.Semaphore(settings["capacity"])
+            for url, settings in self.deployments.items()
+            if settings.get("capacity") is not None
+        }
+        self.queued = 0
+        self.jobs: dict[str, dict[str, Any]] = {}
+        self.base_workflows: dict[str, dict[str, Any]] = {}
+        self.requests: list[dict[str, Any]] = []
+
+        self.sio = socketio.AsyncServer(async_mode="aiohttp")
+        self.app = web.Application(client_max_size=1024**3)
+        self.sio.attach(self.app)
+        self.sio.on("infer_join_room", self.handle_join_room)
+        self.app.router.add_post("/api/workflow/infer", self.handle_infer)
+        self.app.router.add_post("/api/workflow/infer/cancel", self.handle_cancel)
+        self.app.router.add_post("/api/workflow/base", self.handle_register_base)
+        self.app.router.add_get("/api/workflow/infer/", self.handle_infer_info)
+        self._runner: web.AppRunner | None = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the base URL."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def read_infer_form(self, request: web.Request) -> dict[str, Any]:
+        form = await request.post()
+        fields = {key: value for key, value in form.items() if isinstance(value, str)}
+        upload_bytes = sum(len(value.file.read()) for value in form.values() if not isinstance(value, str))
+        self.requests.append(
+            {
+                "path": request.path,
+                "body_bytes": request.content_length or 0,
+                "content_encoding": request.headers.get("content-encoding"),
+                "upload_bytes": upload_bytes,
+                "fields": fields,
+            },
+        )
+        return fields
+
+    def resolve_workflow(self, fields: dict[str, Any]) -> dict[str, Any] | None:
+        """Return the override workflow of a job, applying its patch to the base if any."""
+        if fields.get("workflow_api_base"):
+            base = self.base_workflows[fields["workflow_api_base"]]
+            return apply_patch(base, json.loads(fields["workflow_api_patch"]))
+        if fields.get("workflow_api"):
+            return json.loads(fields["workflow_api"])
+        return None
+
+    async def handle_register_base(self, request: web.Request) -> web.Response:
+        workflow_api = (await request.json())["workflow_api"]
+        base_hash = workflow_hash(workflow_api)
+        self.base_workflows[base_hash] = workflow_api
+        return web.json_response({"hash": base_hash}, status=201)
+
+    async def handle_infer(self, request: web.Request) -> web.StreamResponse:
+        fields = await self.read_infer_form(request)
+        if fields.get("workflow_api_base") and fields["workflow_api_base"] not in self.base_workflows:
+            return web.json_response({"message": "Unknown base workflow"}, status=412)
+        self.requests[-1]["workflow_api"] = self.resolve_workflow(fields)
+        if self.max_queue is not None and self.queued >= self.max_queue:
+            return web.json_response({"message": "Too many queued jobs"}, status=503)
+        view_comfy_api_url = fields.get("view_comfy_api_url")
+        if self.deployments.get(view_comfy_api_url, {}).get("unavailable"):
+            return web.json_response({"message": "Deployment unavailable"}, status=503)
+        prompt_id = fields.get("prompt_id") or str(uuid.uuid4())
+        self.jobs[prompt_id] = {
+            "status": "running",
+            "created_at": time.time(),
+            "canceled": False,
+            "view_comfy_api_url": view_comfy_api_url,
+        }
+        scheduled = {"prompt_id": prompt_id, "message": "Prompt scheduled", "workflow": {}}
+
+        if self.sse and "text/event-stream" in request.headers.get("accept", ""):
+            response = web.StreamResponse(headers={"content-type": "text/event-stream"})
+            await response.prepare(request)
+
+            async def send(event: str, data: Any) -> None:
+                await response.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+
+            await self.run_job(prompt_id, send)
+            await response.write_eof()
+            return response
+
+        # Events go to the prompt's room so a reconnected client, or one whose job was
+        # submitted without a sid, can join it.
+        sid = fields.get("sid")
+        if sid:
+            await self.sio.enter_room(sid, prompt_id)
+
+        async def emit(event: str, data: Any) -> None:
+            await self.sio.emit(event, data, room=prompt_id)
+
+        asyncio.create_task(self.run_job(prompt_id, emit, sid=sid))
+        return web.json_response({"data": scheduled}, status=201)
+
+    async def handle_join_room(self, sid: str, data: dict[str, Any]) -> None:
+        await self.sio.enter_room(sid, data["prompt_id"])
+
+    async def run_job(self, prompt_id: str, send: Any, sid: str | None = None) -> None:
+        workers = self._deployment_workers.get(self.jobs[prompt_id]["view_comfy_api_url"], self._workers)
+        if workers is None:
+            await self.execute_job(prompt_id, send, sid)
+            return
+        self.queued += 1
+        try:
+            await workers.acquire()
+        finally:
+            self.queued -= 1
+        try:
+            await self.execute_job(prompt_id, send, sid)
+        finally:
+            workers.release()
+
+    async def execute_job(self, prompt_id: str, send: Any, sid: str | None) -> None:
+        job = self.jobs[prompt_id]
+        log_interval = self.deployments.get(job["view_comfy_api_url"], {}).get("log_interval", self.log_interval)
+        started = time.monotonic()
+        for step in range(self.log_messages):
+            if sid is not None and step == self.drop_after:
+                await self.sio.disconnect(sid)
+                sid = None
+            if job["canceled"]:
+                if send is not None:
+                    await send("infer_canceled_message", {"prompt_id": prompt_id})
+                return
+            if send is not None:
+                await send("infer_log_message", {"prompt_id": prompt_id, "step": step})
+            await asyncio.sleep(log_interval)
+
+        job["status"] = "success"
+        job["execution_time_seconds"] = time.monotonic() - started
+        if send is not None:
+            await send("infer_result_message", self.result(prompt_id))
+
+    def result(self, prompt_id: str) -> dict[str, Any]:
+        job = self.jobs[prompt_id]
+        return {
+            "prompt_id": prompt_id,
+            "status": job["status"],
+            "completed": job["status"] != "running",
+            "execution_time_seconds": job.get("execution_time_seconds", 0.0),
+            "prompt": {},
+            "outputs": self.outputs(prompt_id) if job["status"] == "success" else [],
+        }
+
+    def outputs(self, prompt_id: str) -> list[dict[str, Any]]:
+        if not self.output_bytes:
+            return []
+        data = (prompt_id.encode() * (self.output_bytes // len(prompt_id) + 1))[: self.output_bytes]
+        return [
+            {
+                "filename": f"{prompt_id}.png",
+                "content_type": "image/png",
+                "size": len(data),
+                "filepath": "",
+                "data": base64.b64encode(data).decode(),
+            },
+        ]
+
+    async def handle_cancel(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        job = self.jobs.get(data["prompt_id"])
+        if job is not None:
+            job["canceled"] = True
+            job["status"] = "canceled"
+        return web.json_response({"prompt_id": data["prompt_id"], "canceled": job is not None}, status=201)
+
+    async def handle_infer_info(self, request: web.Request) -> web.Response:
+        records = []
+        for prompt_id in request.query.getall("prompt_ids", []):
+            if prompt_id not in self.jobs:
+                continue
+            result = self.result(prompt_id)
+            records.append(
+                {
+                    "promptId": prompt_id,
+                    "status": result["status"],
+                    "completed": result["completed"],
+                    "executionTimeSeconds": result["execution_time_seconds"],
+                    "prompt": {},
+                    "outputs": result["outputs"],
+                    "createdAt": self.jobs[prompt_id]["created_at"],
+                    "workflow": {},
+                    "clientId": "mock",
+                    "user": {},
+                },
+            )
+        return web.json_response(records)
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = MockViewComfyServer(
+        log_messages=args.log_messages,
+        log_interval=args.log_interval,
+        sse=not args.no_sse,
+    )
+    url = await server.start(port=args.port)
+    print(f"Mock ViewComfy API listening on {url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the ViewComfy API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--log-messages", type=int, default=5)
+    parser.add_argument("--log-interval", type=float, default=0.01)
+    parser.add_argument("--no-sse", action="store_true", help="Ignore Accept: text/event-stream")
+    asyncio.run(serve(parser.parse_args()))
@@ -0,0 +1,123 @@
+"""Compare saving the outputs of a sweep as files with the content-addressed store.
+
+Each prompt returns --outputs inline outputs named like ComfyUI's (ComfyUI_00001.png,
+...). A fraction --duplicates of the prompts are reruns whose outputs are
+byte-identical to an earlier prompt's, as with fixed seeds and cached nodes.
+
+- flat: LocalFileSink with bare filenames, what main.py used to do, so prompts
+  overwrite each other's outputs
+- per prompt: LocalFileSink under <prompt_id>/, every output kept
+- store: ContentAddressedStore, every output kept and identical ones stored once
+
+Usage (from ViewComfy_API/Python):
+
+    python benchmarks/output_store.py --prompts 200 --outputs 4 --size-kb 512 --duplicates 0.5
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from viewcomfy.api import PromptResult, _import_httpx
+from viewcomfy.output_store import ContentAddressedStore
+from viewcomfy.sinks import LocalFileSink, OutputSink, transfer_outputs
+
+
+def sweep(prompts: int, outputs: int, size: int, duplicates: float, seed: int = 0) -> list[tuple[str, list[str]]]:
+    """Prompt ids and base64 outputs of the sweep, reruns repeating an earlier prompt's outputs."""
+    rng = random.Random(seed)
+    jobs: list[tuple[str, list[str]]] = []
+    for index in range(prompts):
+        if jobs and rng.random() < duplicates:
+            data = rng.choice(jobs)[1]
+        else:
+            data = [base64.b64encode(os.urandom(size)).decode() for _ in range(outputs)]
+        jobs.append((f"prompt-{index:05}", data))
+    return jobs
+
+
+def prompt_result(prompt_id: str, data: list[str]) -> PromptResult:
+    return PromptResult(
+        prompt_id=prompt_id,
+        status="success",
+        completed=True,
+        execution_time_seconds=0.0,
+        prompt={},
+        outputs=[
+            {
+                "filename": f"ComfyUI_{index + 1:05}_.png",
+                "content_type": "image/png",
+                "size": 0,
+                "filepath": "",
+                "data": encoded,
+            }
+            for index, encoded in enumerate(data)
+        ],
+    )
+
+
+def disk_usage(root: Path) -> tuple[int, int]:
+    """Files reachable under root and the bytes they use, counting hard links once."""
+    files = 0
+    inodes: dict[tuple[int, int], int] = {}
+    for path in root.rglob("*"):
+        if path.is_file() and not path.is_symlink() and not path.name.startswith("index.sqlite"):
+            files += 1
+            info = path.stat()
+            inodes[(info.st_dev, info.st_ino)] = info.st_size
+    return files, sum(inodes.values())
+
+
+async def save_all(jobs: list[tuple[str, list[str]]], sink: OutputSink, key_prefix: str | None) -> float:
+    httpx = _import_httpx()
+    async with httpx.AsyncClient() as client:
+        started = time.perf_counter()
+        for prompt_id, data in jobs:
+            await transfer_outputs(prompt_result(prompt_id, data), sink, http_client=client, key_prefix=key_prefix)
+        return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the content-addressed output store")
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--outputs", type=int, default=4, help="Outputs per prompt")
+    parser.add_argument("--size-kb", type=int, default=512, help="Size of each output")
+    parser.add_argument("--duplicates", type=float, default=0.5, help="Fraction of prompts that are reruns")
+    parser.add_argument("--max-mb", type=float, help="max_bytes of the store, to exercise eviction")
+    args = parser.parse_args()
+
+    jobs = sweep(args.prompts, args.outputs, args.size_kb * 1024, args.duplicates)
+    total = args.prompts * args.outputs
+    print(f"{args.prompts} prompts x {args.outputs} outputs of {args.size_kb} KiB, {args.duplicates:.0%} reruns")
+    print(f"{'layout':<12}{'seconds':>9}{'files kept':>12}{'of':>7}{'disk MiB':>10}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, key_prefix in (("flat", ""), ("per prompt", None)):
+            root = Path(directory) / name.replace(" ", "_")
+            seconds = asyncio.run(save_all(jobs, LocalFileSink(root), key_prefix))
+            files, used = disk_usage(root)
+            print(f"{name:<12}{seconds:>9.2f}{files:>12}{total:>7}{used / 2**20:>10.1f}")
+
+        root = Path(directory) / "store"
+        max_bytes = int(args.max_mb * 2**20) if args.max_mb else None
+        with ContentAddressedStore(root, max_bytes=max_bytes) as store:
+            seconds = asyncio.run(save_all(jobs, store, None))
+            stats = store.stats()
+        files, used = disk_usage(root / "outputs")
+        print(f"{'store':<12}{seconds:>9.2f}{files:>12}{total:>7}{used / 2**20:>10.1f}")
+        print(
+            f"store: {stats['blobs']} blobs, {stats['deduplicated_bytes'] / 2**20:.1f} MiB deduplicated, "
+            f"{stats['evicted_blobs']} blobs evicted",
+        )
+
+
+if __name__ == "__main__":
+    main()
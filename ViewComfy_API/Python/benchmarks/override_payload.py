@@ -0,0 +1,105 @@
+"""Measure the request size of override workflows: in full, gzipped, as a patch, or both.
+
+Sends a batch of near-identical overrides (only the seed and the prompt change)
+to the mock server and checks that it rebuilt every workflow.
+
+Usage (from ViewComfy_API/Python, requires aiohttp):
+
+    python benchmarks/override_payload.py --jobs 200
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_server import MockViewComfyServer
+
+from viewcomfy import ComfyAPIClient
+from viewcomfy.workflow_delta import WorkflowBaseRegistry
+
+DEFAULT_WORKFLOW = (
+    Path(__file__).resolve().parents[3] / "workflows" / "flux-consistent-characters" / "python" / "workflow_api.json"
+)
+
+
+def make_override(workflow_api: dict, index: int) -> dict:
+    override = copy.deepcopy(workflow_api)
+    for node in override.values():
+        inputs = node.get("inputs", {})
+        for key, value in inputs.items():
+            if "seed" in key and isinstance(value, int):
+                inputs[key] = index
+            elif key in ("text", "string") and isinstance(value, str):
+                inputs[key] = f"{value} (variation {index})"
+                break
+    return override
+
+
+async def run_mode(api_url: str, server: MockViewComfyServer, workflow_api: dict, jobs: int, mode: str) -> dict:
+    workflow_bases = None
+    if "delta" in mode:
+        workflow_bases = WorkflowBaseRegistry()
+        workflow_bases.register(workflow_api)
+
+    server.requests.clear()
+    overrides = [make_override(workflow_api, index) for index in range(jobs)]
+    async with ComfyAPIClient(
+        infer_url="mock",
+        client_id="mock",
+        client_secret="mock",
+        api_url=api_url,
+        workflow_bases=workflow_bases,
+        compress_requests="gzip" in mode,
+    ) as client:
+        started = time.perf_counter()
+        for override in overrides:
+            await client.infer(
+                params={},
+                view_comfy_api_url="mock",
+                override_workflow_api=override,
+            )
+        elapsed = time.perf_counter() - started
+
+    infer_requests = [request for request in server.requests if request["path"] == "/api/workflow/infer"]
+    for request, override in zip(infer_requests, overrides, strict=True):
+        if request["workflow_api"] != override:
+            msg = f"The mock server rebuilt a different workflow in mode {mode}"
+            raise Exception(msg)
+    total = sum(request["body_bytes"] for request in infer_requests)
+    return {"bytes_per_job": total / jobs, "total_bytes": total, "ms_per_job": elapsed / jobs * 1000}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark override workflow payloads")
+    parser.add_argument("--jobs", type=int, default=100)
+    parser.add_argument("--workflow", type=Path, default=DEFAULT_WORKFLOW, help="A workflow_api.json")
+    args = parser.parse_args()
+
+    with open(args.workflow) as f:
+        workflow_api = json.load(f)
+
+    server = MockViewComfyServer(log_messages=0)
+    api_url = await server.start()
+    try:
+        print(f"{'mode':<12}{'bytes/job':>12}{'total KiB':>12}{'ms/job':>9}")
+        full = None
+        for mode in ("full", "gzip", "delta", "delta+gzip"):
+            stats = await run_mode(api_url, server, workflow_api, args.jobs, mode)
+            full = full or stats["total_bytes"]
+            print(
+                f"{mode:<12}{stats['bytes_per_job']:>12.0f}{stats['total_bytes'] / 1024:>12.1f}"
+                f"{stats['ms_per_job']:>9.2f}  ({full / stats['total_bytes']:.1f}x smaller)",
+            )
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""Compare DeploymentRouter with round-robin over uneven deployments of the mock server.
+
+The mock emulates a fast deployment, a slow one and one that answers 503, each
+running two jobs at a time. Jobs are sent by concurrent workers with infer_with_logs.
+
+Usage (from ViewComfy_API/Python, requires aiohttp):
+
+    python benchmarks/routing.py --jobs 120 --workers 8
+"""
+
+import argparse
+import asyncio
+import collections
+import contextlib
+import io
+import itertools
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_server import MockViewComfyServer
+
+from viewcomfy import ComfyAPIClient
+from viewcomfy.routing import DeploymentRouter
+
+DEPLOYMENTS = {
+    "fast": {"log_interval": 0.02, "capacity": 2},
+    "slow": {"log_interval": 0.08, "capacity": 2},
+    "down": {"unavailable": True},
+}
+
+
+async def run_policy(api_url: str, policy: str, jobs: int, workers: int) -> dict[str, object]:
+    latencies = []
+    failures = 0
+    routed = collections.Counter()
+    async with ComfyAPIClient(infer_url="mock", client_id="mock", client_secret="mock", api_url=api_url) as client:
+        router = DeploymentRouter(client=client, view_comfy_api_urls=DEPLOYMENTS, parallelism=2, max_failures=2)
+        round_robin = itertools.cycle(DEPLOYMENTS)
+        remaining = iter(range(jobs))
+
+        async def worker() -> None:
+            nonlocal failures
+            for _ in remaining:
+                started = time.monotonic()
+                try:
+                    if policy == "router":
+                        await router.infer_with_logs(params={"3-inputs-seed": 1})
+                    else:
+                        url = next(round_robin)
+                        routed[url] += 1
+                        job_client = client._clone_for_job()
+                        await job_client.infer_with_logs(params={"3-inputs-seed": 1}, view_comfy_api_url=url)
+                except Exception:
+                    failures += 1
+                    continue
+                latencies.append(time.monotonic() - started)
+
+        started = time.monotonic()
+        # The workers share sys.stdout, so silence the progress output of all of them at once.
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(*(worker() for _ in range(workers)))
+        elapsed = time.monotonic() - started
+        if policy == "router":
+            routed.update({url: stats["completed"] for url, stats in router.stats().items()})
+
+    latencies.sort()
+    return {
+        "jobs_per_second": len(latencies) / elapsed,
+        "median_ms": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000 if latencies else float("nan"),
+        "failures": failures,
+        "routed": dict(routed),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark latency-aware routing across deployments")
+    parser.add_argument("--jobs", type=int, default=120)
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent jobs")
+    args = parser.parse_args()
+
+    server = MockViewComfyServer(log_messages=5, deployments=DEPLOYMENTS)
+    api_url = await server.start()
+    try:
+        print(f"{'policy':<12}{'jobs/s':>8}{'median ms':>11}{'p95 ms':>9}{'failed':>8}  jobs per deployment")
+        for policy in ("round-robin", "router"):
+            stats = await run_policy(api_url, policy, args.jobs, args.workers)
+            print(
+                f"{policy:<12}{stats['jobs_per_second']:>8.1f}{stats['median_ms']:>11.0f}{stats['p95_ms']:>9.0f}"
+                f"{stats['failures']:>8}  {stats['routed']}",
+            )
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
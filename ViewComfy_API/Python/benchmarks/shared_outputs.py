@@ -0,0 +1,113 @@
+"""Compare handing outputs to a process pool as pickled bytes and as shared memory handles.
+
+Each output is sent to a ProcessPoolExecutor worker that computes its CRC32, a
+cheap stand-in for post-processing, so the cost of the handoff dominates. The
+outputs are already in memory (bytes) or already downloaded into the store
+(handles) before the clock starts, as both are filled by the download.
+
+Usage (from ViewComfy_API/Python):
+
+    python benchmarks/shared_outputs.py --outputs 64 --size-mb 8 --workers 4
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from viewcomfy.api import PromptResult, _import_httpx
+from viewcomfy.shared_outputs import SharedOutputHandle, SharedOutputKindEnum, SharedOutputStore
+
+
+def checksum_bytes(data: bytes) -> int:
+    return zlib.crc32(data)
+
+
+def checksum_handle(handle: SharedOutputHandle) -> int:
+    with handle.attach() as attached:
+        return zlib.crc32(attached.view)
+
+
+def inline_result(outputs: list[bytes]) -> PromptResult:
+    return PromptResult(
+        prompt_id="benchmark",
+        status="success",
+        completed=True,
+        execution_time_seconds=0.0,
+        prompt={},
+        outputs=[
+            {
+                "filename": f"{index}.png",
+                "content_type": "image/png",
+                "size": len(data),
+                "filepath": "",
+                "data": base64.b64encode(data).decode(),
+            }
+            for index, data in enumerate(outputs)
+        ],
+    )
+
+
+async def fill_store(store: SharedOutputStore, prompt_result: PromptResult) -> list[SharedOutputHandle]:
+    httpx = _import_httpx()
+    async with httpx.AsyncClient() as client:
+        return await store.fetch(prompt_result, http_client=client)
+
+
+def measure(run) -> tuple[float, float]:
+    wall, cpu = time.perf_counter(), time.process_time()
+    run()
+    return time.perf_counter() - wall, time.process_time() - cpu
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark shared memory handoff against pickling bytes")
+    parser.add_argument("--outputs", type=int, default=64)
+    parser.add_argument("--size-mb", type=float, default=8.0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--directory", help="Folder of the mmap temp files, e.g. /dev/shm")
+    args = parser.parse_args()
+
+    size = int(args.size_mb * 1024 * 1024)
+    outputs = [os.urandom(size) for _ in range(args.outputs)]
+    expected = [zlib.crc32(data) for data in outputs]
+    prompt_result = inline_result(outputs)
+
+    print(f"{args.outputs} outputs of {args.size_mb:g} MB, {args.workers} workers")
+    print(f"{'handoff':<22}{'wall s':>9}{'parent CPU s':>14}{'MB/s':>9}")
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # Start the workers before measuring.
+        list(executor.map(checksum_bytes, [b""] * args.workers))
+
+        def pickled() -> None:
+            futures = [executor.submit(checksum_bytes, data) for data in outputs]
+            assert [future.result() for future in futures] == expected
+
+        results = {"pickled bytes": measure(pickled)}
+        for kind in SharedOutputKindEnum:
+            with SharedOutputStore(kind=kind, directory=args.directory) as store:
+                handles = asyncio.run(fill_store(store, prompt_result))
+
+                def shared() -> None:
+                    futures = [store.submit(executor, checksum_handle, handle) for handle in handles]
+                    assert [future.result() for future in futures] == expected
+
+                results[f"{kind.value} handles"] = measure(shared)
+                for handle in handles:
+                    store.release(handle)
+                assert store.stats()["outputs"] == 0
+
+    total_mb = args.outputs * size / 1024 / 1024
+    for name, (wall, cpu) in results.items():
+        print(f"{name:<22}{wall:>9.3f}{cpu:>14.3f}{total_mb / wall:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compare the latency and memory of the infer_with_logs transports against the mock server.
+
+Usage (from ViewComfy_API/Python, requires aiohttp):
+
+    python benchmarks/transport_latency.py --jobs 50
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_server import MockViewComfyServer
+
+from viewcomfy import ComfyAPIClient
+from viewcomfy.transports import TransportEnum
+
+
+async def run_transport(api_url: str, transport: TransportEnum, jobs: int) -> dict[str, float]:
+    latencies = []
+    first_logs = []
+    tracemalloc.start()
+    async with ComfyAPIClient(
+        infer_url="mock",
+        client_id="mock",
+        client_secret="mock",
+        transport=transport,
+        api_url=api_url,
+    ) as client:
+        for _ in range(jobs):
+            with contextlib.redirect_stdout(io.StringIO()):
+                await client.infer_with_logs(params={"3-inputs-seed": 1}, view_comfy_api_url="mock")
+            end = time.monotonic()
+            latencies.append(end - client.submitted_at)
+            if client.first_log_at is not None:
+                first_logs.append(client.first_log_at - client.submitted_at)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "median_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "first_log_ms": statistics.median(first_logs) * 1000 if first_logs else float("nan"),
+        "peak_kib": peak / 1024,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the infer_with_logs transports")
+    parser.add_argument("--jobs", type=int, default=30, help="Jobs per transport")
+    parser.add_argument("--log-messages", type=int, default=5)
+    parser.add_argument("--log-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    server = MockViewComfyServer(log_messages=args.log_messages, log_interval=args.log_interval)
+    api_url = await server.start()
+    try:
+        print(f"{'transport':<10}{'median ms':>12}{'p95 ms':>10}{'first log ms':>14}{'peak KiB':>11}")
+        for transport in (TransportEnum.SocketIO, TransportEnum.SSE):
+            stats = await run_transport(api_url, transport, args.jobs)
+            print(
+                f"{transport.value:<10}{stats['median_ms']:>12.1f}{stats['p95_ms']:>10.1f}"
+                f"{stats['first_log_ms']:>14.1f}{stats['peak_kib']:>11.0f}",
+            )
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+"""Time the UI to API workflow conversion on the repo's largest workflow, and on larger copies of it.
+
+The workflow is flux-consistent-characters/workflow.json, with its node schemas
+learned from the workflow_api.json next to it. Larger graphs are built by
+copying it side by side. Compared:
+
+- nested scans: a converter that looks links and nodes up by scanning their lists,
+  as a straightforward port of the editor's export would
+- indexed: viewcomfy.workflow_convert, JSON parsing and serialization included
+- cached: the same file converted again, from memory or from --cache-dir in a new process
+
+Usage (from ViewComfy_API/Python):
+
+    python benchmarks/workflow_convert.py --copies 1 4 16
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from viewcomfy.workflow_convert import (
+    MODE_BYPASSED,
+    MODE_MUTED,
+    REROUTE_TYPES,
+    VIRTUAL_TYPES,
+    NodeSchemas,
+    WorkflowConverter,
+    dump_api_workflow,
+)
+
+WORKFLOW_DIR = Path(__file__).resolve().parents[3] / "workflows" / "flux-consistent-characters" / "python"
+
+
+def replicate(ui_workflow: dict, copies: int) -> dict:
+    """Copies of the graph side by side, with node and link ids shifted."""
+    node_step = max(node["id"] for node in ui_workflow["nodes"]) + 1
+    link_step = max(link[0] for link in ui_workflow["links"]) + 1
+    nodes, links = [], []
+    for copy_index in range(copies):
+        node_shift, link_shift = copy_index * node_step, copy_index * link_step
+        for node in ui_workflow["nodes"]:
+            node = json.loads(json.dumps(node))
+            node["id"] += node_shift
+            for entry in node.get("inputs", []):
+                if entry.get("link") is not None:
+                    entry["link"] += link_shift
+            for entry in node.get("outputs", []):
+                entry["links"] = [link + link_shift for link in entry.get("links") or []]
+            nodes.append(node)
+        links.extend([link[0] + link_shift, link[1] + node_shift, link[2], link[3] + node_shift, link[4], link[5]] for link in ui_workflow["links"])
+    return {**ui_workflow, "nodes": nodes, "links": links}
+
+
+def convert_with_scans(ui_workflow: dict, schemas: NodeSchemas) -> dict:
+    nodes, links = ui_workflow["nodes"], ui_workflow["links"]
+
+    def find_node(node_id: int) -> dict:
+        return next(node for node in nodes if node["id"] == node_id)
+
+    def resolve(link_id: int) -> list | None:
+        while True:
+            link = next((link for link in links if link[0] == link_id), None)
+            if link is None:
+                return None
+            origin = find_node(link[1])
+            if origin["type"] in REROUTE_TYPES:
+                link_id = origin["inputs"][0]["link"]
+            elif origin["type"] == "PrimitiveNode":
+                return origin["widgets_values"][0]
+            else:
+                return [str(origin["id"]), link[2]]
+
+    prompt = {}
+    for node in sorted(nodes, key=lambda node: node["id"]):
+        if node["type"] in VIRTUAL_TYPES or node.get("mode") in (MODE_MUTED, MODE_BYPASSED):
+            continue
+        inputs = {}
+        for name, value in zip(schemas.widgets(node), node.get("widgets_values") or []):
+            if name is not None:
+                inputs[name] = value
+        for entry in node.get("inputs", []):
+            if entry.get("link") is not None:
+                name = entry["widget"]["name"] if entry.get("widget") else entry["name"]
+                source = resolve(entry["link"])
+                if source is not None:
+                    inputs[name] = source
+        prompt[str(node["id"])] = {
+            "inputs": inputs,
+            "class_type": node["type"],
+            "_meta": {"title": node.get("title") or schemas.display_name(node["type"])},
+        }
+    return prompt
+
+
+def best_ms(run, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the UI to API workflow converter")
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    ui_workflow = json.loads((WORKFLOW_DIR / "workflow.json").read_text())
+    schemas = NodeSchemas()
+    schemas.learn(ui_workflow, json.loads((WORKFLOW_DIR / "workflow_api.json").read_text()))
+
+    print(f"{'nodes':>6}{'links':>7}{'MB':>6}{'scans ms':>10}{'indexed ms':>12}{'cached ms':>11}{'disk cache ms':>15}")
+    for copies in args.copies:
+        workflow = replicate(ui_workflow, copies)
+        text = json.dumps(workflow, indent=2).encode()
+
+        def scans() -> str:
+            return dump_api_workflow(convert_with_scans(json.loads(text), schemas))
+
+        def indexed() -> str:
+            return WorkflowConverter(schemas).convert_text(text)
+
+        assert scans() == indexed()
+        converter = WorkflowConverter(schemas)
+        converter.convert_text(text)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            WorkflowConverter(schemas, cache_dir=cache_dir).convert_text(text)
+            disk_ms = best_ms(lambda: WorkflowConverter(schemas, cache_dir=cache_dir).convert_text(text), args.repeat)
+        print(
+            f"{len(workflow['nodes']):>6}{len(workflow['links']):>7}{len(text) / 1e6:>6.1f}"
+            f"{best_ms(scans, max(1, args.repeat // 2)):>10.1f}{best_ms(indexed, args.repeat):>12.1f}"
+            f"{best_ms(lambda: converter.convert_text(text), args.repeat):>11.2f}{disk_ms:>15.2f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,22 @@ import asyncio
 import json
 from pathlib import Path
 
-import aiofiles
 import httpx
-from api import infer, infer_cancel, infer_info, infer_with_logs, invite_user
+from viewcomfy import (
+    ComfyAPIClient,
+    ContentAddressedStore,
+    JobPriorityEnum,
+    JobScheduler,
+    OutputSink,
+    PromptResult,
+    infer,
+    infer_cancel,
+    infer_cancel_many,
+    infer_info,
+    infer_with_logs,
+    invite_user,
+    transfer_outputs,
+)
 
 view_comfy_api_url = "<Your_ViewComfy_endpoint>"
 client_id = "<Your_ViewComfy_client_id>"
@@ -46,17 +59,28 @@ async def api_realtime(params: dict) -> None:
         print(message)
         raise Exception(message)
 
-    for file in prompt_result.outputs:
+    await save_outputs(prompt_result)
+
+
+async def save_outputs(prompt_result: PromptResult, sink: OutputSink | None = None) -> None:
+    # Outputs are streamed from S3 (or from their inline base64) to the sink chunk by chunk.
+    # By default they are saved as output_store/outputs/<prompt_id>/<filename>, identical files being stored once.
+    # Use S3Sink(endpoint_url=..., bucket=..., access_key=..., secret_key=...) to copy them to your own bucket,
+    # where they are saved under their bare filename.
+    store = sink or ContentAddressedStore("output_store")
+    # The store keys outputs by <prompt_id>/<filename>, other sinks keep the layout they always had.
+    key_prefix = "" if sink is not None else None
+    async with httpx.AsyncClient() as client:
         try:
-            print(f"Downloading file from {file.filepath}")
-            async with httpx.AsyncClient() as client:
-                response = await client.get(file.filepath)
-                response.raise_for_status()
-                async with aiofiles.open(file.filename, "wb") as f:
-                    await f.write(response.content)
-            print(f"Successfully saved {file.filename}")
+            locations = await transfer_outputs(prompt_result, store, http_client=client, key_prefix=key_prefix)
         except Exception as e:
-            print(f"Error downloading {file.filename} from S3: {e!s}")
+            print(f"Error saving the outputs of {prompt_result.prompt_id}: {e!s}")
+            return
+        finally:
+            if sink is None:
+                await store.aclose()
+    for location in locations:
+        print(f"Successfully saved {location}")
 
 
 async def api_batch(params: dict) -> str:
@@ -119,17 +143,7 @@ async def get_results() -> None:
         if result.status != "success":
             print(f"{result.prompt_id} is still running")
             continue
-        for file in result.outputs:
-            try:
-                print(f"Downloading file from {file.filepath}")
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(file.filepath)
-                    response.raise_for_status()
-                    async with aiofiles.open(file.filename, "wb") as f:
-                        await f.write(response.content)
-                print(f"Successfully saved {file.filename}")
-            except Exception as e:
-                print(f"Error downloading {file.filename} from S3: {e!s}")
+        await save_outputs(result)
 
 
 async def cancel() -> None:
@@ -148,6 +162,21 @@ async def cancel() -> None:
         raise
 
 
+async def cancel_batch() -> None:
+    prompt_ids = ["<prompt_id>", "<another_prompt_id>"]
+    cancel_results = await infer_cancel_many(
+        view_comfy_api_url=view_comfy_api_url,
+        prompt_ids=prompt_ids,
+        client_id=client_id,
+        client_secret=client_secret,
+    )
+    for prompt_id, cancel_result in cancel_results.items():
+        if isinstance(cancel_result, Exception):
+            print(f"Unable to cancel {prompt_id}: {cancel_result}")
+        else:
+            print(f"{prompt_id}: {cancel_result}")
+
+
 async def api_with_realtime_logs():
     params = {}
 
@@ -178,6 +207,49 @@ async def api_in_batch():
     await main_tasks()
 
 
+async def api_scheduled_batch() -> None:
+    # Share one endpoint between a large bulk batch and interactive users.
+    # Interactive jobs always go first, bulk tenants share what is left.
+    async with ComfyAPIClient(
+        infer_url=view_comfy_api_url,
+        client_id=client_id,
+        client_secret=client_secret,
+    ) as client:
+        scheduler = JobScheduler(client=client, max_in_flight_per_url=4)
+
+        futures = []
+        for seed in range(10):
+            params = {"3-inputs-seed": seed}
+            futures.append(
+                scheduler.submit(
+                    params=params,
+                    view_comfy_api_url=view_comfy_api_url,
+                    priority=JobPriorityEnum.Bulk,
+                    tenant="overnight-batch",
+                ),
+            )
+
+        preview = scheduler.submit(
+            params={"6-inputs-text": "A cat sorcerer"},
+            view_comfy_api_url=view_comfy_api_url,
+            priority=JobPriorityEnum.Interactive,
+            tenant="preview",
+            deadline=30,
+        )
+        futures.append(preview)
+
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                print(f"Task failed with exception: {result}")
+            else:
+                print(result.prompt_id)
+
+        stats = scheduler.stats()
+        print(f"dispatched: {stats.dispatched}, expired: {stats.expired}")
+        print(f"wait time p95: {stats.wait_time_p95_seconds:.2f}s")
+
+
 async def api_invite_user() -> None:
     email: str = "<user_email>"
     team_id: int = 0
@@ -195,6 +267,9 @@ if __name__ == "__main__":
 # if __name__ == "__main__":
 #     asyncio.run(api_in_batch())
 
+# if __name__ == "__main__":
+#     asyncio.run(api_scheduled_batch())
+
 # if __name__ == "__main__":
 #     asyncio.run(api_invite_user())
 
@@ -203,3 +278,6 @@ if __name__ == "__main__":
 
 # if __name__ == "__main__":
 #     asyncio.run(cancel())
+
+# if __name__ == "__main__":
+#     asyncio.run(cancel_batch())
@@ -0,0 +1,57 @@
+import base64
+import json
+import os
+import time
+
+from viewcomfy import _json
+from viewcomfy.api import _INFER_INFO_DROPPED_KEYS
+
+
+def feed_all(parser: _json.ArrayRecordParser, body: bytes, chunk_bytes: int) -> list:
+    records = []
+    for start in range(0, len(body), chunk_bytes):
+        records += parser.feed(body[start : start + chunk_bytes])
+    parser.close()
+    return records
+
+
+def test_long_inline_output_is_parsed_in_linear_time() -> None:
+    # An 8 MB base64 output split into 4 KiB chunks: rescanning the string at every
+    # chunk would take minutes, a single pass takes a fraction of a second.
+    data = base64.b64encode(os.urandom(6 * 2**20)).decode()
+    body = json.dumps(
+        [
+            {
+                "promptId": "prompt-1",
+                "status": "success",
+                "outputs": [{"filename": "video.mp4", "data": data}],
+                "workflow": {"1": {"inputs": {"text": "x" * 2**20}}},
+            },
+        ],
+    ).encode()
+
+    started = time.perf_counter()
+    records = feed_all(_json.ArrayRecordParser(drop_keys=_INFER_INFO_DROPPED_KEYS), body, 4096)
+    elapsed = time.perf_counter() - started
+
+    assert records[0]["outputs"][0]["data"] == data
+    assert records[0]["workflow"] is None
+    assert elapsed < 5.0
+
+
+def test_strings_split_anywhere_match_a_full_parse() -> None:
+    records = [
+        {
+            "promptId": f"prompt-{index}",
+            "workflow": {"1": {"inputs": {"text": 'quote " backslash \\ colon : {[' * index}}},
+            "outputs": [{"filename": 'a\\"b.png', "data": "QUJD" * index}],
+            "created_at": "2025-01-01",
+            "key:": "value,",
+        }
+        for index in range(20)
+    ]
+    body = json.dumps(records).encode()
+    expected = [{**record, "workflow": None, "created_at": None} for record in records]
+    for chunk_bytes in (1, 2, 3, 7, 64):
+        parser = _json.ArrayRecordParser(drop_keys=_INFER_INFO_DROPPED_KEYS)
+        assert feed_all(parser, body, chunk_bytes) == expected
@@ -0,0 +1,79 @@
+"""Python client for the ViewComfy API.
+
+The public names below are imported on first access, so ``import viewcomfy``
+stays cheap and optional dependencies are only loaded when they are used.
+"""
+
+import importlib
+from typing import Any
+
+__version__ = "0.1.0"
+
+_EXPORTS = {
+    "API_URL": "viewcomfy.api",
+    "ComfyAPIClient": "viewcomfy.api",
+    "InferEmitEventEnum": "viewcomfy.api",
+    "PromptResult": "viewcomfy.api",
+    "PromptScheduled": "viewcomfy.api",
+    "S3FileOutput": "viewcomfy.api",
+    "infer": "viewcomfy.api",
+    "infer_cancel": "viewcomfy.api",
+    "infer_cancel_many": "viewcomfy.api",
+    "infer_info": "viewcomfy.api",
+    "infer_with_logs": "viewcomfy.api",
+    "invite_user": "viewcomfy.api",
+    "parse_parameters": "viewcomfy.api",
+    "BatchProgress": "viewcomfy.batch",
+    "BatchRunner": "viewcomfy.batch",
+    "AdaptiveConcurrencyLimiter": "viewcomfy.concurrency",
+    "ImagePreprocessor": "viewcomfy.image_preprocessing",
+    "InlineContent": "viewcomfy.inline_output",
+    "decode_inline_output": "viewcomfy.inline_output",
+    "ContentAddressedStore": "viewcomfy.output_store",
+    "StoredOutput": "viewcomfy.output_store",
+    "KeepWarmScheduler": "viewcomfy.keep_warm",
+    "ClientMetrics": "viewcomfy.metrics",
+    "DeploymentRouter": "viewcomfy.routing",
+    "ExecutionTimePredictor": "viewcomfy.predictor",
+    "ClientProfiler": "viewcomfy.profiling",
+    "CpuProfilerEnum": "viewcomfy.profiling",
+    "JobPriorityEnum": "viewcomfy.scheduler",
+    "JobScheduler": "viewcomfy.scheduler",
+    "SchedulerStats": "viewcomfy.scheduler",
+    "SharedOutputHandle": "viewcomfy.shared_outputs",
+    "SharedOutputKindEnum": "viewcomfy.shared_outputs",
+    "SharedOutputStore": "viewcomfy.shared_outputs",
+    "LocalFileSink": "viewcomfy.sinks",
+    "MemorySink": "viewcomfy.sinks",
+    "OutputSink": "viewcomfy.sinks",
+    "S3Sink": "viewcomfy.sinks",
+    "transfer_outputs": "viewcomfy.sinks",
+    "SyncComfyAPIClient": "viewcomfy.sync_client",
+    "TransportEnum": "viewcomfy.transports",
+    "ParamValidationError": "viewcomfy.validation",
+    "ParamsValidator": "viewcomfy.validation",
+    "SupportedWeights": "viewcomfy.weights",
+    "UnsupportedWeightsError": "viewcomfy.weights",
+    "WorkflowBaseRegistry": "viewcomfy.workflow_delta",
+    "UnknownWorkflowBaseError": "viewcomfy.workflow_delta",
+    "workflow_api_parameters_creator": "viewcomfy.workflow_api_parameter_creator",
+    "NodeSchemas": "viewcomfy.workflow_convert",
+    "WorkflowConverter": "viewcomfy.workflow_convert",
+    "convert_ui_workflow": "viewcomfy.workflow_convert",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        msg = f"module 'viewcomfy' has no attribute '{name}'"
+        raise AttributeError(msg)
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,180 @@
+"""JSON helpers that use orjson when the fast-json extra is installed."""
+
+import json
+import re
+from collections.abc import Iterable
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any) -> str:
+    """Serialize obj to a compact JSON string."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def loads(data: str | bytes | bytearray | memoryview) -> Any:
+    """Deserialize a JSON document from text or raw response bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+# A complete string, a structural character, or the opening quote of a string cut by the chunk end
+_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\],:]|"')
+# The rest of a string up to its closing quote, the end of the chunk, or a backslash ending the chunk
+_STRING_BODY = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*')
+# Everything up to the next bracket, complete strings included. Only brackets matter inside nested values.
+_NESTED_CONTENT = re.compile(rb'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+
+
+class ArrayRecordParser:
+    def __init__(self, *, drop_keys: Iterable[str] = ()) -> None:
+        """Parse a JSON array of objects incrementally, one record at a time.
+
+        Feed the response body in chunks of any size and get back the records that
+        were completed by each chunk. The top-level values of drop_keys are skipped
+        while scanning and replaced with null, so large fields are never buffered
+        nor decoded. Only one record is held in memory at a time, and every byte is
+        scanned once, however many chunks a string spans.
+
+        Args:
+            drop_keys (Iterable[str]): Top-level keys of the records whose values are skipped
+
+        """
+        self.drop_keys = {key.encode() for key in drop_keys}
+        self._max_key = max((len(key) for key in self.drop_keys), default=0)
+        # 0 before the array, 1 between records, 2 at the top level of a record, 3+ nested
+        self._depth = 0
+        self._done = False
+        self._in_record = False
+        self._skipping = False
+        self._record = bytearray()
+        # A string continues in the next chunk, and whether its last byte was an unescaped backslash
+        self._in_string = False
+        self._escaped = False
+        # Content of the last top-level string of the record, while it may still be a drop key
+        self._key: bytearray | None = None
+
+    def feed(self, chunk: bytes) -> list[Any]:
+        """Consume the next chunk of the body and return the records it completed."""
+        records = []
+        data = bytes(chunk)
+        n = len(data)
+        # Start of the bytes of data that still have to be copied to the current record
+        keep_from = 0 if self._in_record and not self._skipping else None
+        pos = self._scan_string(data, 0) if self._in_string else 0
+        while not self._in_string:
+            if self._depth > 2:
+                pos = _NESTED_CONTENT.match(data, pos).end()
+                if pos >= n:
+                    break
+                if data[pos] == 0x22:
+                    # The string continues in the next chunk.
+                    self._key = None
+                    pos = self._scan_string(data, pos + 1)
+                    continue
+                self._depth += 1 if data[pos] in b"{[" else -1
+                pos += 1
+                continue
+
+            match = _TOKEN.search(data, pos)
+            if match is None:
+                break
+            pos = match.end()
+            start = match.start()
+            char = data[start]
+            if char == 0x22:  # quote
+                collect = self._depth == 2 and not self._skipping
+                if pos == start + 1:
+                    # The string continues in the next chunk.
+                    self._key = bytearray() if collect else None
+                    pos = self._scan_string(data, pos)
+                elif collect and pos - start - 2 <= self._max_key:
+                    self._key = bytearray(data[start + 1 : pos - 1])
+                else:
+                    self._key = None
+            elif char == 0x3A:  # colon
+                key = self._key
+                if self._depth == 2 and not self._skipping and key is not None and bytes(key) in self.drop_keys:
+                    self._record += data[keep_from:pos]
+                    self._record += b"null"
+                    keep_from = None
+                    self._skipping = True
+                self._key = None
+            elif char == 0x2C:  # comma
+                if self._depth == 2 and self._skipping:
+                    self._skipping = False
+                    keep_from = start
+            elif char == 0x7B or char == 0x5B:  # { [
+                if self._depth == 2:
+                    self._depth = 3
+                elif self._depth == 1:
+                    if char != 0x7B:
+                        msg = "Expected an array of JSON objects"
+                        raise Exception(msg)
+                    self._depth = 2
+                    self._in_record = True
+                    keep_from = start
+                else:
+                    if char != 0x5B:
+                        msg = "Expected a JSON array"
+                        raise Exception(msg)
+                    self._depth = 1
+            elif self._depth == 2:  # } closing a record
+                if self._skipping:
+                    self._skipping = False
+                    keep_from = start
+                self._record += data[keep_from : start + 1]
+                records.append(loads(bytes(self._record)))
+                self._record.clear()
+                self._in_record = False
+                keep_from = None
+                self._depth = 1
+            elif self._depth == 1:  # ] closing the array
+                self._depth = 0
+                self._done = True
+
+        if keep_from is not None:
+            self._record += data[keep_from:n]
+        return records
+
+    def _scan_string(self, data: bytes, pos: int) -> int:
+        """Scan the string that continues at pos. Returns the position after its closing quote, or len(data)."""
+        n = len(data)
+        self._in_string = True
+        body_start = pos
+        if self._escaped:
+            if pos >= n:
+                return n
+            # The byte escaped by the backslash that ended the previous chunk
+            pos += 1
+            self._escaped = False
+        end = _STRING_BODY.match(data, pos).end()
+        if self._key is not None:
+            if len(self._key) + end - body_start <= self._max_key:
+                self._key += data[body_start:end]
+            else:
+                self._key = None
+        if end >= n:
+            return n
+        if data[end] == 0x5C:  # a backslash ending the chunk
+            if self._key is not None:
+                self._key += b"\\"
+            self._escaped = True
+            return n
+        self._in_string = False
+        return end + 1
+
+    def close(self) -> None:
+        """Check that the whole array was consumed."""
+        if not self._done:
+            msg = "The JSON array ended before its closing bracket"
+            raise Exception(msg)
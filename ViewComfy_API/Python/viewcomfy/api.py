@@ -0,0 +1,1411 @@
+import asyncio
+import contextlib
+import gzip
+import itertools
+import re
+import sys
+import time
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable
+from enum import Enum
+from io import BufferedReader
+from types import ModuleType
+from typing import TYPE_CHECKING, Any
+
+from viewcomfy import _json
+from viewcomfy.concurrency import OVERLOAD_STATUS_CODES
+from viewcomfy.inline_output import (
+    INLINE_OUTPUT_SPILL_THRESHOLD_BYTES,
+    InlineContent,
+    decode_inline_output,
+)
+from viewcomfy.transports import (
+    SocketIOTransport,
+    SSETransport,
+    TransportEnum,
+    TransportUnavailable,
+)
+from viewcomfy.profiling import active_profiler
+from viewcomfy.workflow_delta import UnknownWorkflowBaseError
+
+if TYPE_CHECKING:
+    import httpx
+    import socketio
+
+    from viewcomfy.concurrency import AdaptiveConcurrencyLimiter
+    from viewcomfy.image_preprocessing import ImagePreprocessor
+    from viewcomfy.keep_warm import KeepWarmScheduler
+    from viewcomfy.metrics import ClientMetrics
+    from viewcomfy.predictor import ExecutionTimePredictor
+    from viewcomfy.profiling import ClientProfiler
+    from viewcomfy.validation import ParamsValidator
+    from viewcomfy.weights import SupportedWeights
+    from viewcomfy.workflow_delta import WorkflowBaseRegistry
+
+API_URL = "https://api.viewcomfy.com"
+CANCEL_CONFIRM_TIMEOUT_SECONDS = 10.0
+CANCEL_MAX_CONCURRENCY = 8
+RESULT_POLL_INTERVAL_SECONDS = 2.0
+TERMINAL_STATUSES = {"success", "error", "failed", "canceled", "cancelled"}
+RECONNECT_ATTEMPTS = 5
+RECONNECT_BACKOFF_SECONDS = 0.5
+RECONNECT_BACKOFF_MAX_SECONDS = 8.0
+# Statuses of infer_info worth retrying while a job is polled
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Status of a patch submission whose base workflow the API does not have
+UNKNOWN_BASE_STATUS_CODE = 412
+# Fields of the infer_info records that PromptResult does not keep, and their keys in the response
+INFER_INFO_DROPPED_FIELDS = ("created_at", "workflow", "client_id", "user")
+_INFER_INFO_DROPPED_KEYS = (*INFER_INFO_DROPPED_FIELDS, "createdAt", "clientId")
+_SNAKE_CASE = re.compile("((?<=[a-z0-9])[A-Z]|(?!^)[A-Z](?=[a-z]))")
+# Whether each api_url answered with an event stream, shared by every client of the
+# process so the module-level functions, which build a client per call, probe once.
+_SSE_SUPPORT: dict[str, bool] = {}
+
+
+def _import_httpx() -> ModuleType:
+    """Import httpx on first use so importing this module stays cheap."""
+    import httpx
+
+    return httpx
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int, msg: str) -> None:
+        super().__init__(msg)
+        self.status_code = status_code
+
+
+def _is_transient(error: Exception) -> bool:
+    """Whether a failed API call may succeed when retried: a connection error or a retryable status."""
+    cause = error.__cause__ or error
+    if isinstance(cause, _StatusError):
+        return cause.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(cause, _import_httpx().HTTPError)
+
+
+def _import_socketio() -> ModuleType:
+    """Import socketio (and its engineio/aiohttp stack) only for live-log calls."""
+    import socketio
+
+    return socketio
+
+
+class S3FileOutput:
+    """Represents a file output with its content with an S3 bucket link or inlined as base64."""
+
+    def __init__(
+        self,
+        filename: str,
+        content_type: str,
+        size: int,
+        filepath: str,
+        data: str | None = None,
+        spill_threshold: int = INLINE_OUTPUT_SPILL_THRESHOLD_BYTES,
+    ) -> None:
+        """Initialize a FileOutput object.
+
+        Args:
+            filename (str): Name of the output file
+            content_type (str): MIME type of the file
+            filepath (str): the s3 path file content
+            size (int): Size of the file in bytes
+            data (str, optional): Base64 file content, when the output is inlined
+            spill_threshold (int): Decoded size above which inline content is kept
+                in a memory-mapped temp file instead of in memory
+
+        """
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.filepath = filepath
+
+        self.inline: InlineContent | None = None
+        if data:
+            self.inline = decode_inline_output(data, spill_threshold=spill_threshold)
+            self.size = self.inline.size
+
+    @property
+    def is_inline(self) -> bool:
+        return self.inline is not None
+
+
+class PromptResult:
+    def __init__(
+        self,
+        prompt_id: str,
+        status: str,
+        completed: bool,
+        execution_time_seconds: float,
+        prompt: dict,
+        outputs: list[dict[str, Any]],
+        error_data: str | None = None,
+    ) -> None:
+        """Initialize a PromptResult object.
+
+        Args:
+            prompt_id (str): Unique identifier for the prompt
+            status (str): Current status of the prompt execution
+            completed (bool): Whether the prompt execution is complete
+            execution_time_seconds (float): Time taken to execute the prompt
+            prompt (dict): The original prompt configuration
+            outputs (list[S3FileOutput], optional): List of output file data. Defaults to empty list.
+
+        """
+        self.prompt_id = prompt_id
+        self.status = status
+        self.completed = completed
+        self.execution_time_seconds = execution_time_seconds
+        self.prompt = prompt
+        self.error_data = error_data
+
+        self.outputs = []
+        if outputs:
+            for output_data in outputs:
+                self.outputs.append(
+                    S3FileOutput(
+                        filename=output_data.get("filename", ""),
+                        content_type=output_data.get("content_type", ""),
+                        size=output_data.get("size", 0),
+                        filepath=output_data.get("filepath", ""),
+                        # Pop the base64 string so it can be freed as soon as it is decoded.
+                        data=output_data.pop("data", None),
+                    ),
+                )
+
+
+class PromptScheduled:
+    def __init__(
+        self,
+        prompt_id: str,
+        message: str,
+        workflow: dict,
+    ) -> None:
+        """Initialize a PromptResult object.
+
+        Args:
+            prompt_id (str): Unique identifier for the prompt
+            status (str): Current status of the prompt execution
+            completed (bool): Whether the prompt execution is complete
+            execution_time_seconds (float): Time taken to execute the prompt
+            prompt (dict): The original prompt configuration
+            outputs (list[S3FileOutput], optional): List of output file data. Defaults to empty list.
+
+        """
+        self.prompt_id = prompt_id
+        self.message = message
+        self.workflow = workflow
+
+
+class InferEmitEventEnum(str, Enum):
+    LogMessage = "infer_log_message"
+    ErrorMessage = "infer_error_message"
+    ExecutedMessage = "infer_executed_message"
+    JoinRoom = "infer_join_room"
+    ResultMessage = "infer_result_message"
+    CanceledInference = "infer_canceled_message"
+
+
+class ComfyAPIClient:
+    def __init__(
+        self,
+        *,
+        infer_url: str | None = None,
+        client_id: str | None = None,
+        client_secret: str | None = None,
+        http_client: "httpx.AsyncClient | None" = None,
+        metrics: "ClientMetrics | None" = None,
+        transport: TransportEnum | str = TransportEnum.SocketIO,
+        api_url: str = API_URL,
+        validator: "ParamsValidator | None" = None,
+        supported_weights: "SupportedWeights | None" = None,
+        concurrency_limiter: "AdaptiveConcurrencyLimiter | None" = None,
+        image_preprocessor: "ImagePreprocessor | None" = None,
+        workflow_bases: "WorkflowBaseRegistry | None" = None,
+        compress_requests: bool = False,
+        execution_predictor: "ExecutionTimePredictor | None" = None,
+        profiler: "ClientProfiler | None" = None,
+    ) -> None:
+        """Initialize the ComfyAPI client with the server URL.
+
+        Args:
+            base_url (str): The base URL of the API server
+            http_client (httpx.AsyncClient, optional): Connection pool to share with
+                other clients. When omitted, the client creates its own pool on first
+                use and closes it in aclose().
+            metrics (ClientMetrics, optional): Records the count and duration of API requests
+            transport (TransportEnum): How infer_with_logs receives live events: "socketio"
+                (the default), "sse" for servers that stream them, or "auto" to try
+                Server-Sent Events first and fall back to socket.io
+            api_url (str): Base URL of the ViewComfy API
+            validator (ParamsValidator, optional): Checks params before each job is submitted,
+                raising ParamValidationError instead of uploading an invalid job
+            supported_weights (SupportedWeights, optional): Checks the weights referenced by
+                override_workflow_api, raising UnsupportedWeightsError before submission
+            concurrency_limiter (AdaptiveConcurrencyLimiter, optional): Adapts the number of
+                jobs in flight per endpoint to the queue latency observed by infer_with_logs.
+                infer only holds a slot while its submission request runs.
+            image_preprocessor (ImagePreprocessor, optional): Shrinks image params to the
+                resolution the workflow resizes them to before they are uploaded
+            workflow_bases (WorkflowBaseRegistry, optional): Base workflows that
+                override_workflow_api is sent as a JSON Patch against, when the patch is smaller
+            compress_requests (bool): Gzip the body of submissions that carry no files
+            execution_predictor (ExecutionTimePredictor, optional): Learns the execution
+                time of each workflow from the successful infer_with_logs jobs
+            profiler (ClientProfiler, optional): Times the phases of every job, defaults
+                to the ClientProfiler running when the client is created, if any
+
+        """
+        if infer_url is None:
+            raise Exception("infer_url is required")
+        self.infer_url = infer_url
+
+        if client_id is None:
+            raise Exception("client_id is required")
+
+        if client_secret is None:
+            raise Exception("client_secret is required")
+
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api_url = api_url
+        self.transport = TransportEnum(transport)
+        self._transport: SocketIOTransport | SSETransport | None = None
+        self._http_client = http_client
+        self._owns_http_client = http_client is None
+        self.metrics = metrics
+        self.validator = validator
+        self.supported_weights = supported_weights
+        self.concurrency_limiter = concurrency_limiter
+        self.image_preprocessor = image_preprocessor
+        self.workflow_bases = workflow_bases
+        self.compress_requests = compress_requests
+        self.execution_predictor = execution_predictor
+        self.profiler = profiler if profiler is not None else active_profiler()
+        # Set by KeepWarmScheduler to track the activity of each deployment
+        self.keep_warm: KeepWarmScheduler | None = None
+        self._sio: "socketio.AsyncClient | None" = None
+        self._events_done = asyncio.Event()
+        self.is_ws_connected = False
+        self.prompt_result: PromptResult | None = None
+        self.is_workflow_loading = True
+        self.is_canceled = False
+        # Set once the job sent its result, an error or its cancellation, so a
+        # dropped connection can be told apart from a finished job.
+        self.is_job_finished = False
+        # monotonic timestamps of the last infer_with_logs job
+        self.submitted_at: float | None = None
+        self.first_log_at: float | None = None
+        # Set while an infer_with_logs job keeps its state on this client
+        self._job_in_flight = False
+
+    @property
+    def is_ws_connected(self) -> bool:
+        """Whether the running job is still waiting for live events, on any transport."""
+        return self._is_ws_connected
+
+    @is_ws_connected.setter
+    def is_ws_connected(self, value: bool) -> None:
+        self._is_ws_connected = value
+        if value:
+            self._events_done.clear()
+        else:
+            self._events_done.set()
+
+    @property
+    def sio(self) -> "socketio.AsyncClient":
+        """The socket.io client, created on first use by infer_with_logs.
+
+        Calls that only use HTTP (infer, infer_info, cancel) never import socketio.
+        """
+        if self._sio is None:
+            self._sio = self._create_sio()
+        return self._sio
+
+    def _create_sio(self) -> "socketio.AsyncClient":
+        socketio = _import_socketio()
+        # Reconnection is handled by infer_with_logs, which also re-joins the prompt's room.
+        sio = socketio.AsyncClient(reconnection=False)
+
+        @sio.on(InferEmitEventEnum.LogMessage)  # pyright: ignore[reportOptionalCall]
+        async def log_message(data: dict[str, Any]) -> None:
+            await self._handle_event(InferEmitEventEnum.LogMessage, data)
+
+        @sio.on(InferEmitEventEnum.ErrorMessage)  # pyright: ignore[reportOptionalCall]
+        async def error_message(data: dict[str, Any]) -> None:
+            await self._handle_event(InferEmitEventEnum.ErrorMessage, data)
+
+        @sio.on(InferEmitEventEnum.ExecutedMessage)  # pyright: ignore[reportOptionalCall]
+        async def executed_message(data: dict[str, Any]) -> None:
+            await self._handle_event(InferEmitEventEnum.ExecutedMessage, data)
+
+        @sio.on(InferEmitEventEnum.ResultMessage)  # pyright: ignore[reportOptionalCall]
+        async def result_message(data: dict[str, Any]) -> None:
+            await self._handle_event(InferEmitEventEnum.ResultMessage, data)
+
+        @sio.on(InferEmitEventEnum.CanceledInference)  # pyright: ignore[reportOptionalCall]
+        async def canceled_message(data: dict[str, Any]) -> None:
+            await self._handle_event(InferEmitEventEnum.CanceledInference, data)
+
+        @sio.event
+        def disconnect(reason):
+            # if reason == sio.reason.CLIENT_DISCONNECT:
+            #     print('the client disconnected')
+            # elif reason == sio.reason.SERVER_DISCONNECT:
+            #     print('the server disconnected the client')
+            # else:
+            #     print('disconnect reason:', reason)
+            self.is_ws_connected = False
+
+        return sio
+
+    async def _handle_event(self, event: str, data: Any) -> None:
+        """Handle a live event of the running job, whichever transport delivered it."""
+        if event == InferEmitEventEnum.LogMessage:
+            if self.first_log_at is None:
+                self.first_log_at = time.monotonic()
+            self.is_workflow_loading = False
+            print(f"logs: {data}")
+        elif event == InferEmitEventEnum.ErrorMessage:
+            print(f"Error: {data}")
+            self.is_job_finished = True
+            self.is_ws_connected = False
+        elif event == InferEmitEventEnum.ExecutedMessage:
+            print(f"prompt executed: {data}")
+        elif event == InferEmitEventEnum.ResultMessage:
+            if data:
+                self.prompt_result = PromptResult(**data)
+            self.is_job_finished = True
+            self.is_ws_connected = False
+        elif event == InferEmitEventEnum.CanceledInference:
+            print(f"the workflow has been canceled: {data}")
+            self.is_canceled = True
+            self.is_job_finished = True
+            self.is_ws_connected = False
+
+    async def __aenter__(self) -> "ComfyAPIClient":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+    def _get_http_client(self) -> "httpx.AsyncClient":
+        """Return the pooled HTTP client, creating it on first use.
+
+        Reusing one client keeps the TCP/TLS connections to the API alive between
+        calls instead of paying for a new handshake on every request.
+        """
+        if self._http_client is None or self._http_client.is_closed:
+            # A phase of its own: the module-level functions build a pool, and its
+            # TLS context, on every call.
+            with self._phase("http_client"):
+                httpx = _import_httpx()
+                self._http_client = httpx.AsyncClient()
+            self._owns_http_client = True
+        return self._http_client
+
+    def _phase(self, name: str, prompt_id: str | list[str] | None = None) -> contextlib.AbstractContextManager:
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.phase(name, prompt_id)
+
+    def _record_request(self, operation: str, started: float, status: str | int) -> None:
+        if self.metrics is not None:
+            self.metrics.observe_request(
+                operation=operation,
+                status=status,
+                duration_seconds=time.monotonic() - started,
+            )
+
+    def _observe_status(self, view_comfy_api_url: str, status_code: int) -> None:
+        if self.concurrency_limiter is not None and status_code in OVERLOAD_STATUS_CODES:
+            self.concurrency_limiter.on_overload(view_comfy_api_url)
+
+    async def _send_request(
+        self,
+        request: "httpx.Request",
+        *,
+        operation: str,
+        stream: bool = False,
+    ) -> "httpx.Response":
+        httpx = _import_httpx()
+        client = self._get_http_client()
+        started = time.monotonic()
+        try:
+            response = await client.send(request, stream=stream, follow_redirects=True)
+        except httpx.HTTPError as e:
+            self._record_request(operation, started, "error")
+            msg = f"Connection error: {e!s}"
+            raise Exception(msg) from e
+        self._record_request(operation, started, response.status_code)
+        return response
+
+    def _build_infer_request(
+        self,
+        *,
+        data: dict[str, Any],
+        files: list,
+        headers: dict[str, str],
+    ) -> "httpx.Request":
+        client = self._get_http_client()
+        request = client.build_request(
+            "POST",
+            f"{self.api_url}/api/workflow/infer",
+            data=data,
+            files=files,
+            headers=headers,
+            timeout=2400.0,
+        )
+        if not self.compress_requests or files:
+            # Uploaded images are already compressed, and reading them here would buffer them.
+            return request
+
+        body = request.read()
+        compressed = gzip.compress(body, compresslevel=6)
+        if len(compressed) >= len(body):
+            return request
+        return client.build_request(
+            "POST",
+            request.url,
+            content=compressed,
+            headers={
+                **headers,
+                "content-type": request.headers["content-type"],
+                "content-encoding": "gzip",
+            },
+            timeout=2400.0,
+        )
+
+    async def _workflow_fields(self, override_workflow_api: dict[str, Any] | None) -> dict[str, str | None]:
+        """Form fields carrying override_workflow_api, as a patch against a base when possible."""
+        if not override_workflow_api:
+            return {"workflow_api": None}
+
+        workflow_api_param = _json.dumps(override_workflow_api)
+        if self.workflow_bases is None or self.workflow_bases.supported is False:
+            return {"workflow_api": workflow_api_param}
+
+        closest = self.workflow_bases.closest_patch(override_workflow_api)
+        if closest is None:
+            return {"workflow_api": workflow_api_param}
+        base_hash, patch = closest
+        patch_param = _json.dumps(patch)
+        if len(patch_param) >= len(workflow_api_param) or not await self._register_base(base_hash):
+            return {"workflow_api": workflow_api_param}
+        return {
+            "workflow_api": None,
+            "workflow_api_base": base_hash,
+            "workflow_api_patch": patch_param,
+        }
+
+    async def _register_base(self, base_hash: str) -> bool:
+        """Upload a base workflow once. Returns whether the API has it."""
+        registry = self.workflow_bases
+        async with registry.lock:
+            if base_hash in registry.registered:
+                return True
+            if registry.supported is False:
+                return False
+
+            client = self._get_http_client()
+            request = client.build_request(
+                "POST",
+                f"{self.api_url}/api/workflow/base",
+                content=_json.dumps({"workflow_api": registry.bases[base_hash]}),
+                headers={
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "content-type": "application/json",
+                },
+            )
+            try:
+                response = await self._send_request(request, operation="register_base")
+            except Exception as e:
+                # The job can still run with the override workflow in full.
+                print(f"Base workflow registration failed, sending the override workflow in full: {e!s}")
+                return False
+            if response.status_code in (404, 405):
+                print("The API does not accept base workflows, sending override workflows in full")
+                registry.supported = False
+                return False
+            if response.status_code not in (200, 201):
+                print(
+                    f"Base workflow registration failed with status {response.status_code}, "
+                    f"sending the override workflow in full: {response.text}",
+                )
+                return False
+            registry.supported = True
+            registry.registered.add(base_hash)
+            return True
+
+    def _check_workflow_base(self, data: dict[str, Any], status_code: int) -> None:
+        """Raise UnknownWorkflowBaseError if a patch submission was rejected for its base."""
+        if status_code == UNKNOWN_BASE_STATUS_CODE and data.get("workflow_api_base"):
+            raise UnknownWorkflowBaseError(data["workflow_api_base"])
+
+    async def _submit_with_base_retry(
+        self,
+        submit: Callable[[], Awaitable[Any]],
+        *,
+        data: dict[str, Any],
+        files: list,
+        override_workflow_api: dict[str, Any] | None,
+    ) -> Any:
+        """Run submit(), and once more if the API no longer has the base of the patch.
+
+        The base is registered again, e.g. after the API restarted, and the override
+        workflow is sent in full instead of the patch if that fails.
+        """
+        try:
+            return await submit()
+        except UnknownWorkflowBaseError as e:
+            print(f"{e!s}, registering it again")
+            self.workflow_bases.registered.discard(e.base_hash)
+            if not await self._register_base(e.base_hash):
+                data.pop("workflow_api_base", None)
+                data.pop("workflow_api_patch", None)
+                data["workflow_api"] = _json.dumps(override_workflow_api)
+            for _, file in files:
+                file.seek(0)
+            return await submit()
+
+    async def _post_infer(
+        self,
+        *,
+        data: dict[str, Any],
+        files: list,
+        auth: dict[str, str],
+        operation: str,
+    ) -> dict | None:
+        request = self._build_infer_request(data=data, files=files, headers=auth)
+        try:
+            response = await self._send_request(request, operation=operation)
+            self._observe_status(data["view_comfy_api_url"], response.status_code)
+            self._check_workflow_base(data, response.status_code)
+            if response.status_code == 201:
+                response_json = _json.loads(response.content)
+            else:
+                error_text = response.text
+                err_msg = f"API request failed with status {response.status_code}: {error_text}"
+                raise Exception(err_msg)
+        except UnknownWorkflowBaseError:
+            raise
+        except Exception as e:
+            msg = f"Error during API call: {e!s}"
+            raise Exception(msg) from e
+
+        return response_json.get("data", None)
+
+    def _clone_for_job(self) -> "ComfyAPIClient":
+        """Return a client for one infer_with_logs job that shares this client's HTTP pool.
+
+        infer_with_logs keeps per-job state on the client, so concurrent live jobs
+        each need their own client.
+        """
+        client = ComfyAPIClient(
+            infer_url=self.infer_url,
+            client_id=self.client_id,
+            client_secret=self.client_secret,
+            http_client=self._get_http_client(),
+            metrics=self.metrics,
+            transport=self.transport,
+            api_url=self.api_url,
+            validator=self.validator,
+            supported_weights=self.supported_weights,
+            concurrency_limiter=self.concurrency_limiter,
+            image_preprocessor=self.image_preprocessor,
+            workflow_bases=self.workflow_bases,
+            compress_requests=self.compress_requests,
+            execution_predictor=self.execution_predictor,
+            profiler=self.profiler,
+        )
+        client.keep_warm = self.keep_warm
+        return client
+
+    async def aclose(self) -> None:
+        if self._owns_http_client and self._http_client is not None:
+            await self._http_client.aclose()
+        self._http_client = None
+
+    async def _preprocess_images(
+        self,
+        params: dict[str, Any],
+        override_workflow_api: dict[str, Any] | None,
+    ) -> dict[str, Any]:
+        params, report = await self.image_preprocessor.preprocess(
+            params,
+            override_workflow_api=override_workflow_api,
+        )
+        if report.images:
+            print(
+                f"Preprocessed {report.images} images: {report.original_bytes} -> "
+                f"{report.uploaded_bytes} bytes ({report.bytes_saved} bytes saved)",
+            )
+            if self.metrics is not None:
+                self.metrics.set_gauge("upload_bytes_saved", report.bytes_saved)
+        return params
+
+    async def _prepare_job(
+        self,
+        *,
+        prompt_id: str,
+        params: dict[str, Any],
+        override_workflow_api: dict[str, Any] | None,
+    ) -> tuple[dict[str, Any], dict[str, str | None], list, str]:
+        """Check the job and encode it for submission.
+
+        Returns:
+            tuple: The params after preprocessing, the workflow fields of the
+                request, the files to upload and the params as JSON
+
+        """
+        with self._phase("validate", prompt_id):
+            if self.validator is not None:
+                self.validator.check(params)
+            if self.supported_weights is not None and override_workflow_api:
+                self.supported_weights.check(override_workflow_api)
+
+        with self._phase("workflow", prompt_id):
+            workflow_fields = await self._workflow_fields(override_workflow_api)
+
+        if self.image_preprocessor is not None:
+            with self._phase("preprocess", prompt_id):
+                params = await self._preprocess_images(params, override_workflow_api)
+        with self._phase("encode", prompt_id):
+            params_parsed, files = parse_parameters(params)
+            params_json = _json.dumps(params_parsed)
+        return params, workflow_fields, files, params_json
+
+    async def infer_with_logs(
+        self,
+        *,
+        params: dict[str, Any],
+        view_comfy_api_url: str,
+        override_workflow_api: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> PromptResult | None:
+        """Run a prompt and stream its logs until the result comes back.
+
+        If the awaiting task is cancelled, or the job runs longer than timeout,
+        the remote prompt is cancelled too so it does not keep using the GPU.
+
+        The job's state (prompt_result, submitted_at, first_log_at...) is kept on
+        the client. Calls made while a job is already running on it run on a clone
+        from _clone_for_job(), so one client can be shared by concurrent jobs.
+
+        Args:
+            params (dict): Parameters of the workflow
+            view_comfy_api_url (str): The ViewComfy endpoint
+            override_workflow_api (dict, optional): Workflow to run instead of the deployed one
+            timeout (float, optional): Seconds after which the job is cancelled and TimeoutError raised
+
+        """
+        if self._job_in_flight:
+            return await self._clone_for_job().infer_with_logs(
+                params=params,
+                view_comfy_api_url=view_comfy_api_url,
+                override_workflow_api=override_workflow_api,
+                timeout=timeout,
+            )
+        self._job_in_flight = True
+        try:
+            return await self._run_with_logs(
+                params=params,
+                view_comfy_api_url=view_comfy_api_url,
+                override_workflow_api=override_workflow_api,
+                timeout=timeout,
+            )
+        finally:
+            self._job_in_flight = False
+
+    async def _run_with_logs(
+        self,
+        *,
+        params: dict[str, Any],
+        view_comfy_api_url: str,
+        override_workflow_api: dict[str, Any] | None,
+        timeout: float | None,
+    ) -> PromptResult | None:
+        prompt_id = str(uuid.uuid4())
+        params, workflow_fields, files, params_json = await self._prepare_job(
+            prompt_id=prompt_id,
+            params=params,
+            override_workflow_api=override_workflow_api,
+        )
+        self.prompt_result = None
+        self.is_workflow_loading = True
+        self.is_canceled = False
+        self.is_job_finished = False
+        self._transport = None
+        if self.concurrency_limiter is not None:
+            with self._phase("acquire", prompt_id):
+                await self.concurrency_limiter.acquire(view_comfy_api_url)
+        self.submitted_at = time.monotonic()
+        self.first_log_at = None
+        deadline = self.submitted_at + timeout if timeout is not None else None
+        cold = False
+        if self.keep_warm is not None:
+            cold = self.keep_warm.record_submit(view_comfy_api_url)
+
+        auth = {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+        }
+        data = {
+            "prompt_id": prompt_id,
+            "view_comfy_api_url": view_comfy_api_url,
+            "params": params_json,
+            **workflow_fields,
+        }
+
+        try:
+            with self._phase("submit", prompt_id):
+                response_data = await self._submit_with_base_retry(
+                    lambda: self._submit_with_transport(data=data, files=files, auth=auth),
+                    data=data,
+                    files=files,
+                    override_workflow_api=override_workflow_api,
+                )
+            print(response_data)
+
+            with self._phase("wait", prompt_id):
+                await self._wait_for_result(
+                    prompt_id=prompt_id,
+                    view_comfy_api_url=view_comfy_api_url,
+                    deadline=deadline,
+                    timeout=timeout,
+                )
+        except asyncio.CancelledError:
+            await self._cancel_remote_prompt(
+                prompt_id=prompt_id,
+                view_comfy_api_url=view_comfy_api_url,
+            )
+            raise
+        finally:
+            if self._transport is not None:
+                await self._transport.close()
+            if self.keep_warm is not None and self.first_log_at is not None:
+                self.keep_warm.record_first_log(
+                    view_comfy_api_url,
+                    latency_seconds=self.first_log_at - self.submitted_at,
+                    cold=cold,
+                )
+            if self.concurrency_limiter is not None:
+                self.concurrency_limiter.release(
+                    view_comfy_api_url,
+                    time_to_first_log=(
+                        self.first_log_at - self.submitted_at if self.first_log_at is not None else None
+                    ),
+                    end_to_end_seconds=time.monotonic() - self.submitted_at if self.is_job_finished else None,
+                    execution_time_seconds=(
+                        self.prompt_result.execution_time_seconds if self.prompt_result is not None else None
+                    ),
+                )
+            if (
+                self.execution_predictor is not None
+                and self.prompt_result is not None
+                and self.prompt_result.status == "success"
+            ):
+                self.execution_predictor.record(
+                    params=params,
+                    execution_time_seconds=self.prompt_result.execution_time_seconds,
+                    view_comfy_api_url=view_comfy_api_url,
+                    override_workflow_api=override_workflow_api,
+                )
+
+        return self.prompt_result
+
+    async def _wait_for_result(
+        self,
+        *,
+        prompt_id: str,
+        view_comfy_api_url: str,
+        deadline: float | None,
+        timeout: float | None,
+    ) -> None:
+        """Follow a submitted job until self.prompt_result holds its result."""
+        if self._transport is None:
+            # The job was accepted but no live channel is available.
+            await self._poll_result(
+                prompt_id=prompt_id,
+                view_comfy_api_url=view_comfy_api_url,
+                deadline=deadline,
+            )
+            return
+
+        loading_animation = itertools.cycle(
+            ["Loading.  ", "Loading.. ", "Loading..."],
+        )
+        while True:
+            while self.is_ws_connected:
+                if deadline is not None and time.monotonic() > deadline:
+                    await self._cancel_remote_prompt(
+                        prompt_id=prompt_id,
+                        view_comfy_api_url=view_comfy_api_url,
+                    )
+                    msg = f"Prompt {prompt_id} did not finish within {timeout}s and was canceled"
+                    raise TimeoutError(msg)
+                if self.is_workflow_loading:
+                    sys.stdout.write(f"\r{next(loading_animation)}")
+                    sys.stdout.flush()
+                # Wake up as soon as the job ends, or every 0.3s for the animation and deadline.
+                try:
+                    await asyncio.wait_for(self._events_done.wait(), 0.3)
+                except asyncio.TimeoutError:
+                    pass
+
+            if self.is_job_finished:
+                break
+
+            # The live channel dropped while the job is still running server-side.
+            # Never resubmit: reconnect to the prompt's room, or poll for its result.
+            print(f"\nLive connection lost for prompt {prompt_id}, reconnecting")
+            if not await self._reconnect(prompt_id=prompt_id, deadline=deadline):
+                print(f"Unable to reconnect, polling the result of prompt {prompt_id}")
+                await self._poll_result(
+                    prompt_id=prompt_id,
+                    view_comfy_api_url=view_comfy_api_url,
+                    deadline=deadline,
+                )
+                return
+
+            # Events sent while we were disconnected are lost, check whether
+            # the job finished in the meantime.
+            for prompt_result in await self._infer_info(prompt_ids=[prompt_id]):
+                if prompt_result.completed or prompt_result.status in TERMINAL_STATUSES:
+                    self.prompt_result = prompt_result
+                    self.is_job_finished = True
+            if self.is_job_finished:
+                break
+
+    async def _reconnect(self, *, prompt_id: str, deadline: float | None) -> bool:
+        """Reconnect the live channel of a running job with exponential backoff.
+
+        Returns:
+            bool: Whether the channel is live again
+
+        """
+        if self._transport is None:
+            return False
+
+        for attempt in range(RECONNECT_ATTEMPTS):
+            delay = min(RECONNECT_BACKOFF_SECONDS * 2**attempt, RECONNECT_BACKOFF_MAX_SECONDS)
+            if deadline is not None and time.monotonic() + delay > deadline:
+                return False
+            await asyncio.sleep(delay)
+            try:
+                if await self._transport.reconnect(prompt_id=prompt_id):
+                    return True
+            except Exception as e:
+                print(f"Reconnect attempt {attempt + 1} failed: {e!s}")
+        return False
+
+    def _transport_order(self) -> list[TransportEnum]:
+        if self.transport != TransportEnum.Auto:
+            return [self.transport]
+        if _SSE_SUPPORT.get(self.api_url) is False:
+            return [TransportEnum.SocketIO]
+        return [TransportEnum.SSE, TransportEnum.SocketIO]
+
+    async def _submit_with_transport(
+        self,
+        *,
+        data: dict[str, Any],
+        files: list,
+        auth: dict[str, str],
+    ) -> dict | None:
+        """Submit the job through the first transport able to deliver its live events.
+
+        Sets self._transport to the transport in use, or leaves it None when the
+        server accepted the job without a live channel.
+        """
+        errors = []
+        for name in self._transport_order():
+            transport = SSETransport(self) if name == TransportEnum.SSE else SocketIOTransport(self)
+            try:
+                response_data = await transport.submit(data=data, files=files, auth=auth)
+            except TransportUnavailable as e:
+                await transport.close()
+                if name == TransportEnum.SSE:
+                    _SSE_SUPPORT[self.api_url] = False
+                if e.accepted:
+                    if self.transport == TransportEnum.Auto:
+                        await self._follow_on_socketio(data["prompt_id"])
+                    return e.response_data
+                errors.append(f"{name.value}: {e!s}")
+                # The failed attempt may have read the uploads, rewind them for the next one.
+                for _, file in files:
+                    file.seek(0)
+                continue
+            except BaseException:
+                await transport.close()
+                raise
+
+            if name == TransportEnum.SSE:
+                _SSE_SUPPORT[self.api_url] = True
+            self._transport = transport
+            return response_data
+
+        msg = f"No transport available for live logs ({'; '.join(errors)})"
+        raise Exception(msg)
+
+    async def _follow_on_socketio(self, prompt_id: str) -> None:
+        """Receive the events of a job already scheduled without a live channel by joining its room.
+
+        Leaves self._transport None, for polling, when socket.io is not reachable either.
+        """
+        transport = SocketIOTransport(self)
+        try:
+            await transport.reconnect(prompt_id=prompt_id)
+        except Exception as e:
+            print(f"Unable to follow prompt {prompt_id} on socket.io, polling its result: {e!s}")
+            await transport.close()
+            return
+        self._transport = transport
+
+        # Events sent before the room was joined are lost, check whether the job already finished.
+        for prompt_result in await self._infer_info(prompt_ids=[prompt_id]):
+            if prompt_result.completed or prompt_result.status in TERMINAL_STATUSES:
+                self.prompt_result = prompt_result
+                self.is_job_finished = True
+                self.is_ws_connected = False
+
+    async def _poll_result(
+        self,
+        *,
+        prompt_id: str,
+        view_comfy_api_url: str,
+        deadline: float | None,
+    ) -> PromptResult | None:
+        """Wait for a job by polling infer_info, for when no live events are available.
+
+        Connection errors and retryable statuses are retried with backoff until the
+        deadline. When polling gives up, the remote prompt is canceled, as nothing
+        would collect its result.
+        """
+        failures = 0
+        while True:
+            try:
+                prompt_results = await self._infer_info(prompt_ids=[prompt_id])
+            except Exception as e:
+                delay = min(RECONNECT_BACKOFF_SECONDS * 2**failures, RECONNECT_BACKOFF_MAX_SECONDS)
+                if not _is_transient(e) or (deadline is not None and time.monotonic() + delay > deadline):
+                    print(f"Giving up on the result of prompt {prompt_id}, canceling it: {e!s}")
+                    await self._cancel_remote_prompt(
+                        prompt_id=prompt_id,
+                        view_comfy_api_url=view_comfy_api_url,
+                    )
+                    raise
+                failures += 1
+                print(f"Polling the result of prompt {prompt_id} failed, retrying in {delay:.1f}s: {e!s}")
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            for prompt_result in prompt_results:
+                if prompt_result.completed or prompt_result.status in TERMINAL_STATUSES:
+                    self.prompt_result = prompt_result
+                    return prompt_result
+
+            if deadline is not None and time.monotonic() > deadline:
+                await self._cancel_remote_prompt(
+                    prompt_id=prompt_id,
+                    view_comfy_api_url=view_comfy_api_url,
+                )
+                msg = f"Prompt {prompt_id} did not finish in time and was canceled"
+                raise TimeoutError(msg)
+            await asyncio.sleep(RESULT_POLL_INTERVAL_SECONDS)
+
+    async def _cancel_remote_prompt(self, *, prompt_id: str, view_comfy_api_url: str) -> bool:
+        """Cancel an abandoned prompt and wait for the infer_canceled_message confirmation.
+
+        Returns:
+            bool: Whether the server confirmed the cancellation
+
+        """
+        try:
+            await self._cancel_infer(prompt_id=prompt_id, view_comfy_api_url=view_comfy_api_url)
+        except Exception as e:
+            print(f"Unable to cancel prompt {prompt_id}: {e!s}")
+            return False
+
+        confirm_deadline = time.monotonic() + CANCEL_CONFIRM_TIMEOUT_SECONDS
+        while not self.is_canceled and self._transport is not None and self._transport.is_open:
+            if time.monotonic() > confirm_deadline:
+                break
+            await asyncio.sleep(0.1)
+
+        if not self.is_canceled:
+            print(f"Cancel request sent for {prompt_id} but no confirmation was received")
+        return self.is_canceled
+
+    async def infer(
+        self,
+        *,
+        params: dict[str, Any],
+        view_comfy_api_url: str,
+        override_workflow_api: dict[str, Any] | None = None,
+    ) -> PromptScheduled:
+        httpx = _import_httpx()
+        prompt_id = str(uuid.uuid4())
+        params, workflow_fields, files, params_json = await self._prepare_job(
+            prompt_id=prompt_id,
+            params=params,
+            override_workflow_api=override_workflow_api,
+        )
+
+        auth = {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+        }
+
+        data = {
+            "prompt_id": prompt_id,
+            "view_comfy_api_url": view_comfy_api_url,
+            "params": params_json,
+            **workflow_fields,
+        }
+
+        if self.keep_warm is not None:
+            self.keep_warm.record_submit(view_comfy_api_url)
+
+        if self.concurrency_limiter is not None:
+            with self._phase("acquire", prompt_id):
+                await self.concurrency_limiter.acquire(view_comfy_api_url)
+        client = self._get_http_client()
+        started = time.monotonic()
+
+        async def send() -> "httpx.Response":
+            request = self._build_infer_request(data=data, files=files, headers=auth)
+            response = await client.send(request, follow_redirects=True)
+            self._record_request("infer", started, response.status_code)
+            self._observe_status(view_comfy_api_url, response.status_code)
+            self._check_workflow_base(data, response.status_code)
+            return response
+
+        try:
+            with self._phase("submit", prompt_id):
+                response = await self._submit_with_base_retry(
+                    send,
+                    data=data,
+                    files=files,
+                    override_workflow_api=override_workflow_api,
+                )
+
+            if response.status_code == 201:
+                response_json = _json.loads(response.content)
+            else:
+                error_text = response.text
+                err_msg = f"API request failed with status\
+                {response.status_code}: {error_text}"
+                raise Exception(err_msg)
+
+        except httpx.HTTPError as e:
+            self._record_request("infer", started, "error")
+            msg = f"Connection error: {e!s}"
+            raise Exception(msg) from e  # noqa: TRY002
+        except Exception as e:
+            msg = f"Error during API call: {e!s}"
+            raise Exception(msg) from e  # noqa: TRY002
+        finally:
+            if self.concurrency_limiter is not None:
+                self.concurrency_limiter.release(view_comfy_api_url)
+
+        response_data = response_json.get("data", None)
+        if not response_data:
+            msg = "Something went wrong reading the response data"
+            raise Exception(msg)
+
+        return PromptScheduled(**response_data)
+
+    async def _cancel_infer(self, *, prompt_id: str, view_comfy_api_url: str) -> dict:
+        httpx = _import_httpx()
+        auth = {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+        }
+        data = {"prompt_id": prompt_id, "view_comfy_api_url": view_comfy_api_url}
+        client = self._get_http_client()
+        started = time.monotonic()
+        try:
+            response = await client.post(
+                f"{self.api_url}/api/workflow/infer/cancel",
+                json=data,
+                timeout=httpx.Timeout(2400.0),
+                headers=auth,
+            )
+            self._record_request("cancel", started, response.status_code)
+
+            if response.status_code == 201:
+                return _json.loads(response.content)
+            error_text = response.text
+            err_msg = f"API request failed with status {response.status_code}: {error_text}"
+            raise Exception(err_msg)
+
+        except httpx.HTTPError as e:
+            self._record_request("cancel", started, "error")
+            msg = f"Connection error: {e!s}"
+            raise Exception(msg) from e
+        except Exception as e:
+            msg = f"Error during API call: {e!s}"
+            raise Exception(msg) from e
+
+    async def cancel_many(
+        self,
+        *,
+        prompt_ids: list[str],
+        view_comfy_api_url: str,
+        max_concurrency: int = CANCEL_MAX_CONCURRENCY,
+    ) -> dict[str, dict | Exception]:
+        """Cancel several prompts, pipelining the requests over the pooled connections.
+
+        Args:
+            prompt_ids (list[str]): Prompts to cancel
+            view_comfy_api_url (str): The ViewComfy endpoint the prompts were sent to
+            max_concurrency (int): Maximum number of cancel requests in flight
+
+        Returns:
+            dict: The API response for each prompt_id, or the Exception raised for it
+
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def cancel_one(prompt_id: str) -> dict:
+            async with semaphore:
+                return await self._cancel_infer(
+                    prompt_id=prompt_id,
+                    view_comfy_api_url=view_comfy_api_url,
+                )
+
+        unique_prompt_ids = list(dict.fromkeys(prompt_ids))
+        results = await asyncio.gather(
+            *(cancel_one(prompt_id) for prompt_id in unique_prompt_ids),
+            return_exceptions=True,
+        )
+        return dict(zip(unique_prompt_ids, results, strict=True))
+
+    async def iter_infer_info(self, *, prompt_ids: list[str]) -> AsyncIterator[PromptResult]:
+        """Yield the results of the prompts as the response is received.
+
+        The response is parsed one record at a time, and the fields PromptResult
+        does not keep (INFER_INFO_DROPPED_FIELDS, e.g. the workflow) are skipped
+        without being decoded, so memory does not grow with the number of prompts.
+
+        Args:
+            prompt_ids (list[str]): Prompts to fetch the results of
+
+        """
+        httpx = _import_httpx()
+        auth = {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "content-type": "application/json",
+        }
+        params = {"prompt_ids": prompt_ids}
+        client = self._get_http_client()
+        started = time.monotonic()
+        parser = _json.ArrayRecordParser(drop_keys=_INFER_INFO_DROPPED_KEYS)
+        try:
+            async with client.stream(
+                "GET",
+                f"{self.api_url}/api/workflow/infer/",
+                params=params,
+                timeout=httpx.Timeout(2400.0),
+                headers=auth,
+            ) as response:
+                self._record_request("infer_info", started, response.status_code)
+                if response.status_code != 200:
+                    error_text = (await response.aread()).decode(errors="replace")
+                    err_msg = f"API request failed with status {response.status_code}: {error_text}"
+                    raise _StatusError(response.status_code, err_msg)
+
+                async for chunk in response.aiter_bytes():
+                    for record in parser.feed(chunk):
+                        yield _prompt_result_from_record(record)
+                parser.close()
+
+        except httpx.HTTPError as e:
+            self._record_request("infer_info", started, "error")
+            msg = f"Connection error: {e!s}"
+            raise Exception(msg) from e
+        except Exception as e:
+            msg = f"Error during API call: {e!s}"
+            raise Exception(msg) from e
+
+    async def _infer_info(self, *, prompt_ids: list[str]) -> list[PromptResult]:
+        with self._phase("results", prompt_ids):
+            return [prompt_result async for prompt_result in self.iter_infer_info(prompt_ids=prompt_ids)]
+
+
+def _prompt_result_from_record(data: dict[str, Any]) -> PromptResult:
+    data_parse = {}
+    for key, value in data.items():
+        snake = _SNAKE_CASE.sub(r"_\1", key).lower()
+        if snake not in INFER_INFO_DROPPED_FIELDS:
+            data_parse[snake] = value
+    output_parsed = []
+    for outputs in data["outputs"]:
+        output_parse = {}
+        for key, value in outputs.items():
+            output_parse[_SNAKE_CASE.sub(r"_\1", key).lower()] = value
+        output_parsed.append(output_parse)
+    data_parse["outputs"] = output_parsed
+    return PromptResult(**data_parse)
+
+
+def parse_parameters(params: dict) -> tuple[dict[str, Any], list]:
+    """Parse parameters from a dictionary to a format suitable for the API call.
+
+    Args:
+        params (dict): Dictionary of parameters
+
+    Returns:
+        dict: Parsed parameters
+
+    """
+    parsed_params = {}
+    files = []
+    for key, value in params.items():
+        if isinstance(value, BufferedReader):
+            files.append((key, value))
+        else:
+            parsed_params[key] = value
+    return parsed_params, files
+
+
+async def infer_with_logs(
+    *,
+    params: dict[str, Any],
+    view_comfy_api_url: str,
+    override_workflow_api: dict[str, Any] | None = None,
+    client_id: str,
+    client_secret: str,
+    timeout: float | None = None,
+) -> PromptResult | None:
+    async with ComfyAPIClient(
+        infer_url=view_comfy_api_url,
+        client_id=client_id,
+        client_secret=client_secret,
+    ) as client:
+        # Make the API call
+        return await client.infer_with_logs(
+            params=params,
+            view_comfy_api_url=view_comfy_api_url,
+            override_workflow_api=override_workflow_api,
+            timeout=timeout,
+        )
+
+
+async def infer(
+    *,
+    params: dict[str, Any],
+    view_comfy_api_url: str,
+    override_workflow_api: dict[str, Any] | None = None,
+    client_id: str,
+    client_secret: str,
+) -> PromptScheduled | None:
+    async with ComfyAPIClient(
+        infer_url=view_comfy_api_url,
+        client_id=client_id,
+        client_secret=client_secret,
+    ) as client:
+        # Make the API call
+        return await client.infer(
+            params=params,
+            view_comfy_api_url=view_comfy_api_url,
+            override_workflow_api=override_workflow_api,
+        )
+
+
+async def infer_cancel(
+    *,
+    prompt_id: str,
+    view_comfy_api_url: str,
+    client_id: str,
+    client_secret: str,
+):
+    async with ComfyAPIClient(
+        infer_url=view_comfy_api_url,
+        client_id=client_id,
+        client_secret=client_secret,
+    ) as client:
+        return await client._cancel_infer(
+            prompt_id=prompt_id,
+            view_comfy_api_url=view_comfy_api_url,
+        )
+
+
+async def infer_cancel_many(
+    *,
+    prompt_ids: list[str],
+    view_comfy_api_url: str,
+    client_id: str,
+    client_secret: str,
+) -> dict[str, dict | Exception]:
+    async with ComfyAPIClient(
+        infer_url=view_comfy_api_url,
+        client_id=client_id,
+        client_secret=client_secret,
+    ) as client:
+        return await client.cancel_many(
+            prompt_ids=prompt_ids,
+            view_comfy_api_url=view_comfy_api_url,
+        )
+
+
+async def infer_info(
+    *,
+    prompt_ids: list[str],
+    client_id: str,
+    client_secret: str,
+    view_comfy_api_url: str,
+) -> list[PromptResult]:
+    async with ComfyAPIClient(
+        infer_url=view_comfy_api_url,
+        client_id=client_id,
+        client_secret=client_secret,
+    ) as client:
+        return await client._infer_info(prompt_ids=prompt_ids)
+
+
+async def invite_user(
+    *,
+    client_id: str,
+    client_secret: str,
+    email: str,
+    team_id: int,
+) -> str:
+    httpx = _import_httpx()
+    auth = {
+        "client_id": client_id,
+        "client_secret": client_secret,
+    }
+
+    data = {
+        "team_id": team_id,
+        "email": email,
+    }
+
+    async with httpx.AsyncClient() as client:
+        try:
+            response = await client.post(
+                f"{API_URL}/api/team/add-playground-user",
+                json=data,
+                timeout=httpx.Timeout(2400.0),
+                follow_redirects=True,
+                headers=auth,
+            )
+
+            if response.status_code == 201:
+                return "User Invited!"
+
+            error_text = response.text
+            err_msg = f"API request failed with status\
+                    {response.status_code}: {error_text}"
+            raise Exception(err_msg)
+
+        except httpx.HTTPError as e:
+            msg = f"Connection error: {e!s}"
+            raise Exception(msg) from e  # noqa: TRY002
+        except Exception as e:
+            msg = f"Error during API call: {e!s}"
+            raise Exception(msg) from e  # noqa: TRY002
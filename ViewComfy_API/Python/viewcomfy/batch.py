@@ -0,0 +1,573 @@
+"""Run a sheet of params (JSONL or CSV) through the API: submit, wait for the results, download them.
+
+Rows are read lazily and at most max_pending of them are in flight at once, so
+memory does not grow with the size of the sheet. Every finished row is appended
+to a JSONL manifest as soon as its outputs are saved.
+
+Usage:
+
+    viewcomfy-batch prompts.csv --view-comfy-api-url <endpoint> --file-column 10-inputs-image
+    python -m viewcomfy.batch prompts.jsonl --view-comfy-api-url <endpoint> --output-dir outputs
+
+Credentials are read from --client-id/--client-secret or the VIEWCOMFY_CLIENT_ID
+and VIEWCOMFY_CLIENT_SECRET environment variables.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any, TextIO
+
+from viewcomfy.api import (
+    API_URL,
+    RESULT_POLL_INTERVAL_SECONDS,
+    TERMINAL_STATUSES,
+    ComfyAPIClient,
+    PromptResult,
+)
+from viewcomfy.predictor import extract_job_params
+from viewcomfy.profiling import ClientProfiler
+from viewcomfy.sinks import OutputSink, sink_from_url, transfer_output
+from viewcomfy.validation import MEDIA_VALUE_TYPES, TEXT_VALUE_TYPES, ParamsValidator
+
+# Maximum number of prompt ids per infer_info request
+INFO_BATCH_SIZE = 100
+# Seconds of history the throughput shown in the progress line is measured over
+THROUGHPUT_WINDOW_SECONDS = 60.0
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+def count_rows(path: str | Path) -> int:
+    """Count the rows of a sheet without keeping them in memory."""
+    with open(path, newline="") as f:
+        if Path(path).suffix.lower() == ".csv":
+            return max(0, sum(1 for _ in csv.reader(f)) - 1)
+        return sum(1 for line in f if line.strip())
+
+
+def read_rows(
+    path: str | Path,
+    *,
+    file_columns: Iterable[str] = (),
+    base_dir: str | Path | None = None,
+    validator: ParamsValidator | None = None,
+    start_row: int = 0,
+) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Yield (row index, params) for every row of a JSONL or CSV sheet, one at a time.
+
+    The values of file columns are paths, resolved against base_dir (the folder of
+    the sheet by default). They are returned as Path objects and only opened when
+    the row is submitted. CSV cells are converted to the valueType of their input
+    when a validator is given, and to numbers or booleans when they look like one
+    otherwise. Empty CSV cells are left out, so the deployment uses its default.
+
+    Args:
+        path (str | Path): The .jsonl or .csv file
+        file_columns (Iterable[str]): Param keys whose values are files to upload
+        base_dir (str | Path, optional): Folder relative file paths are resolved against
+        validator (ParamsValidator, optional): Its media inputs are file columns too
+        start_row (int): Index of the first row to yield, to resume an interrupted run
+
+    """
+    path = Path(path)
+    base_dir = Path(base_dir) if base_dir is not None else path.parent
+    value_types = {key: spec.value_type for key, spec in validator.specs.items()} if validator else {}
+    file_columns = set(file_columns) | {key for key, value_type in value_types.items() if value_type in MEDIA_VALUE_TYPES}
+
+    with open(path, newline="") as f:
+        if path.suffix.lower() == ".csv":
+            rows = (
+                {key: _coerce_cell(value, value_types.get(key)) for key, value in row.items() if value != ""}
+                for row in csv.DictReader(f)
+            )
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+
+        for index, params in enumerate(rows):
+            if index < start_row:
+                continue
+            for key in file_columns:
+                value = params.get(key)
+                if isinstance(value, str) and value:
+                    params[key] = base_dir / value
+            yield index, params
+
+
+def _coerce_cell(value: str, value_type: str | None) -> Any:
+    if value_type in MEDIA_VALUE_TYPES or value_type in TEXT_VALUE_TYPES:
+        return value
+    if value_type in (None, "boolean") and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    if value_type in (None, "number", "seed"):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return value
+
+
+class BatchProgress:
+    def __init__(self, *, total: int | None = None) -> None:
+        """Counters of a batch run, with the throughput and ETA shown in the progress line.
+
+        Args:
+            total (int, optional): Number of rows to run, for the ETA
+
+        """
+        self.total = total
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.started_at = time.monotonic()
+        # (monotonic time, finished rows), to measure the recent throughput
+        self._samples: deque[tuple[float, int]] = deque([(self.started_at, 0)])
+
+    @property
+    def finished(self) -> int:
+        return self.succeeded + self.failed
+
+    def throughput(self) -> float:
+        """Rows finished per second over the last THROUGHPUT_WINDOW_SECONDS."""
+        now = time.monotonic()
+        self._samples.append((now, self.finished))
+        while len(self._samples) > 2 and now - self._samples[1][0] > THROUGHPUT_WINDOW_SECONDS:
+            self._samples.popleft()
+        first_at, first_finished = self._samples[0]
+        if now <= first_at:
+            return 0.0
+        return (self.finished - first_finished) / (now - first_at)
+
+    def line(self) -> str:
+        rate = self.throughput()
+        total = f"/{self.total}" if self.total is not None else ""
+        text = (
+            f"{self.finished}{total} done ({self.succeeded} ok, {self.failed} failed), "
+            f"{self.submitted - self.finished} in flight, {rate * 60:.1f} rows/min"
+        )
+        if self.total is not None and rate > 0:
+            remaining = max(0, self.total - self.finished) / rate
+            text += f", ETA {_format_duration(remaining)}"
+        return text
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class _PendingRow:
+    def __init__(self, *, index: int, prompt_id: str, job_params: dict[str, float] | None = None) -> None:
+        self.index = index
+        self.prompt_id = prompt_id
+        self.submitted_at = time.monotonic()
+        # Params the execution predictor learns from, kept instead of the whole row
+        self.job_params = job_params
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        *,
+        client: ComfyAPIClient,
+        view_comfy_api_url: str,
+        output_dir: str | Path,
+        manifest: TextIO,
+        override_workflow_api: dict[str, Any] | None = None,
+        max_pending: int = 64,
+        submit_concurrency: int = 4,
+        download_concurrency: int = 4,
+        poll_interval_seconds: float = RESULT_POLL_INTERVAL_SECONDS,
+        progress: BatchProgress | None = None,
+        sink: OutputSink | None = None,
+        row_timeout_seconds: float | None = None,
+    ) -> None:
+        """Submit rows, track their completion with infer_info and download their outputs.
+
+        The three stages run concurrently and are connected by bounded queues. A row
+        holds one of max_pending slots from its submission until its manifest entry is
+        written, which bounds the memory of the run and the load put on the API.
+
+        Args:
+            client (ComfyAPIClient): Client used for every request, its validator included
+            view_comfy_api_url (str): The ViewComfy endpoint
+            output_dir (str | Path): Folder the outputs are saved to, as <row>_<filename>
+            manifest (TextIO): File the JSONL manifest entries are appended to
+            override_workflow_api (dict, optional): Workflow every row runs instead of the deployed one
+            max_pending (int): Maximum number of rows submitted but not yet in the manifest
+            submit_concurrency (int): Number of concurrent submissions
+            download_concurrency (int): Number of concurrent downloads
+            poll_interval_seconds (float): Delay between two infer_info rounds
+            progress (BatchProgress, optional): Counters updated by the run
+            sink (OutputSink, optional): Where the outputs are streamed to, under the
+                same <row>_<filename> keys, instead of output_dir
+            row_timeout_seconds (float, optional): Seconds after its submission a row that
+                has not finished is canceled and written to the manifest as "timed_out".
+                The time a row waits in the server's queue counts, so leave room for
+                max_pending rows ahead of it. None, the default, waits for every row.
+
+        """
+        self.client = client
+        self.view_comfy_api_url = view_comfy_api_url
+        self.output_dir = Path(output_dir)
+        self.manifest = manifest
+        self.override_workflow_api = override_workflow_api
+        self.max_pending = max_pending
+        self.submit_concurrency = submit_concurrency
+        self.download_concurrency = download_concurrency
+        self.poll_interval_seconds = poll_interval_seconds
+        self.progress = progress or BatchProgress()
+        self.sink = sink
+        self.row_timeout_seconds = row_timeout_seconds
+        self._pending: dict[str, _PendingRow] = {}
+        self._submitting_done = asyncio.Event()
+        # Model key of the workflow the rows run, hashed once
+        self._predictor_key: str | None = None
+
+    async def run(self, rows: Iterable[tuple[int, dict[str, Any]]]) -> BatchProgress:
+        """Run every row and return the final counters."""
+        if self.sink is None:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+        slots = asyncio.Semaphore(self.max_pending)
+        row_queue: asyncio.Queue = asyncio.Queue(maxsize=self.submit_concurrency)
+        download_queue: asyncio.Queue = asyncio.Queue(maxsize=self.download_concurrency)
+
+        async def produce() -> None:
+            for row in rows:
+                await slots.acquire()
+                await row_queue.put(row)
+            for _ in range(self.submit_concurrency):
+                await row_queue.put(None)
+
+        async def submit_rows() -> None:
+            while (row := await row_queue.get()) is not None:
+                if not await self._submit(*row):
+                    slots.release()
+
+        async def submit_all() -> None:
+            try:
+                await asyncio.gather(*(submit_rows() for _ in range(self.submit_concurrency)))
+            finally:
+                self._submitting_done.set()
+
+        async def download_rows() -> None:
+            while (item := await download_queue.get()) is not None:
+                try:
+                    await self._finish(*item)
+                finally:
+                    slots.release()
+
+        stages = [
+            asyncio.create_task(produce()),
+            asyncio.create_task(submit_all()),
+            asyncio.create_task(self._track(download_queue)),
+        ]
+        downloaders = [asyncio.create_task(download_rows()) for _ in range(self.download_concurrency)]
+        try:
+            await asyncio.gather(*stages)
+            for _ in downloaders:
+                await download_queue.put(None)
+            await asyncio.gather(*downloaders)
+        finally:
+            # Stop every stage if one of them failed, e.g. on a malformed row.
+            for task in stages + downloaders:
+                task.cancel()
+        return self.progress
+
+    async def _submit(self, index: int, params: dict[str, Any]) -> bool:
+        """Submit one row. Returns whether it is now pending, failures are written to the manifest."""
+        self.progress.submitted += 1
+        predictor = self.client.execution_predictor
+        job_params = extract_job_params(params) if predictor is not None else None
+        files = []
+        try:
+            for key, value in params.items():
+                if isinstance(value, Path):
+                    files.append(value.open("rb"))
+                    params[key] = files[-1]
+            scheduled = await self.client.infer(
+                params=params,
+                view_comfy_api_url=self.view_comfy_api_url,
+                override_workflow_api=self.override_workflow_api,
+            )
+        except Exception as e:
+            self.progress.failed += 1
+            self._write_manifest({"row": index, "prompt_id": None, "status": "submit_failed", "error": str(e)})
+            return False
+        finally:
+            for file in files:
+                file.close()
+
+        self._pending[scheduled.prompt_id] = _PendingRow(
+            index=index,
+            prompt_id=scheduled.prompt_id,
+            job_params=job_params,
+        )
+        return True
+
+    async def _track(self, download_queue: asyncio.Queue) -> None:
+        """Poll infer_info for the pending rows and queue the finished ones for download."""
+        while not (self._submitting_done.is_set() and not self._pending):
+            prompt_ids = list(self._pending)
+            for start in range(0, len(prompt_ids), INFO_BATCH_SIZE):
+                batch = prompt_ids[start : start + INFO_BATCH_SIZE]
+                try:
+                    finished = []
+                    with self.client._phase("results", batch):
+                        async for prompt_result in self.client.iter_infer_info(prompt_ids=batch):
+                            # The same test as ComfyAPIClient._poll_result
+                            if not (prompt_result.completed or prompt_result.status in TERMINAL_STATUSES):
+                                continue
+                            pending = self._pending.pop(prompt_result.prompt_id, None)
+                            if pending is not None:
+                                finished.append((pending, prompt_result))
+                    for item in finished:
+                        await download_queue.put(item)
+                except Exception as e:
+                    # Rows stay pending and are polled again in the next round.
+                    print(f"Error polling results: {e!s}", file=sys.stderr)
+            await self._expire(download_queue)
+            if self._pending or not self._submitting_done.is_set():
+                await asyncio.sleep(self.poll_interval_seconds)
+
+    async def _expire(self, download_queue: asyncio.Queue) -> None:
+        """Cancel the rows pending for longer than row_timeout_seconds and queue them as timed out.
+
+        Rows whose prompt id infer_info never returns would otherwise keep run() waiting forever.
+        """
+        if self.row_timeout_seconds is None:
+            return
+        deadline = time.monotonic() - self.row_timeout_seconds
+        expired = [pending for pending in self._pending.values() if pending.submitted_at <= deadline]
+        if not expired:
+            return
+        for pending in expired:
+            del self._pending[pending.prompt_id]
+        results = await self.client.cancel_many(
+            prompt_ids=[pending.prompt_id for pending in expired],
+            view_comfy_api_url=self.view_comfy_api_url,
+        )
+        for prompt_id, result in results.items():
+            if isinstance(result, Exception):
+                print(f"Unable to cancel timed out prompt {prompt_id}: {result!s}", file=sys.stderr)
+        for pending in expired:
+            await download_queue.put((pending, None))
+
+    async def _finish(self, pending: _PendingRow, prompt_result: PromptResult | None) -> None:
+        if prompt_result is None:
+            self.progress.failed += 1
+            self._write_manifest(
+                {
+                    "row": pending.index,
+                    "prompt_id": pending.prompt_id,
+                    "status": "timed_out",
+                    "wall_time_seconds": round(time.monotonic() - pending.submitted_at, 3),
+                    "error": f"No result within {self.row_timeout_seconds}s of its submission",
+                },
+            )
+            return
+        entry: dict[str, Any] = {
+            "row": pending.index,
+            "prompt_id": pending.prompt_id,
+            "status": prompt_result.status,
+            "execution_time_seconds": prompt_result.execution_time_seconds,
+            "wall_time_seconds": round(time.monotonic() - pending.submitted_at, 3),
+            "outputs": [],
+        }
+        if prompt_result.status != "success":
+            entry["error"] = prompt_result.error_data
+        elif pending.job_params is not None:
+            predictor = self.client.execution_predictor
+            if self._predictor_key is None:
+                self._predictor_key = predictor.workflow_key(self.view_comfy_api_url, self.override_workflow_api)
+            predictor.record_job_params(
+                self._predictor_key,
+                pending.job_params,
+                prompt_result.execution_time_seconds,
+            )
+        try:
+            with self.client._phase("download", pending.prompt_id):
+                for output in prompt_result.outputs:
+                    name = f"{pending.index}_{Path(output.filename).name}"
+                    if self.sink is not None:
+                        location = await transfer_output(
+                            output,
+                            self.sink,
+                            name,
+                            http_client=self.client._get_http_client(),
+                        )
+                        entry["outputs"].append(location)
+                        continue
+                    destination = self.output_dir / name
+                    if output.is_inline:
+                        output.inline.save(destination)
+                    else:
+                        await self._download(output.filepath, destination)
+                    entry["outputs"].append(str(destination))
+        except Exception as e:
+            entry["status"] = "download_failed"
+            entry["error"] = str(e)
+
+        if entry["status"] == "success":
+            self.progress.succeeded += 1
+        else:
+            self.progress.failed += 1
+        self._write_manifest(entry)
+
+    async def _download(self, url: str, destination: Path) -> None:
+        async with self.client._get_http_client().stream("GET", url) as response:
+            response.raise_for_status()
+            with open(destination, "wb") as f:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_BYTES):
+                    f.write(chunk)
+
+    def _write_manifest(self, entry: dict[str, Any]) -> None:
+        self.manifest.write(json.dumps(entry) + "\n")
+        self.manifest.flush()
+
+
+async def _report_progress(progress: BatchProgress, interval_seconds: float) -> None:
+    interactive = sys.stderr.isatty()
+    while True:
+        await asyncio.sleep(interval_seconds)
+        line = progress.line()
+        if interactive:
+            print(f"\r\033[K{line}", end="", file=sys.stderr, flush=True)
+        else:
+            print(line, file=sys.stderr, flush=True)
+
+
+async def run_batch(args: argparse.Namespace) -> BatchProgress:
+    client_id = args.client_id or os.environ.get("VIEWCOMFY_CLIENT_ID")
+    client_secret = args.client_secret or os.environ.get("VIEWCOMFY_CLIENT_SECRET")
+    validator = ParamsValidator.from_view_comfy_json(args.view_comfy_json) if args.view_comfy_json else None
+
+    override_workflow_api = None
+    if args.override_workflow_api:
+        with open(args.override_workflow_api) as f:
+            override_workflow_api = json.load(f)
+
+    total = None if args.no_count else max(0, count_rows(args.sheet) - args.start_row)
+    progress = BatchProgress(total=total)
+    rows = read_rows(
+        args.sheet,
+        file_columns=args.file_column,
+        base_dir=args.base_dir,
+        validator=validator,
+        start_row=args.start_row,
+    )
+
+    manifest_path = Path(args.manifest or Path(args.output_dir) / "manifest.jsonl")
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    profiler = ClientProfiler() if args.profile else None
+    async with ComfyAPIClient(
+        infer_url=args.view_comfy_api_url,
+        client_id=client_id,
+        client_secret=client_secret,
+        api_url=args.api_url,
+        validator=validator,
+        profiler=profiler,
+    ) as client:
+        if profiler is not None:
+            profiler.start()
+        sink = None
+        if args.sink:
+            sink = sink_from_url(args.sink, endpoint_url=args.s3_endpoint_url, http_client=client._get_http_client())
+        with open(manifest_path, "a") as manifest:
+            runner = BatchRunner(
+                client=client,
+                view_comfy_api_url=args.view_comfy_api_url,
+                output_dir=args.output_dir,
+                manifest=manifest,
+                override_workflow_api=override_workflow_api,
+                max_pending=args.max_pending,
+                submit_concurrency=args.submit_concurrency,
+                download_concurrency=args.download_concurrency,
+                poll_interval_seconds=args.poll_interval,
+                progress=progress,
+                sink=sink,
+                row_timeout_seconds=args.row_timeout or None,
+            )
+            reporter = asyncio.create_task(_report_progress(progress, args.progress_interval))
+            try:
+                await runner.run(rows)
+            finally:
+                reporter.cancel()
+                if sink is not None:
+                    await sink.aclose()
+                if sys.stderr.isatty():
+                    print(file=sys.stderr)
+                if profiler is not None:
+                    profiler.stop()
+                    profiler.save(args.profile)
+                    print(f"{profiler.summary()}\nProfile: {args.profile}", file=sys.stderr)
+    print(f"{progress.line()}\nManifest: {manifest_path}", file=sys.stderr)
+    return progress
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a JSONL or CSV sheet of params through a ViewComfy endpoint")
+    parser.add_argument("sheet", help="A .jsonl file with one params object per line, or a .csv file with a header")
+    parser.add_argument("--view-comfy-api-url", required=True, help="The ViewComfy endpoint")
+    parser.add_argument("--client-id", help="Defaults to $VIEWCOMFY_CLIENT_ID")
+    parser.add_argument("--client-secret", help="Defaults to $VIEWCOMFY_CLIENT_SECRET")
+    parser.add_argument("--api-url", default=API_URL)
+    parser.add_argument("--output-dir", default="outputs", help="Folder the outputs are saved to")
+    parser.add_argument(
+        "--sink",
+        help="Stream the outputs to s3://bucket/prefix (credentials from the AWS_* variables) instead of --output-dir",
+    )
+    parser.add_argument("--s3-endpoint-url", help="S3-compatible endpoint of --sink, e.g. http://127.0.0.1:9000 for MinIO")
+    parser.add_argument("--manifest", help="Results manifest, defaults to <output-dir>/manifest.jsonl")
+    parser.add_argument(
+        "--file-column",
+        action="append",
+        default=[],
+        help="Param key whose values are paths of files to upload. Repeat for several columns.",
+    )
+    parser.add_argument("--base-dir", help="Folder relative file paths are resolved against, defaults to the sheet's")
+    parser.add_argument("--view-comfy-json", help="view_comfy.json to validate rows and find the file columns with")
+    parser.add_argument("--override-workflow-api", help="workflow_api.json every row runs instead of the deployed one")
+    parser.add_argument("--max-pending", type=int, default=64, help="Rows in flight at once")
+    parser.add_argument("--submit-concurrency", type=int, default=4)
+    parser.add_argument("--download-concurrency", type=int, default=4)
+    parser.add_argument("--poll-interval", type=float, default=RESULT_POLL_INTERVAL_SECONDS)
+    parser.add_argument(
+        "--row-timeout",
+        type=float,
+        default=0.0,
+        help=(
+            "Seconds after its submission, server queue included, after which an unfinished row is "
+            "canceled and marked timed_out. 0, the default, waits forever"
+        ),
+    )
+    parser.add_argument("--progress-interval", type=float, default=2.0)
+    parser.add_argument("--start-row", type=int, default=0, help="Skip the rows before this index")
+    parser.add_argument("--no-count", action="store_true", help="Do not count the rows first (no ETA)")
+    parser.add_argument(
+        "--profile",
+        help="Profile the client (CPU, memory, event-loop lag per phase of each row) and write the report to this JSON file",
+    )
+    args = parser.parse_args(argv)
+
+    if not (args.client_id or os.environ.get("VIEWCOMFY_CLIENT_ID")) or not (
+        args.client_secret or os.environ.get("VIEWCOMFY_CLIENT_SECRET")
+    ):
+        parser.error("--client-id and --client-secret (or VIEWCOMFY_CLIENT_ID and VIEWCOMFY_CLIENT_SECRET) are required")
+
+    progress = asyncio.run(run_batch(args))
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
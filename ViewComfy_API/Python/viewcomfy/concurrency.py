@@ -0,0 +1,199 @@
+import asyncio
+import time
+from collections import deque
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from viewcomfy.metrics import ClientMetrics
+
+OVERLOAD_STATUS_CODES = {429, 503}
+# Weight of the newest sample in the smoothed queue latency
+LATENCY_SMOOTHING = 0.2
+
+
+class _EndpointLimit:
+    def __init__(self, *, limit: float, window: int) -> None:
+        self.limit = limit
+        self.in_flight = 0
+        self.waiters: deque[asyncio.Future] = deque()
+        self.samples: deque[float] = deque(maxlen=window)
+        self.smoothed_latency: float | None = None
+        self.last_decrease_at = float("-inf")
+        self.overloads = 0
+
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(
+        self,
+        *,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        increase: float = 1.0,
+        decrease_factor: float = 0.7,
+        latency_tolerance: float = 1.5,
+        latency_slack_seconds: float = 1.0,
+        cooldown_seconds: float = 5.0,
+        window: int = 100,
+        metrics: "ClientMetrics | None" = None,
+    ) -> None:
+        """AIMD limit on the number of in-flight jobs per view_comfy_api_url.
+
+        Each finished infer_with_logs job reports its queue latency: the time it spent
+        on the platform other than running the workflow (end-to-end time minus
+        execution_time_seconds, or the time to the first log message when there is no
+        result). While the smoothed queue latency stays within latency_tolerance of the
+        lowest recent sample, the limit grows by about `increase` per `limit` jobs. When
+        it grows beyond that, or the API answers 429 or 503, the limit is multiplied by
+        decrease_factor, at most once per cooldown_seconds.
+
+        Args:
+            initial_limit (int): Limit of an endpoint before any measurement
+            min_limit (int): Lowest limit
+            max_limit (int): Highest limit
+            increase (float): Additive increase per `limit` jobs with a flat queue latency
+            decrease_factor (float): Multiplicative decrease on congestion
+            latency_tolerance (float): Ratio of the smoothed queue latency to its baseline
+                above which the endpoint is considered congested
+            latency_slack_seconds (float): Extra latency tolerated on top of the ratio, so
+                the jitter of near-zero baselines does not read as congestion
+            cooldown_seconds (float): Minimum time between two decreases
+            window (int): Number of recent samples the baseline is taken from
+            metrics (ClientMetrics, optional): Receives the limit and measurements as gauges
+
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            msg = "Limits must satisfy 1 <= min_limit <= initial_limit <= max_limit"
+            raise Exception(msg)
+
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.latency_slack_seconds = latency_slack_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.window = window
+        self.metrics = metrics
+        self._endpoints: dict[str, _EndpointLimit] = {}
+
+    def _endpoint(self, view_comfy_api_url: str) -> _EndpointLimit:
+        endpoint = self._endpoints.get(view_comfy_api_url)
+        if endpoint is None:
+            endpoint = _EndpointLimit(limit=float(self.initial_limit), window=self.window)
+            self._endpoints[view_comfy_api_url] = endpoint
+        return endpoint
+
+    def limit(self, view_comfy_api_url: str) -> int:
+        """Current number of jobs allowed in flight against the endpoint."""
+        return int(self._endpoint(view_comfy_api_url).limit)
+
+    def in_flight(self, view_comfy_api_url: str) -> int:
+        return self._endpoint(view_comfy_api_url).in_flight
+
+    async def acquire(self, view_comfy_api_url: str) -> None:
+        """Wait for a free slot on the endpoint."""
+        endpoint = self._endpoint(view_comfy_api_url)
+        if endpoint.in_flight < int(endpoint.limit) and not endpoint.waiters:
+            endpoint.in_flight += 1
+            self._export(view_comfy_api_url, endpoint)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        endpoint.waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before the cancellation, pass it on.
+                endpoint.in_flight -= 1
+                self._wake(endpoint)
+            elif waiter in endpoint.waiters:
+                endpoint.waiters.remove(waiter)
+            raise
+        self._export(view_comfy_api_url, endpoint)
+
+    def release(
+        self,
+        view_comfy_api_url: str,
+        *,
+        time_to_first_log: float | None = None,
+        end_to_end_seconds: float | None = None,
+        execution_time_seconds: float | None = None,
+    ) -> None:
+        """Free a slot and record the measurements of the job that held it."""
+        endpoint = self._endpoint(view_comfy_api_url)
+        # Only grow the limit when it is what holds jobs back.
+        saturated = endpoint.in_flight >= int(endpoint.limit) or bool(endpoint.waiters)
+        endpoint.in_flight -= 1
+
+        queue_latency = None
+        if end_to_end_seconds is not None and execution_time_seconds is not None:
+            queue_latency = max(0.0, end_to_end_seconds - execution_time_seconds)
+        elif time_to_first_log is not None:
+            queue_latency = time_to_first_log
+        if queue_latency is not None:
+            self._observe_latency(endpoint, queue_latency, saturated=saturated)
+
+        if self.metrics is not None:
+            if time_to_first_log is not None:
+                self.metrics.set_gauge(
+                    "time_to_first_log_seconds", time_to_first_log, view_comfy_api_url=view_comfy_api_url
+                )
+            if execution_time_seconds is not None:
+                self.metrics.set_gauge(
+                    "execution_time_seconds", execution_time_seconds, view_comfy_api_url=view_comfy_api_url
+                )
+
+        self._wake(endpoint)
+        self._export(view_comfy_api_url, endpoint)
+
+    def on_overload(self, view_comfy_api_url: str) -> None:
+        """Back off after the API answered 429 or 503."""
+        endpoint = self._endpoint(view_comfy_api_url)
+        endpoint.overloads += 1
+        self._decrease(endpoint)
+        self._export(view_comfy_api_url, endpoint)
+
+    def _observe_latency(self, endpoint: _EndpointLimit, queue_latency: float, *, saturated: bool) -> None:
+        endpoint.samples.append(queue_latency)
+        if endpoint.smoothed_latency is None:
+            endpoint.smoothed_latency = queue_latency
+        else:
+            endpoint.smoothed_latency += LATENCY_SMOOTHING * (queue_latency - endpoint.smoothed_latency)
+
+        baseline = min(endpoint.samples)
+        if endpoint.smoothed_latency <= baseline * self.latency_tolerance + self.latency_slack_seconds:
+            if saturated:
+                endpoint.limit = min(float(self.max_limit), endpoint.limit + self.increase / endpoint.limit)
+        else:
+            self._decrease(endpoint)
+
+    def _decrease(self, endpoint: _EndpointLimit) -> None:
+        now = time.monotonic()
+        if now - endpoint.last_decrease_at < self.cooldown_seconds:
+            return
+        endpoint.last_decrease_at = now
+        endpoint.limit = max(float(self.min_limit), endpoint.limit * self.decrease_factor)
+
+    def _wake(self, endpoint: _EndpointLimit) -> None:
+        while endpoint.waiters and endpoint.in_flight < int(endpoint.limit):
+            waiter = endpoint.waiters.popleft()
+            if not waiter.done():
+                endpoint.in_flight += 1
+                waiter.set_result(None)
+
+    def _export(self, view_comfy_api_url: str, endpoint: _EndpointLimit) -> None:
+        if self.metrics is None:
+            return
+        self.metrics.set_gauge("concurrency_limit", int(endpoint.limit), view_comfy_api_url=view_comfy_api_url)
+        self.metrics.set_gauge("in_flight_jobs", endpoint.in_flight, view_comfy_api_url=view_comfy_api_url)
+        self.metrics.set_gauge("waiting_jobs", len(endpoint.waiters), view_comfy_api_url=view_comfy_api_url)
+        if endpoint.smoothed_latency is not None:
+            self.metrics.set_gauge(
+                "queue_latency_seconds", endpoint.smoothed_latency, view_comfy_api_url=view_comfy_api_url
+            )
+            self.metrics.set_gauge(
+                "queue_latency_baseline_seconds", min(endpoint.samples), view_comfy_api_url=view_comfy_api_url
+            )
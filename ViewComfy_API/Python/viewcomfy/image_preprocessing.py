@@ -0,0 +1,289 @@
+"""Shrink input images to the resolution the workflow resizes them to, before upload.
+
+Requires Pillow (pip install viewcomfy[images]).
+"""
+
+import asyncio
+import io
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BufferedReader
+from typing import Any
+
+# Nodes that resize their "image" input, and how to read the target size from their inputs
+RESIZE_NODES = {
+    "ImageScale": "size",
+    "ImageResize+": "size",
+    "ImageScaleToTotalPixels": "megapixels",
+}
+# ImageResize+ settings for which an input shrunk to cover the target gives the same
+# output. "upscale if smaller" would resize the shrunk input but not the original one.
+IMAGE_RESIZE_CONDITIONS = {"always", "downscale if bigger"}
+IMAGE_RESIZE_METHODS = {"stretch", "keep proportion", "fill / crop", "pad"}
+LOAD_IMAGE_NODES = {"LoadImage"}
+JPEG_QUALITY = 95
+
+
+class ImageTarget:
+    def __init__(self, *, width: int = 0, height: int = 0, megapixels: float = 0.0) -> None:
+        """Smallest size an image can be shrunk to without changing the workflow output.
+
+        Args:
+            width (int): Target width, 0 when the resize keeps the aspect ratio from the height
+            height (int): Target height, 0 when the resize keeps the aspect ratio from the width
+            megapixels (float): Target pixel count, for resizes by total pixels
+
+        """
+        self.width = width
+        self.height = height
+        self.megapixels = megapixels
+
+    def scale(self, width: int, height: int) -> float:
+        """Factor that shrinks a width x height image to just cover the target, at most 1."""
+        factors = []
+        if self.width:
+            factors.append(self.width / width)
+        if self.height:
+            factors.append(self.height / height)
+        if self.megapixels:
+            factors.append(math.sqrt(self.megapixels * 1024 * 1024 / (width * height)))
+        if not factors:
+            return 1.0
+        return min(1.0, max(factors))
+
+    def merge(self, other: "ImageTarget") -> "ImageTarget":
+        return ImageTarget(
+            width=max(self.width, other.width),
+            height=max(self.height, other.height),
+            megapixels=max(self.megapixels, other.megapixels),
+        )
+
+
+class PreprocessedImage(BufferedReader):
+    def __init__(self, data: bytes, *, name: str) -> None:
+        """An in-memory image that parse_parameters() uploads like an open file.
+
+        Args:
+            data (bytes): The encoded image
+            name (str): File name sent in the multipart body
+
+        """
+        super().__init__(io.BytesIO(data))
+        self._name = name
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+
+class PreprocessReport:
+    def __init__(self, *, images: int = 0, original_bytes: int = 0, uploaded_bytes: int = 0) -> None:
+        """Sizes of the images of one job before and after preprocessing.
+
+        Args:
+            images (int): Number of images that had a target resolution
+            original_bytes (int): Size of those images as given
+            uploaded_bytes (int): Size of those images as uploaded
+
+        """
+        self.images = images
+        self.original_bytes = original_bytes
+        self.uploaded_bytes = uploaded_bytes
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.uploaded_bytes
+
+
+def image_targets_from_workflow(workflow_api: dict[str, Any]) -> dict[str, ImageTarget]:
+    """Find the image params that the workflow only uses through a resize node.
+
+    Returns:
+        dict[str, ImageTarget]: Target of each param key, e.g. "625-inputs-image"
+
+    """
+    # node id -> (consuming node, output index) for every link in the workflow
+    consumers: dict[str, list[tuple[dict[str, Any], Any]]] = {}
+    for node in workflow_api.values():
+        if not isinstance(node, dict):
+            continue
+        for value in node.get("inputs", {}).values():
+            if isinstance(value, list) and len(value) == 2:
+                consumers.setdefault(str(value[0]), []).append((node, value[1]))
+
+    targets = {}
+    for node_id, node in workflow_api.items():
+        if not isinstance(node, dict) or node.get("class_type") not in LOAD_IMAGE_NODES:
+            continue
+        target = None
+        for consumer, output_index in consumers.get(str(node_id), []):
+            # Output 1 of LoadImage is the mask, which keeps the full resolution.
+            consumer_target = _resize_target(consumer) if output_index == 0 else None
+            if consumer_target is None:
+                # The full-resolution image is used somewhere, keep it as is.
+                target = None
+                break
+            target = consumer_target if target is None else target.merge(consumer_target)
+        if target is not None:
+            targets[f"{node_id}-inputs-image"] = target
+    return targets
+
+
+def _resize_target(node: dict[str, Any]) -> ImageTarget | None:
+    class_type = node.get("class_type", "")
+    kind = RESIZE_NODES.get(class_type)
+    inputs = node.get("inputs", {})
+    if class_type == "ImageResize+" and (
+        inputs.get("condition") not in IMAGE_RESIZE_CONDITIONS or inputs.get("method") not in IMAGE_RESIZE_METHODS
+    ):
+        return None
+    if kind == "size":
+        width, height = inputs.get("width"), inputs.get("height")
+        if isinstance(width, int) and isinstance(height, int) and (width or height):
+            return ImageTarget(width=width, height=height)
+    elif kind == "megapixels":
+        megapixels = inputs.get("megapixels")
+        if isinstance(megapixels, int | float) and megapixels > 0:
+            return ImageTarget(megapixels=float(megapixels))
+    return None
+
+
+def _shrink_image(source: str | bytes, target: ImageTarget, quality: int) -> tuple[bytes | None, int]:
+    """Resize and re-encode one image without its metadata. Runs in a worker process.
+
+    Returns:
+        tuple: The new encoded image, or None when it would not be smaller, and the original size
+
+    """
+    from PIL import Image, ImageOps
+
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            source = f.read()
+    original_size = len(source)
+
+    with Image.open(io.BytesIO(source)) as image:
+        image_format = image.format or "PNG"
+        # LoadImage applies the EXIF orientation, which is dropped with the rest of the metadata.
+        image = ImageOps.exif_transpose(image)
+        scale = target.scale(*image.size)
+        if scale < 1.0:
+            size = (max(1, math.ceil(image.width * scale)), max(1, math.ceil(image.height * scale)))
+            image = image.resize(size, Image.Resampling.LANCZOS)
+
+        output = io.BytesIO()
+        if image_format == "JPEG":
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.save(output, format="JPEG", quality=quality, optimize=True)
+        elif image_format == "WEBP":
+            image.save(output, format="WEBP", quality=quality)
+        else:
+            image.save(output, format="PNG", optimize=True)
+
+    data = output.getvalue()
+    if len(data) >= original_size:
+        return None, original_size
+    return data, original_size
+
+
+class ImagePreprocessor:
+    def __init__(
+        self,
+        *,
+        workflow_api: dict[str, Any],
+        max_workers: int | None = None,
+        quality: int = JPEG_QUALITY,
+    ) -> None:
+        """Shrink image params to the size the workflow resizes them to, in a process pool.
+
+        An image param is only shrunk when every node using it is a resize node
+        (RESIZE_NODES), and never below the largest of their target sizes. Images
+        are also re-encoded without their metadata, and kept as given when that
+        would not make them smaller.
+
+        Args:
+            workflow_api (dict): The deployed workflow_api.json
+            max_workers (int, optional): Size of the process pool, defaults to the CPU count
+            quality (int): JPEG and WebP quality of the re-encoded images
+
+        """
+        try:
+            import PIL  # noqa: F401
+        except ImportError as e:
+            msg = "Image preprocessing requires Pillow: pip install viewcomfy[images]"
+            raise Exception(msg) from e
+
+        self.targets = image_targets_from_workflow(workflow_api)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.quality = quality
+        self._pool: ProcessPoolExecutor | None = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    async def preprocess(
+        self,
+        params: dict[str, Any],
+        *,
+        override_workflow_api: dict[str, Any] | None = None,
+    ) -> tuple[dict[str, Any], PreprocessReport]:
+        """Return params with their images shrunk, and the bytes saved.
+
+        Args:
+            params (dict): Parameters of the workflow, images as files opened in binary mode
+            override_workflow_api (dict, optional): Workflow the job runs instead of the deployed one
+
+        """
+        targets = self.targets
+        if override_workflow_api:
+            targets = image_targets_from_workflow(override_workflow_api)
+
+        keys = [key for key, value in params.items() if key in targets and isinstance(value, BufferedReader)]
+        if not keys:
+            return params, PreprocessReport()
+
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        jobs = []
+        sources = []
+        for key in keys:
+            file = params[key]
+            path = getattr(file, "name", None)
+            if isinstance(path, str) and os.path.isfile(path) and file.tell() == 0:
+                # Workers read the file themselves so the image is not pickled twice.
+                source = path
+            else:
+                source = file.read()
+            sources.append(source)
+            jobs.append(loop.run_in_executor(pool, _shrink_image, source, targets[key], self.quality))
+        results = await asyncio.gather(*jobs)
+
+        params = dict(params)
+        report = PreprocessReport(images=len(keys))
+        for key, source, (data, original_size) in zip(keys, sources, results, strict=True):
+            report.original_bytes += original_size
+            name = os.path.basename(str(getattr(params[key], "name", key)))
+            if data is None:
+                report.uploaded_bytes += original_size
+                if isinstance(source, bytes):
+                    # The file was read to the end, upload the bytes that were read.
+                    params[key] = PreprocessedImage(source, name=name)
+                continue
+            report.uploaded_bytes += len(data)
+            params[key] = PreprocessedImage(data, name=name)
+        return params, report
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self) -> "ImagePreprocessor":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
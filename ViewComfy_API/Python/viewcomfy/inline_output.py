@@ -0,0 +1,171 @@
+"""Streaming decode of outputs that the API returns inlined as base64 ``data``.
+
+The base64 text arrives as a str already held in memory by the parsed infer_info
+response, so decoding it chunk by chunk only bounds the decoded side: a spilled
+output adds no copy to the heap, but the payload is still in memory as text until
+that response is released. Both sides are bounded only once infer_info streams
+strings out of the response.
+"""
+
+import base64
+import binascii
+import io
+import mmap
+import shutil
+import tempfile
+from pathlib import Path
+from typing import BinaryIO
+
+# Decoded outputs larger than this are written to an anonymous temp file and
+# exposed through a memory map instead of being held in the Python heap.
+INLINE_OUTPUT_SPILL_THRESHOLD_BYTES = 8 * 1024 * 1024
+
+# Number of base64 characters decoded per step, a multiple of 4.
+DECODE_CHUNK_CHARS = 4 * 64 * 1024
+
+_WHITESPACE = str.maketrans("", "", " \t\r\n")
+
+
+class Base64StreamDecoder:
+    def __init__(self, sink: BinaryIO) -> None:
+        """Initialize an incremental base64 decoder that writes to sink.
+
+        Chunks can be split at any position; characters that do not complete a
+        4-character group are carried over to the next call.
+
+        Args:
+            sink (BinaryIO): File or buffer receiving the decoded bytes
+
+        """
+        self.sink = sink
+        self.bytes_written = 0
+        self._pending = ""
+
+    def feed(self, chunk: str) -> None:
+        chunk = self._pending + chunk.translate(_WHITESPACE)
+        complete = len(chunk) - len(chunk) % 4
+        self._pending = chunk[complete:]
+        if complete:
+            self._write(chunk[:complete])
+
+    def close(self) -> None:
+        if self._pending:
+            # Tolerate a final group whose "=" padding was stripped.
+            self._write(self._pending + "=" * (-len(self._pending) % 4))
+            self._pending = ""
+
+    def _write(self, encoded: str) -> None:
+        try:
+            decoded = base64.b64decode(encoded, validate=True)
+        except binascii.Error as e:
+            msg = f"Invalid base64 output data: {e!s}"
+            raise Exception(msg) from e
+        self.sink.write(decoded)
+        self.bytes_written += len(decoded)
+
+
+class InlineContent:
+    def __init__(self, buffer: io.BytesIO | None, spill_file: BinaryIO | None, size: int) -> None:
+        """Initialize an InlineContent object. Use decode_inline_output() to create one.
+
+        Args:
+            buffer (io.BytesIO, optional): Decoded bytes kept in memory
+            spill_file (BinaryIO, optional): Temp file holding the decoded bytes
+            size (int): Number of decoded bytes
+
+        """
+        self.size = size
+        self._buffer = buffer
+        self._spill_file = spill_file
+        self._mmap: mmap.mmap | None = None
+        if spill_file is not None and size:
+            self._mmap = mmap.mmap(spill_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def spilled(self) -> bool:
+        """Whether the content lives in a temp file rather than in memory."""
+        return self._spill_file is not None
+
+    @property
+    def view(self) -> memoryview:
+        """Zero-copy view of the decoded bytes."""
+        if self._mmap is not None:
+            return memoryview(self._mmap)
+        if self._buffer is not None:
+            return self._buffer.getbuffer()
+        return memoryview(b"")
+
+    def read(self) -> bytes:
+        return bytes(self.view)
+
+    def save(self, path: str | Path) -> None:
+        """Write the decoded content to path without building an extra copy in memory."""
+        with open(path, "wb") as f:
+            if self._spill_file is not None:
+                self._spill_file.seek(0)
+                shutil.copyfileobj(self._spill_file, f)
+            else:
+                f.write(self.view)
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        self._buffer = None
+
+    def __enter__(self) -> "InlineContent":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def decode_inline_output(
+    data: str,
+    *,
+    spill_threshold: int = INLINE_OUTPUT_SPILL_THRESHOLD_BYTES,
+    spill_dir: str | None = None,
+) -> InlineContent:
+    """Decode base64 output data chunk by chunk into memory or a temp file.
+
+    The decoded bytes are never held next to a full decoded copy, but data itself is
+    already a complete str, see the module docstring.
+
+    Args:
+        data (str): Base64 content, optionally as a "data:<mime>;base64," URI
+        spill_threshold (int): Decoded size above which the content is spilled to disk
+        spill_dir (str, optional): Directory for the temp file, defaults to the system temp dir
+
+    Returns:
+        InlineContent: The decoded content
+
+    """
+    start = 0
+    if data.startswith("data:"):
+        comma = data.find(",")
+        if comma == -1 or not data[:comma].lower().endswith(";base64"):
+            msg = f"Invalid output data URI, expected data:<mime>;base64,<data>: {data[:64]!r}"
+            raise Exception(msg)
+        start = comma + 1
+
+    estimated_size = (len(data) - start) * 3 // 4
+    spill_file = None
+    buffer = None
+    if estimated_size > spill_threshold:
+        spill_file = tempfile.TemporaryFile(dir=spill_dir)
+        sink = spill_file
+    else:
+        buffer = io.BytesIO()
+        sink = buffer
+
+    decoder = Base64StreamDecoder(sink)
+    for offset in range(start, len(data), DECODE_CHUNK_CHARS):
+        decoder.feed(data[offset : offset + DECODE_CHUNK_CHARS])
+    decoder.close()
+
+    if spill_file is not None:
+        spill_file.flush()
+    return InlineContent(buffer, spill_file, decoder.bytes_written)
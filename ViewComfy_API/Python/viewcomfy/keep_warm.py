@@ -0,0 +1,253 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any
+
+from viewcomfy.api import ComfyAPIClient
+
+# Length of the time-of-day slots used to learn when traffic arrives
+TRAFFIC_SLOT_SECONDS = 15 * 60
+SLOTS_PER_DAY = 24 * 3600 // TRAFFIC_SLOT_SECONDS
+# Weight of the newest observation in the cold/warm start averages
+LATENCY_SMOOTHING = 0.3
+DEFAULT_COLD_START_SECONDS = 60.0
+
+
+class DeploymentActivity:
+    def __init__(self, *, view_comfy_api_url: str, warmup_params: dict[str, Any]) -> None:
+        """Initialize the activity of one deployment.
+
+        Args:
+            view_comfy_api_url (str): The ViewComfy endpoint
+            warmup_params (dict): Params of the warm-up jobs
+
+        """
+        self.view_comfy_api_url = view_comfy_api_url
+        self.warmup_params = warmup_params
+        # monotonic time of the last job sent to the deployment, warm-ups included
+        self.last_activity_at: float | None = None
+        # Averages of the delay between submission and the first log message,
+        # after an idle period (cold) or while the deployment was busy (warm).
+        self.cold_start_seconds: float | None = None
+        self.warm_start_seconds: float | None = None
+        # Decayed count of user jobs per time-of-day slot
+        self.slot_traffic = [0.0] * SLOTS_PER_DAY
+        self.warmups_sent = 0
+        self.warmup_in_flight = False
+
+    def is_idle(self, now: float, idle_timeout_seconds: float) -> bool:
+        return self.last_activity_at is None or now - self.last_activity_at > idle_timeout_seconds
+
+
+class KeepWarmScheduler:
+    def __init__(
+        self,
+        *,
+        client: ComfyAPIClient,
+        idle_timeout_seconds: float = 300.0,
+        max_warmups_per_hour: int = 6,
+        traffic_threshold: float = 0.5,
+        check_interval_seconds: float = 30.0,
+        traffic_decay: float = 0.9,
+    ) -> None:
+        """Keep deployments warm ahead of their predicted traffic.
+
+        The scheduler attaches itself to client, so every job the client sends counts
+        as activity, and infer_with_logs jobs report their cold-start latency (the
+        delay between submission and the first infer_log_message). It learns at what
+        time of day each deployment receives traffic, and when traffic is expected
+        within the observed cold-start latency of a deployment that has been idle for
+        longer than idle_timeout_seconds, it sends a warm-up job with the deployment's
+        warmup_params.
+
+        Args:
+            client (ComfyAPIClient): Client used for the user jobs and the warm-ups
+            idle_timeout_seconds (float): Idle time after which a deployment is assumed to
+                have scaled down and the next job to hit a cold start
+            max_warmups_per_hour (int): Budget of warm-up jobs, across all deployments
+            traffic_threshold (float): Decayed job count a time-of-day slot needs before
+                traffic is expected in it
+            check_interval_seconds (float): How often run() looks for deployments to warm up
+            traffic_decay (float): Factor applied to the slot counts once per day, so
+                old traffic patterns fade out
+
+        """
+        self.client = client
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.max_warmups_per_hour = max_warmups_per_hour
+        self.traffic_threshold = traffic_threshold
+        self.check_interval_seconds = check_interval_seconds
+        self.traffic_decay = traffic_decay
+
+        self.deployments: dict[str, DeploymentActivity] = {}
+        self._warmup_times: deque[float] = deque()
+        self._tasks: set[asyncio.Task] = set()
+        self._last_decay_day: int | None = None
+        self._runner: asyncio.Task | None = None
+        client.keep_warm = self
+
+    def register(self, *, view_comfy_api_url: str, warmup_params: dict[str, Any] | None = None) -> None:
+        """Keep a deployment warm.
+
+        Args:
+            view_comfy_api_url (str): The ViewComfy endpoint
+            warmup_params (dict, optional): Params of the warm-up jobs. Keep them cheap,
+                e.g. only a seed. Defaults to the deployed workflow's defaults.
+
+        """
+        activity = self.deployments.get(view_comfy_api_url)
+        if activity is None:
+            self.deployments[view_comfy_api_url] = DeploymentActivity(
+                view_comfy_api_url=view_comfy_api_url,
+                warmup_params=warmup_params or {},
+            )
+        elif warmup_params is not None:
+            activity.warmup_params = warmup_params
+
+    def record_submit(self, view_comfy_api_url: str, *, warmup: bool = False) -> bool:
+        """Record a job sent to a deployment.
+
+        Returns:
+            bool: Whether the deployment was idle, i.e. whether this job likely hits a cold start
+
+        """
+        activity = self.deployments.get(view_comfy_api_url)
+        if activity is None:
+            return False
+        now = time.monotonic()
+        was_idle = activity.is_idle(now, self.idle_timeout_seconds)
+        activity.last_activity_at = now
+        if not warmup:
+            self._decay_traffic()
+            activity.slot_traffic[self._slot(time.time())] += 1.0
+        return was_idle
+
+    def record_first_log(self, view_comfy_api_url: str, *, latency_seconds: float, cold: bool) -> None:
+        """Record the delay between the submission of a job and its first log message."""
+        activity = self.deployments.get(view_comfy_api_url)
+        if activity is None:
+            return
+        if cold:
+            activity.cold_start_seconds = _smooth(activity.cold_start_seconds, latency_seconds)
+        else:
+            activity.warm_start_seconds = _smooth(activity.warm_start_seconds, latency_seconds)
+
+    def expects_traffic(self, view_comfy_api_url: str, *, within_seconds: float) -> bool:
+        """Whether traffic is predicted for the deployment in the next within_seconds."""
+        activity = self.deployments[view_comfy_api_url]
+        now = time.time()
+        first_slot = self._slot(now)
+        last_slot = self._slot(now + within_seconds)
+        slot = first_slot
+        while True:
+            if activity.slot_traffic[slot] >= self.traffic_threshold:
+                return True
+            if slot == last_slot:
+                return False
+            slot = (slot + 1) % SLOTS_PER_DAY
+
+    def due_warmups(self) -> list[str]:
+        """Return the deployments that are idle and expect traffic within their cold-start latency."""
+        now = time.monotonic()
+        due = []
+        for url, activity in self.deployments.items():
+            if activity.warmup_in_flight or not activity.is_idle(now, self.idle_timeout_seconds):
+                continue
+            cold_start = activity.cold_start_seconds or DEFAULT_COLD_START_SECONDS
+            # Warm up early enough for the deployment to be ready when traffic arrives.
+            if self.expects_traffic(url, within_seconds=cold_start + self.check_interval_seconds):
+                due.append(url)
+        return due
+
+    def warm_up(self, view_comfy_api_url: str) -> asyncio.Task | None:
+        """Send a warm-up job now, if the hourly budget allows it.
+
+        Returns:
+            asyncio.Task | None: The running warm-up, None if the budget is spent
+
+        """
+        now = time.monotonic()
+        while self._warmup_times and now - self._warmup_times[0] > 3600:
+            self._warmup_times.popleft()
+        if len(self._warmup_times) >= self.max_warmups_per_hour:
+            return None
+        self._warmup_times.append(now)
+
+        activity = self.deployments[view_comfy_api_url]
+        activity.warmup_in_flight = True
+        activity.warmups_sent += 1
+        task = asyncio.create_task(self._run_warmup(activity))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run_warmup(self, activity: DeploymentActivity) -> None:
+        params = {key: value for key, value in activity.warmup_params.items()}
+        for key in params:
+            if key.endswith("seed"):
+                # A new seed keeps ComfyUI from serving the warm-up from its cache.
+                params[key] = random.randint(0, 2**32 - 1)
+        # The warm-up is recorded here rather than by the client, so it does not
+        # count as user traffic, and its first log measures the cold start.
+        client = self.client._clone_for_job()
+        client.keep_warm = None
+        cold = self.record_submit(activity.view_comfy_api_url, warmup=True)
+        try:
+            await client.infer_with_logs(params=params, view_comfy_api_url=activity.view_comfy_api_url)
+            if client.first_log_at is not None:
+                self.record_first_log(
+                    activity.view_comfy_api_url,
+                    latency_seconds=client.first_log_at - client.submitted_at,
+                    cold=cold,
+                )
+        except Exception as e:
+            print(f"Warm-up of {activity.view_comfy_api_url} failed: {e!s}")
+        finally:
+            activity.warmup_in_flight = False
+
+    async def run(self) -> None:
+        """Warm deployments up ahead of their predicted traffic until cancelled."""
+        while True:
+            for url in self.due_warmups():
+                if self.warm_up(url) is None:
+                    break
+            await asyncio.sleep(self.check_interval_seconds)
+
+    def start(self) -> None:
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop run() and wait for the warm-ups in flight."""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _slot(self, timestamp: float) -> int:
+        local_time = time.localtime(timestamp)
+        return (local_time.tm_hour * 3600 + local_time.tm_min * 60) // TRAFFIC_SLOT_SECONDS
+
+    def _decay_traffic(self) -> None:
+        day = int(time.time() // 86400)
+        if self._last_decay_day is None:
+            self._last_decay_day = day
+            return
+        if day == self._last_decay_day:
+            return
+        factor = self.traffic_decay ** (day - self._last_decay_day)
+        self._last_decay_day = day
+        for activity in self.deployments.values():
+            activity.slot_traffic = [count * factor for count in activity.slot_traffic]
+
+
+def _smooth(average: float | None, value: float) -> float:
+    if average is None:
+        return value
+    return (1 - LATENCY_SMOOTHING) * average + LATENCY_SMOOTHING * value
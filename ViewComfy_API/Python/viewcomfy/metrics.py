@@ -0,0 +1,124 @@
+"""Client-side metrics, exported through prometheus_client when the metrics extra is installed."""
+
+from typing import Any
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+# Prometheus collectors per (namespace, registry). prometheus_client refuses to register
+# a metric name twice, so every ClientMetrics exporting to the same registry shares them.
+_COLLECTORS: dict[tuple[str, Any], dict[str, Any]] = {}
+
+
+class ClientMetrics:
+    def __init__(self, *, namespace: str = "viewcomfy", registry: Any = None) -> None:
+        """Initialize a ClientMetrics object.
+
+        Values are always kept in memory and returned by snapshot(). When
+        prometheus_client is installed they are also exported as Prometheus metrics.
+
+        Args:
+            namespace (str): Prefix of the exported metric names
+            registry (prometheus_client.CollectorRegistry, optional): Registry to export to,
+                defaults to the global prometheus_client registry. Instances with the same
+                namespace and registry export to the same metrics.
+
+        """
+        self.namespace = namespace
+        self._requests: dict[tuple[str, str], int] = {}
+        self._durations: dict[str, list[float]] = {}  # operation -> [count, sum, max]
+        self._gauges: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+        # gauge name -> its label names, fixed by the first set_gauge() call
+        self._gauge_labels: dict[str, tuple[str, ...]] = {}
+
+        self._registry = registry
+        self._collectors: dict[str, Any] = {}
+        if prometheus_client is not None:
+            if registry is None:
+                registry = prometheus_client.REGISTRY
+            self._registry = registry
+            collectors = _COLLECTORS.get((namespace, registry))
+            if collectors is None:
+                collectors = {
+                    "requests": prometheus_client.Counter(
+                        f"{namespace}_requests_total",
+                        "API requests made by the client",
+                        ["operation", "status"],
+                        registry=registry,
+                    ),
+                    "durations": prometheus_client.Histogram(
+                        f"{namespace}_request_duration_seconds",
+                        "Duration of API requests made by the client",
+                        ["operation"],
+                        registry=registry,
+                    ),
+                }
+                _COLLECTORS[(namespace, registry)] = collectors
+            self._collectors = collectors
+
+    def observe_request(self, *, operation: str, status: str | int, duration_seconds: float) -> None:
+        status = str(status)
+        key = (operation, status)
+        self._requests[key] = self._requests.get(key, 0) + 1
+
+        summary = self._durations.setdefault(operation, [0, 0.0, 0.0])
+        summary[0] += 1
+        summary[1] += duration_seconds
+        summary[2] = max(summary[2], duration_seconds)
+
+        if prometheus_client is not None:
+            self._collectors["requests"].labels(operation=operation, status=status).inc()
+            self._collectors["durations"].labels(operation=operation).observe(duration_seconds)
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        """Set a gauge. Every call for the same gauge must pass the same label names."""
+        label_names = tuple(sorted(labels))
+        expected = self._gauge_labels.get(name, label_names)
+        if label_names != expected:
+            msg = f"Gauge {name!r} has the labels {list(expected)}, got {list(label_names)}"
+            raise Exception(msg)
+
+        if prometheus_client is not None:
+            # (gauge, label names), shared with the other instances exporting to the registry
+            entry = self._collectors.get(f"gauge:{name}")
+            if entry is None:
+                gauge = prometheus_client.Gauge(
+                    f"{self.namespace}_{name}",
+                    name.replace("_", " "),
+                    label_names,
+                    registry=self._registry,
+                )
+                entry = self._collectors[f"gauge:{name}"] = (gauge, label_names)
+            gauge, expected = entry
+            if label_names != expected:
+                msg = f"Gauge {name!r} has the labels {list(expected)}, got {list(label_names)}"
+                raise Exception(msg)
+            if labels:
+                gauge.labels(**labels).set(value)
+            else:
+                gauge.set(value)
+
+        self._gauge_labels[name] = label_names
+        self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "requests": [
+                {"operation": operation, "status": status, "count": count}
+                for (operation, status), count in self._requests.items()
+            ],
+            "durations": {
+                operation: {
+                    "count": count,
+                    "avg_seconds": total / count if count else 0.0,
+                    "max_seconds": longest,
+                }
+                for operation, (count, total, longest) in self._durations.items()
+            },
+            "gauges": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._gauges.items()
+            ],
+        }
@@ -0,0 +1,399 @@
+"""Keep job outputs on local disk once per distinct content, with an index by prompt_id.
+
+ContentAddressedStore is an OutputSink. Each output is hashed (SHA-256) while it
+is streamed to a temp file, then stored as blobs/<2 hex>/<digest> unless a blob
+with the same content is already there. outputs/<prompt_id>/<filename> is a hard
+link to the blob, so outputs of different prompts never overwrite each other and
+reruns returning byte-identical files take no extra space.
+
+A SQLite index maps every key ("<prompt_id>/<filename>") to its blob and keeps the
+last access time of each blob. With max_bytes, the least recently used blobs, and
+the outputs linked to them, are removed once the store grows past it.
+
+Layout:
+
+    <root>/blobs/ab/ab12...   content, read-only
+    <root>/outputs/<prompt_id>/<filename>   hard links to the blobs
+    <root>/index.sqlite
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import stat
+import threading
+import time
+import uuid
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING, BinaryIO
+
+from viewcomfy.api import PromptResult
+from viewcomfy.sinks import OutputSink, SinkWriter, transfer_output
+
+if TYPE_CHECKING:
+    import httpx
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access);
+CREATE TABLE IF NOT EXISTS outputs (
+    key TEXT PRIMARY KEY,
+    prompt_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outputs_prompt_id ON outputs (prompt_id);
+CREATE INDEX IF NOT EXISTS outputs_digest ON outputs (digest);
+"""
+
+
+class StoredOutput:
+    def __init__(
+        self,
+        *,
+        key: str,
+        prompt_id: str,
+        filename: str,
+        digest: str,
+        size: int,
+        content_type: str,
+        path: Path,
+    ) -> None:
+        """An output kept by a ContentAddressedStore.
+
+        Args:
+            key (str): Key the output was stored under, "<prompt_id>/<filename>"
+            prompt_id (str): Prompt the output belongs to
+            filename (str): Name of the output file
+            digest (str): SHA-256 of the content
+            size (int): Size of the content in bytes
+            content_type (str): MIME type of the output
+            path (Path): The blob holding the content. Treat it as read-only, it is
+                shared with every identical output.
+
+        """
+        self.key = key
+        self.prompt_id = prompt_id
+        self.filename = filename
+        self.digest = digest
+        self.size = size
+        self.content_type = content_type
+        self.path = path
+
+    def __repr__(self) -> str:
+        return f"StoredOutput({self.key!r}, {self.size} bytes, sha256 {self.digest[:12]})"
+
+
+class _ContentWriter(SinkWriter):
+    def __init__(
+        self,
+        store: "ContentAddressedStore",
+        key: str,
+        content_type: str,
+        partial: Path,
+        file: BinaryIO,
+    ) -> None:
+        self.store = store
+        self.key = key
+        self.content_type = content_type
+        self._hash = hashlib.sha256()
+        self._size = 0
+        self._partial = partial
+        self._file = file
+
+    def _write(self, chunk: bytes | memoryview) -> None:
+        self._file.write(chunk)
+        self._hash.update(chunk)
+
+    async def write(self, chunk: bytes | memoryview) -> None:
+        # Hashing in the same thread as the write keeps the event loop free.
+        await asyncio.to_thread(self._write, chunk)
+        self._size += len(chunk)
+
+    def _close(self) -> Path:
+        self._file.close()
+        return self.store._commit(self.key, self._partial, self._hash.hexdigest(), self._size, self.content_type)
+
+    def _abort(self) -> None:
+        self._file.close()
+        self._partial.unlink(missing_ok=True)
+
+    async def close(self) -> str:
+        # Flushing, renaming, linking and indexing all block, as may the eviction that follows.
+        return str(await asyncio.to_thread(self._close))
+
+    async def abort(self) -> None:
+        await asyncio.to_thread(self._abort)
+
+
+class ContentAddressedStore(OutputSink):
+    def __init__(self, root: str | Path, *, max_bytes: int | None = None, link_outputs: bool = True) -> None:
+        """Store outputs by content hash under a local folder, deduplicating identical files.
+
+        Outputs are written through transfer_output(s) or fetch(), with keys of the form
+        "<prompt_id>/<filename>" (the default of transfer_outputs). Call close(), or
+        use the store as a context manager, to close the index.
+
+        Args:
+            root (str | Path): Folder of the store, created if needed
+            max_bytes (int, optional): Size of the distinct content kept. Past it the least
+                recently written or read blobs are removed with their outputs.
+            link_outputs (bool): Hard link every output as outputs/<prompt_id>/<filename>.
+                Where hard links are not supported a symbolic link is made instead.
+
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.link_outputs = link_outputs
+        (self.root / "tmp").mkdir(parents=True, exist_ok=True)
+        (self.root / "blobs").mkdir(exist_ok=True)
+        # Outputs are committed from worker threads, the lock serializes every use of the index.
+        self._lock = threading.RLock()
+        self._index = sqlite3.connect(self.root / "index.sqlite", check_same_thread=False)
+        self._index.execute("PRAGMA journal_mode=WAL")
+        self._index.execute("PRAGMA synchronous=NORMAL")
+        self._index.executescript(_SCHEMA)
+        self._bytes = self._index.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        self.evicted_blobs = 0
+        self.trim()
+
+    async def open(
+        self,
+        key: str,
+        *,
+        content_type: str = "application/octet-stream",
+        size: int | None = None,
+    ) -> SinkWriter:
+        _check_key(key)
+        partial = self.root / "tmp" / f"{uuid.uuid4().hex}.part"
+        file = await asyncio.to_thread(open, partial, "wb")
+        return _ContentWriter(self, key, content_type, partial, file)
+
+    async def fetch(
+        self,
+        prompt_result: PromptResult,
+        *,
+        http_client: "httpx.AsyncClient",
+        concurrency: int = 4,
+    ) -> list[StoredOutput]:
+        """Store every output of a job, skipping those already stored for its prompt_id.
+
+        Args:
+            prompt_result (PromptResult): The finished job
+            http_client (httpx.AsyncClient): Client the outputs are downloaded with
+            concurrency (int): Number of outputs downloaded at the same time
+
+        Returns:
+            list[StoredOutput]: The stored outputs, in the order of prompt_result.outputs
+
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_one(index: int) -> StoredOutput:
+            output = prompt_result.outputs[index]
+            key = f"{prompt_result.prompt_id}/{Path(output.filename).name}"
+            stored = self.get(key)
+            if stored is None:
+                async with semaphore:
+                    await transfer_output(output, self, key, http_client=http_client)
+                stored = self.get(key, touch=False)
+            return stored
+
+        return list(await asyncio.gather(*(fetch_one(i) for i in range(len(prompt_result.outputs)))))
+
+    def get(self, key: str, *, touch: bool = True) -> StoredOutput | None:
+        """The output stored under key, marking its blob as used unless touch is False."""
+        with self._lock:
+            row = self._index.execute(
+                "SELECT o.key, o.prompt_id, o.filename, o.digest, b.size, o.content_type"
+                " FROM outputs o JOIN blobs b ON b.digest = o.digest WHERE o.key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            if touch:
+                self._touch(row[3])
+        return self._stored_output(row)
+
+    def outputs(self, prompt_id: str) -> list[StoredOutput]:
+        """Every output stored for a prompt."""
+        with self._lock:
+            rows = self._index.execute(
+                "SELECT o.key, o.prompt_id, o.filename, o.digest, b.size, o.content_type"
+                " FROM outputs o JOIN blobs b ON b.digest = o.digest WHERE o.prompt_id = ? ORDER BY o.key",
+                (prompt_id,),
+            ).fetchall()
+            for digest in {row[3] for row in rows}:
+                self._touch(digest)
+        return [self._stored_output(row) for row in rows]
+
+    def read_bytes(self, key: str) -> bytes:
+        stored = self.get(key)
+        if stored is None:
+            msg = f"No output is stored under {key!r}"
+            raise Exception(msg)
+        return stored.path.read_bytes()
+
+    def stats(self) -> dict[str, int]:
+        """Outputs and blobs kept, their size, and the bytes saved by deduplication."""
+        with self._lock:
+            outputs, logical_bytes = self._index.execute(
+                "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM outputs o JOIN blobs b ON b.digest = o.digest",
+            ).fetchone()
+            blobs = self._index.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+        return {
+            "outputs": outputs,
+            "blobs": blobs,
+            "bytes": self._bytes,
+            "deduplicated_bytes": logical_bytes - self._bytes,
+            "evicted_blobs": self.evicted_blobs,
+        }
+
+    def trim(self, max_bytes: int | None = None, *, keep: str | None = None) -> int:
+        """Remove the least recently used blobs, and their outputs, until the store fits max_bytes.
+
+        Args:
+            max_bytes (int, optional): Defaults to the max_bytes of the store
+            keep (str, optional): Digest of a blob that is never removed
+
+        Returns:
+            int: Number of blobs removed
+
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        if max_bytes is None:
+            return 0
+        removed = 0
+        with self._lock:
+            while self._bytes > max_bytes:
+                rows = self._index.execute(
+                    "SELECT digest FROM blobs WHERE digest != ? ORDER BY last_access LIMIT 64",
+                    (keep or "",),
+                ).fetchall()
+                if not rows:
+                    break
+                for (digest,) in rows:
+                    self._remove_blob(digest)
+                    removed += 1
+                    if self._bytes <= max_bytes:
+                        break
+                self._index.commit()
+            self.evicted_blobs += removed
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._index.close()
+
+    async def aclose(self) -> None:
+        self.close()
+
+    def __enter__(self) -> "ContentAddressedStore":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _commit(self, key: str, partial: Path, digest: str, size: int, content_type: str) -> Path:
+        with self._lock:
+            blob = self._blob_path(digest)
+            now = time.time()
+            if blob.exists():
+                partial.unlink()
+            else:
+                blob.parent.mkdir(exist_ok=True)
+                partial.chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+                os.replace(partial, blob)
+            known = self._index.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone() is not None
+            self._index.execute(
+                "INSERT INTO blobs (digest, size, last_access) VALUES (?, ?, ?)"
+                " ON CONFLICT (digest) DO UPDATE SET last_access = excluded.last_access",
+                (digest, size, now),
+            )
+            if not known:
+                self._bytes += size
+
+            previous = self._index.execute("SELECT digest FROM outputs WHERE key = ?", (key,)).fetchone()
+            prompt_id, _, filename = key.rpartition("/")
+            self._index.execute(
+                "INSERT OR REPLACE INTO outputs (key, prompt_id, filename, digest, content_type, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, prompt_id, filename, digest, content_type, now),
+            )
+            if previous is not None and previous[0] != digest:
+                self._remove_orphan(previous[0])
+            self._index.commit()
+
+            location = blob
+            if self.link_outputs:
+                location = self._link(blob, self.root / "outputs" / key)
+            if self.max_bytes is not None and self._bytes > self.max_bytes:
+                self.trim(keep=digest)
+            return location
+
+    def _link(self, blob: Path, path: Path) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staged = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        try:
+            os.link(blob, staged)
+        except OSError:
+            try:
+                staged.symlink_to(os.path.relpath(blob, path.parent))
+            except OSError:
+                return blob
+        # Replacing keeps an output that is fetched again visible at all times.
+        os.replace(staged, path)
+        return path
+
+    def _touch(self, digest: str) -> None:
+        self._index.execute("UPDATE blobs SET last_access = ? WHERE digest = ?", (time.time(), digest))
+        self._index.commit()
+
+    def _remove_orphan(self, digest: str) -> None:
+        if self._index.execute("SELECT 1 FROM outputs WHERE digest = ? LIMIT 1", (digest,)).fetchone() is None:
+            self._remove_blob(digest)
+
+    def _remove_blob(self, digest: str) -> None:
+        blob = self._blob_path(digest)
+        if blob.exists():
+            # Read-only files, and their hard links, cannot be removed on Windows.
+            blob.chmod(stat.S_IWUSR | stat.S_IRUSR)
+        for (key,) in self._index.execute("SELECT key FROM outputs WHERE digest = ?", (digest,)).fetchall():
+            path = self.root / "outputs" / key
+            if path.is_symlink() or path.exists():
+                path.unlink()
+        self._index.execute("DELETE FROM outputs WHERE digest = ?", (digest,))
+        size = self._index.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        self._index.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        if size is not None:
+            self._bytes -= size[0]
+        blob.unlink(missing_ok=True)
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / "blobs" / digest[:2] / digest
+
+    def _stored_output(self, row: tuple) -> StoredOutput:
+        key, prompt_id, filename, digest, size, content_type = row
+        return StoredOutput(
+            key=key,
+            prompt_id=prompt_id,
+            filename=filename,
+            digest=digest,
+            size=size,
+            content_type=content_type,
+            path=self._blob_path(digest),
+        )
+
+
+def _check_key(key: str) -> None:
+    parts = PurePosixPath(key).parts
+    if not parts or key.startswith("/") or any(part in ("..", ".") for part in parts) or "\\" in key:
+        msg = f"Invalid output key {key!r}, expected <prompt_id>/<filename>"
+        raise Exception(msg)
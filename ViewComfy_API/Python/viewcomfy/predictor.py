@@ -0,0 +1,299 @@
+"""Predict the execution time of a job from its params and past jobs of the same workflow.
+
+Execution time is modelled per workflow (a deployment, or an override workflow
+sent to it) as a linear function of a few costs derived from the params:
+
+    seconds = a + b * steps + c * pixels + d * steps * pixels + e * upscaled_pixels
+
+where pixels is megapixels * frames * batch_size and upscaled_pixels is pixels
+* upscale_by^2. The model is refit from running sums of every recorded job, so
+recording and predicting take constant time and memory whatever the history.
+"""
+
+import json
+import math
+import re
+from pathlib import Path
+from typing import Any
+
+from viewcomfy.workflow_delta import workflow_hash
+
+FEATURE_NAMES = ("intercept", "steps", "pixels", "steps_x_pixels", "upscaled_pixels")
+
+# Input names, of any node, that the features are read from
+STEPS_INPUTS = ("steps",)
+WIDTH_INPUTS = ("width", "empty_latent_width")
+HEIGHT_INPUTS = ("height", "empty_latent_height")
+# Square resolution given as a single side
+RESOLUTION_INPUTS = ("resolution",)
+FRAME_INPUTS = ("length", "frames", "frame_count", "num_frames", "video_length", "video_frames")
+UPSCALE_INPUTS = ("upscale_by", "scale_by")
+BATCH_INPUTS = ("batch_size",)
+
+_PARAM_KEY = re.compile(r"^(?P<node>[^-]+)-inputs-(?P<name>.+)$")
+
+
+def extract_job_params(params: dict[str, Any]) -> dict[str, float]:
+    """Read steps, resolution, frame count, upscale_by and batch size from flattened params.
+
+    Steps of several samplers add up. Resolution is the largest width x height of a
+    single node, and frames, upscale_by and batch size the largest value found.
+    Missing values default to 1 (0 steps counts as 1).
+    """
+    steps = 0.0
+    sizes: dict[str, dict[str, float]] = {}
+    megapixels = frames = upscale_by = batch_size = 0.0
+    for key, value in params.items():
+        match = _PARAM_KEY.match(key)
+        if match is None:
+            continue
+        number = _number(value)
+        if number is None:
+            continue
+        node, name = match.group("node"), match.group("name")
+        if name in STEPS_INPUTS:
+            steps += number
+        elif name in WIDTH_INPUTS:
+            sizes.setdefault(node, {})["width"] = number
+        elif name in HEIGHT_INPUTS:
+            sizes.setdefault(node, {})["height"] = number
+        elif name in RESOLUTION_INPUTS:
+            megapixels = max(megapixels, number * number / 1e6)
+        elif name in FRAME_INPUTS:
+            frames = max(frames, number)
+        elif name in UPSCALE_INPUTS:
+            upscale_by = max(upscale_by, number)
+        elif name in BATCH_INPUTS:
+            batch_size = max(batch_size, number)
+    for size in sizes.values():
+        if "width" in size and "height" in size:
+            megapixels = max(megapixels, size["width"] * size["height"] / 1e6)
+    return {
+        "steps": steps or 1.0,
+        "megapixels": megapixels or 1.0,
+        "frames": frames or 1.0,
+        "upscale_by": upscale_by or 1.0,
+        "batch_size": batch_size or 1.0,
+    }
+
+
+def _number(value: Any) -> float | None:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    elif isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            return None
+    else:
+        return None
+    return number if math.isfinite(number) and number > 0 else None
+
+
+def job_features(job_params: dict[str, float]) -> list[float]:
+    """Regressors of the model, in the order of FEATURE_NAMES."""
+    pixels = job_params["megapixels"] * job_params["frames"] * job_params["batch_size"]
+    steps = job_params["steps"]
+    return [1.0, steps, pixels, steps * pixels, pixels * job_params["upscale_by"] ** 2]
+
+
+class _WorkflowModel:
+    def __init__(self) -> None:
+        size = len(FEATURE_NAMES)
+        self.samples = 0.0
+        # Running sums of x x^T, x y and y^2
+        self.xtx = [[0.0] * size for _ in range(size)]
+        self.xty = [0.0] * size
+        self.yy = 0.0
+        self._coefficients: list[float] | None = None
+
+    def add(self, features: list[float], seconds: float, decay: float) -> None:
+        if decay != 1.0:
+            self.samples *= decay
+            self.yy *= decay
+            for i, row in enumerate(self.xtx):
+                self.xty[i] *= decay
+                for j in range(len(row)):
+                    row[j] *= decay
+        self.samples += 1
+        self.yy += seconds * seconds
+        for i, xi in enumerate(features):
+            self.xty[i] += xi * seconds
+            row = self.xtx[i]
+            for j, xj in enumerate(features):
+                row[j] += xi * xj
+        self._coefficients = None
+
+    def coefficients(self, ridge: float) -> list[float]:
+        if self._coefficients is None:
+            # Ridge relative to each feature's own scale, the intercept is not penalized.
+            matrix = [row[:] for row in self.xtx]
+            for i in range(1, len(matrix)):
+                matrix[i][i] += ridge * matrix[i][i] + 1e-12
+            self._coefficients = _solve(matrix, self.xty[:])
+        return self._coefficients
+
+    def mean(self) -> float:
+        return self.xty[0] / self.xtx[0][0]
+
+    def residual_seconds(self, ridge: float) -> float | None:
+        """Standard deviation of the errors of the model on the recorded jobs."""
+        degrees = self.samples - len(FEATURE_NAMES)
+        if degrees < 1:
+            return None
+        b = self.coefficients(ridge)
+        fitted = sum(bi * xi for bi, xi in zip(b, self.xty))
+        quadratic = sum(b[i] * self.xtx[i][j] * b[j] for i in range(len(b)) for j in range(len(b)))
+        return math.sqrt(max(0.0, self.yy - 2 * fitted + quadratic) / degrees)
+
+
+def _solve(matrix: list[list[float]], vector: list[float]) -> list[float]:
+    """Solve matrix x = vector by Gaussian elimination with partial pivoting."""
+    size = len(vector)
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda row: abs(matrix[row][column]))
+        if abs(matrix[pivot][column]) < 1e-15:
+            continue
+        matrix[column], matrix[pivot] = matrix[pivot], matrix[column]
+        vector[column], vector[pivot] = vector[pivot], vector[column]
+        for row in range(column + 1, size):
+            factor = matrix[row][column] / matrix[column][column]
+            if factor:
+                for k in range(column, size):
+                    matrix[row][k] -= factor * matrix[column][k]
+                vector[row] -= factor * vector[column]
+    solution = [0.0] * size
+    for row in range(size - 1, -1, -1):
+        if abs(matrix[row][row]) < 1e-15:
+            continue
+        total = vector[row] - sum(matrix[row][k] * solution[k] for k in range(row + 1, size))
+        solution[row] = total / matrix[row][row]
+    return solution
+
+
+class ExecutionTimePredictor:
+    def __init__(self, *, min_samples: int = 8, ridge: float = 1e-3, decay: float = 1.0) -> None:
+        """Learn the execution time of each workflow from execution_time_seconds of finished jobs.
+
+        Pass it to ComfyAPIClient(execution_predictor=...) to record every successful
+        infer_with_logs job, and the viewcomfy-batch jobs, automatically.
+
+        Args:
+            min_samples (int): Jobs recorded for a workflow before the regression is used.
+                Until then predict() returns the mean execution time of the workflow.
+            ridge (float): Regularization that keeps the fit stable when some params
+                never vary, relative to the scale of each feature
+            decay (float): Weight kept by past jobs at each new one, below 1 to follow
+                a deployment whose speed changes, e.g. 0.99
+
+        """
+        self.min_samples = min_samples
+        self.ridge = ridge
+        self.decay = decay
+        self._models: dict[str, _WorkflowModel] = {}
+
+    def workflow_key(self, view_comfy_api_url: str, override_workflow_api: dict[str, Any] | None = None) -> str:
+        """Key of the model: the endpoint, and the hash of the override workflow if any."""
+        if not override_workflow_api:
+            return view_comfy_api_url
+        return f"{view_comfy_api_url}#{workflow_hash(override_workflow_api)}"
+
+    def record(
+        self,
+        *,
+        params: dict[str, Any],
+        execution_time_seconds: float,
+        view_comfy_api_url: str,
+        override_workflow_api: dict[str, Any] | None = None,
+    ) -> None:
+        """Learn from a finished job."""
+        self.record_job_params(
+            self.workflow_key(view_comfy_api_url, override_workflow_api),
+            extract_job_params(params),
+            execution_time_seconds,
+        )
+
+    def record_job_params(self, workflow_key: str, job_params: dict[str, float], execution_time_seconds: float) -> None:
+        """Learn from a finished job whose params were reduced with extract_job_params()."""
+        if not math.isfinite(execution_time_seconds) or execution_time_seconds < 0:
+            return
+        model = self._models.setdefault(workflow_key, _WorkflowModel())
+        model.add(job_features(job_params), execution_time_seconds, self.decay)
+
+    def predict(
+        self,
+        *,
+        params: dict[str, Any],
+        view_comfy_api_url: str,
+        override_workflow_api: dict[str, Any] | None = None,
+    ) -> float | None:
+        """Expected execution time of a job in seconds, None when nothing was recorded for its workflow."""
+        return self.predict_job_params(
+            self.workflow_key(view_comfy_api_url, override_workflow_api),
+            extract_job_params(params),
+        )
+
+    def predict_job_params(self, workflow_key: str, job_params: dict[str, float]) -> float | None:
+        model = self._models.get(workflow_key)
+        if model is None:
+            return None
+        if model.samples < self.min_samples:
+            return model.mean()
+        coefficients = model.coefficients(self.ridge)
+        seconds = sum(b * x for b, x in zip(coefficients, job_features(job_params)))
+        return max(0.0, seconds)
+
+    def predict_timeout(
+        self,
+        *,
+        params: dict[str, Any],
+        view_comfy_api_url: str,
+        override_workflow_api: dict[str, Any] | None = None,
+        margin: float = 3.0,
+        minimum_seconds: float = 30.0,
+    ) -> float | None:
+        """A timeout for the job: the prediction plus margin times the typical error of the model.
+
+        Until the model has enough jobs to measure its error, the prediction is doubled.
+        Queueing and cold starts are not included, add them for end-to-end timeouts.
+        """
+        key = self.workflow_key(view_comfy_api_url, override_workflow_api)
+        predicted = self.predict_job_params(key, extract_job_params(params))
+        if predicted is None:
+            return None
+        residual = self._models[key].residual_seconds(self.ridge) if self._models[key].samples >= self.min_samples else None
+        if residual is None:
+            return max(minimum_seconds, 2 * predicted)
+        return max(minimum_seconds, predicted + margin * residual)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Jobs recorded, coefficients and typical error of every workflow."""
+        return {
+            key: {
+                "samples": model.samples,
+                "mean_seconds": model.mean(),
+                "coefficients": dict(zip(FEATURE_NAMES, model.coefficients(self.ridge))),
+                "residual_seconds": model.residual_seconds(self.ridge),
+            }
+            for key, model in self._models.items()
+        }
+
+    def save(self, path: str | Path) -> None:
+        """Write the running sums of every workflow to a JSON file."""
+        state = {
+            key: {"samples": model.samples, "xtx": model.xtx, "xty": model.xty, "yy": model.yy}
+            for key, model in self._models.items()
+        }
+        Path(path).write_text(json.dumps(state))
+
+    def load(self, path: str | Path) -> None:
+        """Restore the workflows saved with save(), replacing those with the same key."""
+        for key, state in json.loads(Path(path).read_text()).items():
+            model = _WorkflowModel()
+            model.samples = state["samples"]
+            model.xtx = state["xtx"]
+            model.xty = state["xty"]
+            model.yy = state["yy"]
+            self._models[key] = model
@@ -0,0 +1,368 @@
+"""Opt-in profiling of the client: CPU, memory and event-loop lag, per phase of each job.
+
+A ClientProfiler records, while it runs:
+
+- CPU: cProfile over the whole run, or pyinstrument's statistical sampler when it
+  is installed and asked for, plus the CPU time spent in each phase.
+- Memory: the tracemalloc peak of each phase, above what was allocated when the
+  phase started.
+- Event-loop lag: how late a ticker task wakes up. Lag means something blocked the
+  loop; each late tick is attributed to the jobs whose phases ran since the
+  previous tick.
+
+ComfyAPIClient splits every job into phases (validate, workflow, preprocess,
+encode, submit, wait, results) keyed by prompt_id, and report() ties them
+together. Phases of concurrent jobs overlap: their CPU time and memory peaks
+include the work of the jobs running at the same time, run one job at a time for
+exact per-phase numbers.
+"""
+
+import asyncio
+import json
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from enum import Enum
+from pathlib import Path
+from typing import Any
+
+DEFAULT_LAG_INTERVAL_SECONDS = 0.01
+DEFAULT_LAG_THRESHOLD_SECONDS = 0.05
+# Lag samples kept for the percentiles, the count, mean and max cover every tick
+MAX_LAG_SAMPLES = 100_000
+
+_active_profiler: "ClientProfiler | None" = None
+
+
+def active_profiler() -> "ClientProfiler | None":
+    """The running profiler, picked up by every ComfyAPIClient created without one."""
+    return _active_profiler
+
+
+class CpuProfilerEnum(str, Enum):
+    CProfile = "cprofile"
+    Pyinstrument = "pyinstrument"
+
+
+class _Phase:
+    def __init__(self, name: str, prompt_ids: tuple[str, ...], memory_baseline: int) -> None:
+        self.name = name
+        self.prompt_ids = prompt_ids
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        self.memory_baseline = memory_baseline
+        self.peak_bytes = 0
+
+
+class ClientProfiler:
+    def __init__(
+        self,
+        *,
+        cpu: CpuProfilerEnum | str | None = CpuProfilerEnum.CProfile,
+        memory: bool = True,
+        loop_lag: bool = True,
+        lag_interval_seconds: float = DEFAULT_LAG_INTERVAL_SECONDS,
+        lag_threshold_seconds: float = DEFAULT_LAG_THRESHOLD_SECONDS,
+        top_functions: int = 30,
+    ) -> None:
+        """Profile the client's jobs and write a report tied to their prompt_ids.
+
+        Use it as an async context manager around the run, or call start() and stop().
+        While it runs, every ComfyAPIClient created without a profiler uses it, so
+        the module-level infer() and infer_with_logs() are profiled too. Pass it to
+        ComfyAPIClient(profiler=...) to profile a single client.
+
+        Args:
+            cpu (CpuProfilerEnum, optional): "cprofile" to trace every call, "pyinstrument"
+                to sample the stack (install pyinstrument), None to only time the phases
+            memory (bool): Trace allocations with tracemalloc to measure the peak of each phase.
+                Allocations are slower while tracing.
+            loop_lag (bool): Measure the event-loop lag with a ticker task
+            lag_interval_seconds (float): Period of the ticker
+            lag_threshold_seconds (float): Lag from which a tick is reported as a spike,
+                with the prompt_ids it is attributed to
+            top_functions (int): Functions listed in the CPU section of the report
+
+        """
+        self.cpu = CpuProfilerEnum(cpu) if cpu is not None else None
+        self.memory = memory
+        self.loop_lag = loop_lag
+        self.lag_interval_seconds = lag_interval_seconds
+        self.lag_threshold_seconds = lag_threshold_seconds
+        self.top_functions = top_functions
+
+        self._cpu_profiler: Any = None
+        self._owns_tracemalloc = False
+        self._lag_task: asyncio.Task | None = None
+        self._started_at: float | None = None
+        self._started_perf: float | None = None
+        self._duration_seconds: float | None = None
+        self._memory_peak_bytes = 0
+
+        self._open: list[_Phase] = []
+        # Phases that ran since the last tick, what a late tick is attributed to
+        self._since_tick: set[tuple[str, str]] = set()
+        self._phases: list[dict[str, Any]] = []
+        self._lag_count = 0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        self._lag_samples: list[float] = []
+        self._lag_spikes: list[dict[str, Any]] = []
+
+    @property
+    def is_running(self) -> bool:
+        return self._started_perf is not None and self._duration_seconds is None
+
+    def start(self) -> None:
+        """Start profiling. The lag ticker only runs when called from a running event loop."""
+        global _active_profiler
+        if _active_profiler is not None:
+            raise Exception("Another ClientProfiler is already running")
+        if self._started_perf is not None:
+            raise Exception("A ClientProfiler can only run once")
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        if self.cpu == CpuProfilerEnum.CProfile:
+            import cProfile
+
+            self._cpu_profiler = cProfile.Profile()
+            self._cpu_profiler.enable()
+        elif self.cpu == CpuProfilerEnum.Pyinstrument:
+            try:
+                import pyinstrument
+            except ImportError as e:
+                msg = "pyinstrument is required for cpu='pyinstrument', install it with pip install pyinstrument"
+                raise Exception(msg) from e
+            self._cpu_profiler = pyinstrument.Profiler(async_mode="disabled")
+            self._cpu_profiler.start()
+
+        if self.loop_lag:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+            else:
+                self._lag_task = asyncio.create_task(self._measure_lag())
+
+        self._started_at = time.time()
+        self._started_perf = time.perf_counter()
+        _active_profiler = self
+
+    def stop(self) -> None:
+        global _active_profiler
+        if not self.is_running:
+            return
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+        if self.cpu == CpuProfilerEnum.CProfile:
+            self._cpu_profiler.disable()
+        elif self.cpu == CpuProfilerEnum.Pyinstrument:
+            self._cpu_profiler.stop()
+        if tracemalloc.is_tracing():
+            self._fold_memory()
+            self._memory_peak_bytes = max(self._memory_peak_bytes, tracemalloc.get_traced_memory()[1])
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+        self._duration_seconds = time.perf_counter() - self._started_perf
+        if _active_profiler is self:
+            _active_profiler = None
+
+    async def __aenter__(self) -> "ClientProfiler":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        task = self._lag_task
+        self.stop()
+        if task is not None:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    @contextmanager
+    def phase(self, name: str, prompt_id: str | list[str] | None = None) -> Iterator[None]:
+        """Time a phase of the job(s) prompt_id, or of the client when None."""
+        if not self.is_running:
+            yield
+            return
+        if isinstance(prompt_id, str):
+            prompt_ids: tuple[str, ...] = (prompt_id,)
+        else:
+            prompt_ids = tuple(prompt_id or ())
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            self._fold_memory()
+        phase = _Phase(name, prompt_ids, tracemalloc.get_traced_memory()[0] if tracing else 0)
+        self._open.append(phase)
+        for id_ in prompt_ids or ("",):
+            self._since_tick.add((id_, name))
+        try:
+            yield
+        finally:
+            if tracing and tracemalloc.is_tracing():
+                self._fold_memory()
+            self._open.remove(phase)
+            self._phases.append(
+                {
+                    "phase": name,
+                    "prompt_ids": list(prompt_ids),
+                    "start_seconds": phase.started - self._started_perf,
+                    "wall_seconds": time.perf_counter() - phase.started,
+                    "cpu_seconds": time.process_time() - phase.cpu_started,
+                    "peak_bytes": phase.peak_bytes if tracing else None,
+                },
+            )
+
+    def _fold_memory(self) -> None:
+        """Credit the peak since the last fold to every open phase, then start a new peak.
+
+        The tracemalloc peak is global, folding it at every phase boundary lets
+        overlapping phases each keep their own maximum.
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        self._memory_peak_bytes = max(self._memory_peak_bytes, peak)
+        for phase in self._open:
+            phase.peak_bytes = max(phase.peak_bytes, peak - phase.memory_baseline)
+        tracemalloc.reset_peak()
+
+    async def _measure_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.lag_interval_seconds
+            await asyncio.sleep(self.lag_interval_seconds)
+            lag = max(0.0, loop.time() - expected)
+            self._lag_count += 1
+            self._lag_total += lag
+            self._lag_max = max(self._lag_max, lag)
+            if len(self._lag_samples) < MAX_LAG_SAMPLES:
+                self._lag_samples.append(lag)
+            if lag >= self.lag_threshold_seconds:
+                self._lag_spikes.append(
+                    {
+                        "at_seconds": time.perf_counter() - self._started_perf,
+                        "lag_seconds": lag,
+                        "phases": sorted({f"{id_}:{name}" if id_ else name for id_, name in self._since_tick}),
+                    },
+                )
+            self._since_tick = {(id_, phase.name) for phase in self._open for id_ in phase.prompt_ids or ("",)}
+
+    def report(self) -> dict[str, Any]:
+        """The profile as a JSON-serializable dict: totals per phase, per prompt_id, lag and CPU hotspots."""
+        duration = self._duration_seconds
+        if duration is None and self._started_perf is not None:
+            duration = time.perf_counter() - self._started_perf
+
+        phases: dict[str, dict[str, Any]] = {}
+        prompts: dict[str, dict[str, Any]] = {}
+        for record in self._phases:
+            total = phases.setdefault(
+                record["phase"],
+                {"count": 0, "wall_seconds": 0.0, "max_wall_seconds": 0.0, "cpu_seconds": 0.0, "max_peak_bytes": None},
+            )
+            total["count"] += 1
+            total["wall_seconds"] += record["wall_seconds"]
+            total["max_wall_seconds"] = max(total["max_wall_seconds"], record["wall_seconds"])
+            total["cpu_seconds"] += record["cpu_seconds"]
+            if record["peak_bytes"] is not None:
+                total["max_peak_bytes"] = max(total["max_peak_bytes"] or 0, record["peak_bytes"])
+            for prompt_id in record["prompt_ids"]:
+                prompt = prompts.setdefault(prompt_id, {"phases": [], "lag_spikes": 0, "max_lag_seconds": 0.0})
+                prompt["phases"].append({key: record[key] for key in record if key != "prompt_ids"})
+
+        for spike in self._lag_spikes:
+            for prompt_id in {entry.rpartition(":")[0] for entry in spike["phases"]}:
+                if prompt_id in prompts:
+                    prompts[prompt_id]["lag_spikes"] += 1
+                    prompts[prompt_id]["max_lag_seconds"] = max(prompts[prompt_id]["max_lag_seconds"], spike["lag_seconds"])
+
+        samples = sorted(self._lag_samples)
+        loop_lag = {
+            "interval_seconds": self.lag_interval_seconds,
+            "ticks": self._lag_count,
+            "mean_seconds": self._lag_total / self._lag_count if self._lag_count else None,
+            "p50_seconds": _percentile(samples, 0.5),
+            "p99_seconds": _percentile(samples, 0.99),
+            "max_seconds": self._lag_max if self._lag_count else None,
+            "spikes": self._lag_spikes,
+        }
+        return {
+            "started_at": self._started_at,
+            "duration_seconds": duration,
+            "phases": phases,
+            "prompts": prompts,
+            "loop_lag": loop_lag if self.loop_lag else None,
+            "memory": {"peak_bytes": self._memory_peak_bytes} if self.memory else None,
+            "cpu": self._cpu_report(),
+        }
+
+    def _cpu_report(self) -> dict[str, Any] | None:
+        if self._cpu_profiler is None:
+            return None
+        if self.cpu == CpuProfilerEnum.Pyinstrument:
+            if self.is_running:
+                return None
+            return {"profiler": self.cpu.value, "text": self._cpu_profiler.output_text(unicode=False, color=False)}
+
+        import pstats
+
+        stats = pstats.Stats(self._cpu_profiler)
+        functions = []
+        for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            functions.append(
+                {
+                    "function": f"{filename}:{line}({function})",
+                    "calls": calls,
+                    "own_seconds": own,
+                    "cumulative_seconds": cumulative,
+                },
+            )
+        functions.sort(key=lambda entry: entry["own_seconds"], reverse=True)
+        return {"profiler": self.cpu.value, "top_functions": functions[: self.top_functions]}
+
+    def summary(self) -> str:
+        """A short text version of the report."""
+        report = self.report()
+        lines = [f"Profile of {report['duration_seconds'] or 0:.2f}s, {len(report['prompts'])} prompts"]
+        lines.append(f"{'phase':<12}{'count':>7}{'wall s':>10}{'max s':>9}{'cpu s':>9}{'peak MiB':>10}")
+        for name, total in sorted(report["phases"].items(), key=lambda item: -item[1]["cpu_seconds"]):
+            peak = f"{total['max_peak_bytes'] / 2**20:.1f}" if total["max_peak_bytes"] is not None else "-"
+            lines.append(
+                f"{name:<12}{total['count']:>7}{total['wall_seconds']:>10.3f}{total['max_wall_seconds']:>9.3f}"
+                f"{total['cpu_seconds']:>9.3f}{peak:>10}",
+            )
+        loop_lag = report["loop_lag"]
+        if loop_lag and loop_lag["ticks"]:
+            lines.append(
+                f"Event-loop lag: p50 {loop_lag['p50_seconds'] * 1000:.1f} ms, p99 {loop_lag['p99_seconds'] * 1000:.1f} ms, "
+                f"max {loop_lag['max_seconds'] * 1000:.1f} ms, {len(loop_lag['spikes'])} ticks over "
+                f"{self.lag_threshold_seconds * 1000:.0f} ms",
+            )
+        cpu = report["cpu"]
+        if cpu and cpu.get("top_functions"):
+            lines.append("Most CPU (own time):")
+            for entry in cpu["top_functions"][:10]:
+                lines.append(f"  {entry['own_seconds']:8.3f}s {entry['calls']:>8} calls  {entry['function']}")
+        return "\n".join(lines)
+
+    def save(self, path: str | Path) -> None:
+        """Write report() to a JSON file."""
+        Path(path).write_text(json.dumps(self.report(), indent=2))
+
+    def dump_stats(self, path: str | Path) -> None:
+        """Write the raw cProfile stats, e.g. for snakeviz, or the pyinstrument HTML report."""
+        if self.cpu == CpuProfilerEnum.CProfile:
+            self._cpu_profiler.dump_stats(str(path))
+        elif self.cpu == CpuProfilerEnum.Pyinstrument:
+            Path(path).write_text(self._cpu_profiler.output_html())
+        else:
+            raise Exception("No CPU profile was recorded, cpu is None")
+
+
+def _percentile(samples: list[float], fraction: float) -> float | None:
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
@@ -0,0 +1,304 @@
+import random
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Any
+
+from viewcomfy.api import ComfyAPIClient, PromptResult, PromptScheduled
+from viewcomfy.validation import ParamValidationError
+from viewcomfy.weights import UnsupportedWeightsError
+from viewcomfy.workflow_delta import workflow_hash
+
+# Weight of the newest sample in the latency estimates
+LATENCY_SMOOTHING = 0.2
+# Number of override workflows whose endpoint is remembered
+MAX_STICKY_WORKFLOWS = 1024
+# Errors raised before anything is sent, which say nothing about the endpoint
+_CLIENT_ERRORS = (ParamValidationError, UnsupportedWeightsError)
+
+
+class EndpointStats:
+    def __init__(self, *, view_comfy_api_url: str) -> None:
+        """Live estimates of one deployment.
+
+        Args:
+            view_comfy_api_url (str): The ViewComfy endpoint
+
+        """
+        self.view_comfy_api_url = view_comfy_api_url
+        # Smoothed seconds between the submission of a job and its first log message,
+        # or the start of its execution when only the result is known
+        self.queue_latency_seconds: float | None = None
+        self.execution_time_seconds: float | None = None
+        self.submit_latency_seconds: float | None = None
+        self.in_flight = 0
+        self.completed = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        # monotonic time until which the endpoint receives no jobs
+        self.ejected_until = 0.0
+        # Set while the single job that tests an endpoint back from ejection runs
+        self.probing = False
+
+    @property
+    def is_measured(self) -> bool:
+        return self.queue_latency_seconds is not None or self.submit_latency_seconds is not None
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def is_on_probation(self, now: float) -> bool:
+        return self.ejections > 0 and self.consecutive_failures > 0 and not self.is_ejected(now)
+
+
+class DeploymentRouter:
+    def __init__(
+        self,
+        *,
+        client: ComfyAPIClient,
+        view_comfy_api_urls: Iterable[str],
+        parallelism: int = 1,
+        max_failures: int = 3,
+        ejection_seconds: float = 30.0,
+        max_ejection_seconds: float = 600.0,
+        sticky_slack: float = 1.5,
+    ) -> None:
+        """Send each job to the equivalent deployment expected to complete it first.
+
+        The expected completion time of an endpoint is its queue latency plus its
+        execution time, plus the execution time of the jobs this router already has in
+        flight there, divided by parallelism. Estimates are smoothed from the time to
+        the first log message and execution_time_seconds of infer_with_logs jobs,
+        from the submission latency of infer jobs, and from record_result(). Endpoints
+        without measurements are tried first.
+
+        Jobs with the same override_workflow_api stick to the endpoint that ran it
+        last, where its models are already loaded, unless that endpoint is expected
+        to be more than sticky_slack times slower than the best one.
+
+        After max_failures consecutive failures (submissions that fail, or jobs whose
+        status is not "success") an endpoint is ejected for ejection_seconds,
+        doubled at each new ejection up to max_ejection_seconds.
+        When the ejection ends, a single job probes the endpoint: it is restored if
+        the job succeeds and ejected again otherwise.
+
+        Args:
+            client (ComfyAPIClient): Client used for every job, its collaborators included
+            view_comfy_api_urls (Iterable[str]): Endpoints that run the same workflow
+            parallelism (int): Number of jobs an endpoint runs at the same time
+            max_failures (int): Consecutive failures after which an endpoint is ejected
+            ejection_seconds (float): Duration of the first ejection of an endpoint
+            max_ejection_seconds (float): Longest ejection
+            sticky_slack (float): How much slower than the best endpoint the sticky
+                endpoint of an override workflow may be expected to be
+
+        """
+        self.client = client
+        self.endpoints = {url: EndpointStats(view_comfy_api_url=url) for url in view_comfy_api_urls}
+        if not self.endpoints:
+            msg = "DeploymentRouter needs at least one view_comfy_api_url"
+            raise Exception(msg)
+        self.parallelism = parallelism
+        self.max_failures = max_failures
+        self.ejection_seconds = ejection_seconds
+        self.max_ejection_seconds = max_ejection_seconds
+        self.sticky_slack = sticky_slack
+        # workflow hash -> endpoint that last ran the override workflow
+        self._sticky: OrderedDict[str, str] = OrderedDict()
+
+    def expected_completion_seconds(self, view_comfy_api_url: str) -> float:
+        """Expected time for a job sent now to the endpoint to complete, 0 when it has no measurements."""
+        stats = self.endpoints[view_comfy_api_url]
+        execution = stats.execution_time_seconds or 0.0
+        queue = stats.queue_latency_seconds
+        if queue is None:
+            # Only infer jobs were sent, their submission latency is all that is known.
+            queue = stats.submit_latency_seconds or 0.0
+        return queue + execution + stats.in_flight * execution / self.parallelism
+
+    def choose(self, override_workflow_api: dict[str, Any] | None = None) -> str:
+        """Return the endpoint to send the next job to."""
+        return self._choose(workflow_hash(override_workflow_api) if override_workflow_api else None)
+
+    def _choose(self, sticky_key: str | None) -> str:
+        now = time.monotonic()
+        available = [
+            stats
+            for stats in self.endpoints.values()
+            if not stats.is_ejected(now) and not (stats.probing and stats.is_on_probation(now))
+        ]
+        if not available:
+            # Everything is ejected: use the endpoint that comes back first rather than fail.
+            return min(self.endpoints.values(), key=lambda stats: stats.ejected_until).view_comfy_api_url
+
+        unmeasured = [stats for stats in available if stats.in_flight == 0 and not stats.is_measured]
+        expected = {stats.view_comfy_api_url: self.expected_completion_seconds(stats.view_comfy_api_url) for stats in available}
+        best = min(expected.values())
+
+        if sticky_key is not None:
+            sticky = self._sticky.get(sticky_key)
+            if sticky in expected and expected[sticky] <= best * self.sticky_slack:
+                return sticky
+
+        if unmeasured:
+            return random.choice(unmeasured).view_comfy_api_url
+        candidates = [url for url, seconds in expected.items() if seconds == best]
+        return random.choice(candidates)
+
+    async def infer(
+        self,
+        *,
+        params: dict[str, Any],
+        override_workflow_api: dict[str, Any] | None = None,
+    ) -> PromptScheduled:
+        """Submit a job to the best endpoint. Call record_result() when its result is fetched."""
+        url = self._start(override_workflow_api)
+        started = time.monotonic()
+        # finally, not except: a cancelled call (CancelledError is a BaseException)
+        # must not leak in_flight or leave the endpoint probing.
+        try:
+            scheduled = await self.client.infer(
+                params=params,
+                view_comfy_api_url=url,
+                override_workflow_api=override_workflow_api,
+            )
+        except _CLIENT_ERRORS:
+            raise
+        except Exception:
+            self._record_failure(url)
+            raise
+        finally:
+            self._end(url)
+        stats = self.endpoints[url]
+        stats.submit_latency_seconds = _smooth(stats.submit_latency_seconds, time.monotonic() - started)
+        self._record_success(url)
+        return scheduled
+
+    async def infer_with_logs(
+        self,
+        *,
+        params: dict[str, Any],
+        override_workflow_api: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> PromptResult | None:
+        """Run a job on the best endpoint and learn its queue latency and execution time."""
+        url = self._start(override_workflow_api)
+        client = self.client._clone_for_job()
+        try:
+            prompt_result = await client.infer_with_logs(
+                params=params,
+                view_comfy_api_url=url,
+                override_workflow_api=override_workflow_api,
+                timeout=timeout,
+            )
+        except _CLIENT_ERRORS:
+            raise
+        except Exception:
+            if client.first_log_at is None:
+                # The job never started, the endpoint did not take it.
+                self._record_failure(url)
+            raise
+        finally:
+            self._end(url)
+
+        stats = self.endpoints[url]
+        if client.first_log_at is not None:
+            stats.queue_latency_seconds = _smooth(stats.queue_latency_seconds, client.first_log_at - client.submitted_at)
+        if prompt_result is not None:
+            stats.execution_time_seconds = _smooth(stats.execution_time_seconds, prompt_result.execution_time_seconds)
+            stats.completed += 1
+        self._record_outcome(url, prompt_result)
+        return prompt_result
+
+    def record_result(
+        self,
+        view_comfy_api_url: str,
+        prompt_result: PromptResult,
+        *,
+        end_to_end_seconds: float | None = None,
+    ) -> None:
+        """Learn from the result of an infer job, fetched with infer_info.
+
+        A status other than "success" counts as a failure of the endpoint.
+
+        Args:
+            view_comfy_api_url (str): Endpoint the job was sent to
+            prompt_result (PromptResult): The finished job
+            end_to_end_seconds (float, optional): Time from the submission to the result,
+                which gives the queue latency once the execution time is subtracted
+
+        """
+        stats = self.endpoints.get(view_comfy_api_url)
+        if stats is None:
+            return
+        execution = prompt_result.execution_time_seconds
+        stats.execution_time_seconds = _smooth(stats.execution_time_seconds, execution)
+        if end_to_end_seconds is not None:
+            stats.queue_latency_seconds = _smooth(stats.queue_latency_seconds, max(0.0, end_to_end_seconds - execution))
+        stats.completed += 1
+        self._record_outcome(view_comfy_api_url, prompt_result)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Estimates and health of every endpoint."""
+        now = time.monotonic()
+        return {
+            url: {
+                "expected_completion_seconds": self.expected_completion_seconds(url),
+                "queue_latency_seconds": stats.queue_latency_seconds,
+                "execution_time_seconds": stats.execution_time_seconds,
+                "submit_latency_seconds": stats.submit_latency_seconds,
+                "in_flight": stats.in_flight,
+                "completed": stats.completed,
+                "consecutive_failures": stats.consecutive_failures,
+                "ejected_for_seconds": max(0.0, stats.ejected_until - now),
+            }
+            for url, stats in self.endpoints.items()
+        }
+
+    def _start(self, override_workflow_api: dict[str, Any] | None) -> str:
+        key = workflow_hash(override_workflow_api) if override_workflow_api else None
+        url = self._choose(key)
+        stats = self.endpoints[url]
+        stats.in_flight += 1
+        if stats.is_on_probation(time.monotonic()):
+            stats.probing = True
+        if key is not None:
+            self._sticky[key] = url
+            self._sticky.move_to_end(key)
+            while len(self._sticky) > MAX_STICKY_WORKFLOWS:
+                self._sticky.popitem(last=False)
+        return url
+
+    def _end(self, view_comfy_api_url: str) -> None:
+        stats = self.endpoints[view_comfy_api_url]
+        stats.in_flight -= 1
+        stats.probing = False
+
+    def _record_success(self, view_comfy_api_url: str) -> None:
+        stats = self.endpoints[view_comfy_api_url]
+        stats.consecutive_failures = 0
+        stats.ejections = 0
+
+    def _record_outcome(self, view_comfy_api_url: str, prompt_result: PromptResult | None) -> None:
+        """Count a finished job for the health of its endpoint, only "success" as a success."""
+        if prompt_result is not None and prompt_result.status == "success":
+            self._record_success(view_comfy_api_url)
+        else:
+            self._record_failure(view_comfy_api_url)
+
+    def _record_failure(self, view_comfy_api_url: str) -> None:
+        stats = self.endpoints[view_comfy_api_url]
+        stats.consecutive_failures += 1
+        now = time.monotonic()
+        # A failed probe ejects the endpoint again right away.
+        if stats.consecutive_failures >= self.max_failures or stats.ejections > 0:
+            duration = min(self.max_ejection_seconds, self.ejection_seconds * 2**stats.ejections)
+            stats.ejections += 1
+            stats.ejected_until = now + duration
+            print(f"Ejecting {view_comfy_api_url} for {duration:.0f}s after {stats.consecutive_failures} failures")
+
+
+def _smooth(average: float | None, value: float) -> float:
+    if average is None:
+        return value
+    return (1 - LATENCY_SMOOTHING) * average + LATENCY_SMOOTHING * value
@@ -0,0 +1,382 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any
+
+from viewcomfy.api import ComfyAPIClient, PromptResult, PromptScheduled
+
+DEFAULT_TENANT = "default"
+
+
+class JobPriorityEnum(IntEnum):
+    Interactive = 0
+    Default = 1
+    Bulk = 2
+
+
+class _QueuedJob:
+    def __init__(
+        self,
+        *,
+        seq: int,
+        params: dict[str, Any],
+        view_comfy_api_url: str,
+        override_workflow_api: dict[str, Any] | None,
+        priority: JobPriorityEnum,
+        tenant: str,
+        deadline: float | None,
+        with_logs: bool,
+        future: asyncio.Future,
+    ) -> None:
+        self.seq = seq
+        self.params = params
+        self.view_comfy_api_url = view_comfy_api_url
+        self.override_workflow_api = override_workflow_api
+        self.priority = priority
+        self.tenant = tenant
+        self.deadline = deadline
+        self.with_logs = with_logs
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        # Fails the job when its deadline passes while it is queued
+        self.timer: asyncio.TimerHandle | None = None
+        # Set once the job is dispatched
+        self.task: asyncio.Task | None = None
+
+    def sort_key(self) -> tuple[float, int]:
+        # Earliest deadline first inside a tenant, FIFO for jobs without one.
+        deadline = self.deadline if self.deadline is not None else float("inf")
+        return (deadline, self.seq)
+
+
+class SchedulerStats:
+    def __init__(
+        self,
+        queue_depth: dict[str, dict[str, int]],
+        in_flight: dict[str, int],
+        wait_time_avg_seconds: float,
+        wait_time_p95_seconds: float,
+        wait_time_max_seconds: float,
+        dispatched: int,
+        expired: int,
+    ) -> None:
+        """Initialize a SchedulerStats object.
+
+        Args:
+            queue_depth (dict): Queued jobs per view_comfy_api_url and priority name
+            in_flight (dict): Running jobs per view_comfy_api_url
+            wait_time_avg_seconds (float): Mean queue wait of recently dispatched jobs
+            wait_time_p95_seconds (float): 95th percentile queue wait of recently dispatched jobs
+            wait_time_max_seconds (float): Longest queue wait of recently dispatched jobs
+            dispatched (int): Total number of jobs handed to the client
+            expired (int): Total number of jobs dropped because their deadline passed
+
+        """
+        self.queue_depth = queue_depth
+        self.in_flight = in_flight
+        self.wait_time_avg_seconds = wait_time_avg_seconds
+        self.wait_time_p95_seconds = wait_time_p95_seconds
+        self.wait_time_max_seconds = wait_time_max_seconds
+        self.dispatched = dispatched
+        self.expired = expired
+
+
+class JobScheduler:
+    def __init__(
+        self,
+        *,
+        client: ComfyAPIClient,
+        max_in_flight_per_url: int = 4,
+        tenant_weights: dict[str, float] | None = None,
+        wait_time_window: int = 1000,
+    ) -> None:
+        """Initialize a client-side scheduler in front of ComfyAPIClient.
+
+        Jobs are dispatched by strict priority class, then weighted fair share
+        between tenants, then earliest deadline. At most max_in_flight_per_url
+        jobs run at the same time against each view_comfy_api_url.
+
+        Args:
+            client (ComfyAPIClient): Client used to submit the jobs
+            max_in_flight_per_url (int): Maximum number of running jobs per endpoint. When the
+                client has a concurrency_limiter, its adaptive limit applies if lower.
+            tenant_weights (dict[str, float], optional): Share of each tenant, defaults to 1.0
+            wait_time_window (int): Number of recent jobs used for the wait-time stats
+
+        """
+        if max_in_flight_per_url < 1:
+            msg = "max_in_flight_per_url must be at least 1"
+            raise Exception(msg)
+
+        self.client = client
+        self.max_in_flight_per_url = max_in_flight_per_url
+        self.tenant_weights = tenant_weights or {}
+
+        self._seq = itertools.count()
+        # url -> priority -> tenant -> heap of (sort_key, job)
+        self._queues: dict[str, dict[JobPriorityEnum, dict[str, list]]] = {}
+        # url -> tenant -> virtual finish time used for the fair share
+        self._tenant_vtime: dict[str, dict[str, float]] = {}
+        self._url_vtime: dict[str, float] = {}
+        self._in_flight: dict[str, int] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._wait_times: deque[float] = deque(maxlen=wait_time_window)
+        self._dispatched = 0
+        self._expired = 0
+
+    def submit(
+        self,
+        *,
+        params: dict[str, Any],
+        view_comfy_api_url: str,
+        override_workflow_api: dict[str, Any] | None = None,
+        priority: JobPriorityEnum = JobPriorityEnum.Default,
+        tenant: str = DEFAULT_TENANT,
+        deadline: float | None = None,
+        with_logs: bool = False,
+    ) -> asyncio.Future:
+        """Queue a job and return a future resolved with its result.
+
+        Args:
+            params (dict): Parameters passed to infer / infer_with_logs
+            view_comfy_api_url (str): The ViewComfy endpoint
+            override_workflow_api (dict, optional): Workflow to run instead of the deployed one
+            priority (JobPriorityEnum): Priority class of the job
+            tenant (str): Name used to share the endpoint fairly between callers
+            deadline (float, optional): Seconds from now after which the job is dropped if not started
+            with_logs (bool): Use infer_with_logs instead of infer
+
+        Returns:
+            asyncio.Future: Resolves to a PromptScheduled (or PromptResult with with_logs),
+            or raises TimeoutError as soon as the deadline passes while the job is queued.
+            Cancelling it removes a queued job, or cancels a running one and, with
+            with_logs, its remote prompt.
+
+        Raises:
+            ParamValidationError: If the client has a validator and params are invalid,
+                so an invalid job never takes a place in the queue
+            UnsupportedWeightsError: If the client has supported_weights and
+                override_workflow_api references a weight that is not supported
+
+        """
+        if self.client.validator is not None:
+            self.client.validator.check(params)
+        if self.client.supported_weights is not None and override_workflow_api:
+            self.client.supported_weights.check(override_workflow_api)
+
+        loop = asyncio.get_running_loop()
+        job = _QueuedJob(
+            seq=next(self._seq),
+            params=params,
+            view_comfy_api_url=view_comfy_api_url,
+            override_workflow_api=override_workflow_api,
+            priority=priority,
+            tenant=tenant,
+            deadline=time.monotonic() + deadline if deadline is not None else None,
+            with_logs=with_logs,
+            future=loop.create_future(),
+        )
+
+        tenants = self._queues.setdefault(view_comfy_api_url, {}).setdefault(priority, {})
+        heap = tenants.setdefault(tenant, [])
+        if not heap:
+            # A tenant that was idle re-enters at the current virtual time so it
+            # cannot claim the share it did not use while it had nothing queued.
+            vtimes = self._tenant_vtime.setdefault(view_comfy_api_url, {})
+            vtimes[tenant] = max(
+                vtimes.get(tenant, 0.0),
+                self._url_vtime.get(view_comfy_api_url, 0.0),
+            )
+        heapq.heappush(heap, (job.sort_key(), job))
+        if deadline is not None:
+            job.timer = loop.call_at(loop.time() + deadline, self._expire, job)
+        job.future.add_done_callback(lambda _: self._on_future_done(job))
+
+        self._dispatch(view_comfy_api_url)
+        return job.future
+
+    async def infer(
+        self,
+        *,
+        params: dict[str, Any],
+        view_comfy_api_url: str,
+        override_workflow_api: dict[str, Any] | None = None,
+        priority: JobPriorityEnum = JobPriorityEnum.Default,
+        tenant: str = DEFAULT_TENANT,
+        deadline: float | None = None,
+    ) -> PromptScheduled:
+        return await self.submit(
+            params=params,
+            view_comfy_api_url=view_comfy_api_url,
+            override_workflow_api=override_workflow_api,
+            priority=priority,
+            tenant=tenant,
+            deadline=deadline,
+        )
+
+    async def infer_with_logs(
+        self,
+        *,
+        params: dict[str, Any],
+        view_comfy_api_url: str,
+        override_workflow_api: dict[str, Any] | None = None,
+        priority: JobPriorityEnum = JobPriorityEnum.Interactive,
+        tenant: str = DEFAULT_TENANT,
+        deadline: float | None = None,
+    ) -> PromptResult | None:
+        return await self.submit(
+            params=params,
+            view_comfy_api_url=view_comfy_api_url,
+            override_workflow_api=override_workflow_api,
+            priority=priority,
+            tenant=tenant,
+            deadline=deadline,
+            with_logs=True,
+        )
+
+    def stats(self) -> SchedulerStats:
+        queue_depth: dict[str, dict[str, int]] = {}
+        for url, priorities in self._queues.items():
+            queue_depth[url] = {
+                priority.name: sum(len(heap) for heap in tenants.values())
+                for priority, tenants in priorities.items()
+            }
+
+        wait_times = sorted(self._wait_times)
+        if wait_times:
+            avg = sum(wait_times) / len(wait_times)
+            p95 = wait_times[min(len(wait_times) - 1, int(len(wait_times) * 0.95))]
+            longest = wait_times[-1]
+        else:
+            avg = p95 = longest = 0.0
+
+        return SchedulerStats(
+            queue_depth=queue_depth,
+            in_flight=dict(self._in_flight),
+            wait_time_avg_seconds=avg,
+            wait_time_p95_seconds=p95,
+            wait_time_max_seconds=longest,
+            dispatched=self._dispatched,
+            expired=self._expired,
+        )
+
+    async def join(self) -> None:
+        """Wait until every queued and running job has finished."""
+        while self._tasks or any(self._has_queued(url) for url in self._queues):
+            if self._tasks:
+                await asyncio.wait(set(self._tasks))
+            else:
+                await asyncio.sleep(0)
+
+    def _has_queued(self, url: str) -> bool:
+        return any(
+            heap for tenants in self._queues.get(url, {}).values() for heap in tenants.values()
+        )
+
+    def _next_job(self, url: str) -> _QueuedJob | None:
+        priorities = self._queues.get(url, {})
+        now = time.monotonic()
+        for priority in sorted(priorities):
+            tenants = priorities[priority]
+            while True:
+                backlogged = [tenant for tenant, heap in tenants.items() if heap]
+                if not backlogged:
+                    break
+                vtimes = self._tenant_vtime[url]
+                tenant = min(backlogged, key=lambda t: (vtimes[t], t))
+                _, job = heapq.heappop(tenants[tenant])
+
+                if job.future.done():
+                    continue
+                if job.deadline is not None and job.deadline < now:
+                    # The timer has not run yet.
+                    self._fail_expired(job)
+                    continue
+
+                weight = self.tenant_weights.get(tenant, 1.0)
+                vtimes[tenant] += 1.0 / weight
+                self._url_vtime[url] = vtimes[tenant]
+                return job
+        return None
+
+    def _dispatch(self, url: str) -> None:
+        max_in_flight = self.max_in_flight_per_url
+        if self.client.concurrency_limiter is not None:
+            # Jobs held back by the adaptive limit stay in the queue, in priority order.
+            max_in_flight = min(max_in_flight, self.client.concurrency_limiter.limit(url))
+        while self._in_flight.get(url, 0) < max_in_flight:
+            job = self._next_job(url)
+            if job is None:
+                return
+
+            self._in_flight[url] = self._in_flight.get(url, 0) + 1
+            self._dispatched += 1
+            self._wait_times.append(time.monotonic() - job.enqueued_at)
+            if job.timer is not None:
+                job.timer.cancel()
+
+            task = asyncio.get_running_loop().create_task(self._run(job))
+            job.task = task
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _expire(self, job: _QueuedJob) -> None:
+        if job.future.done() or job.task is not None:
+            return
+        self._remove_queued(job)
+        self._fail_expired(job)
+
+    def _fail_expired(self, job: _QueuedJob) -> None:
+        self._expired += 1
+        msg = f"Job deadline exceeded after {time.monotonic() - job.enqueued_at:.2f}s in queue"
+        job.future.set_exception(TimeoutError(msg))
+
+    def _on_future_done(self, job: _QueuedJob) -> None:
+        if not job.future.cancelled():
+            return
+        if job.timer is not None:
+            job.timer.cancel()
+        if job.task is not None:
+            # infer_with_logs cancels the remote prompt when its task is cancelled.
+            job.task.cancel()
+        else:
+            self._remove_queued(job)
+
+    def _remove_queued(self, job: _QueuedJob) -> None:
+        heap = self._queues[job.view_comfy_api_url][job.priority][job.tenant]
+        try:
+            heap.remove((job.sort_key(), job))
+        except ValueError:
+            return
+        heapq.heapify(heap)
+
+    async def _run(self, job: _QueuedJob) -> None:
+        try:
+            if job.with_logs:
+                client = self.client._clone_for_job()
+                result = await client.infer_with_logs(
+                    params=job.params,
+                    view_comfy_api_url=job.view_comfy_api_url,
+                    override_workflow_api=job.override_workflow_api,
+                )
+            else:
+                result = await self.client.infer(
+                    params=job.params,
+                    view_comfy_api_url=job.view_comfy_api_url,
+                    override_workflow_api=job.override_workflow_api,
+                )
+        except asyncio.CancelledError:
+            job.future.cancel()
+            raise
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._in_flight[job.view_comfy_api_url] -= 1
+            self._dispatch(job.view_comfy_api_url)
@@ -0,0 +1,331 @@
+"""Hand job outputs to other processes through shared memory instead of pickled bytes.
+
+SharedOutputStore is an OutputSink: outputs are downloaded straight into a
+multiprocessing.shared_memory segment, or into a temp file that is memory-mapped
+on the other side, and fetch() returns a SharedOutputHandle per output. Handles
+are small and picklable; a worker process attaches to one and reads the content
+through a read-only memoryview, without copying it.
+
+The store owns the segments and counts references to them. A handle starts with
+one reference, held by the caller of fetch(); acquire() adds one and release()
+drops one, the segment being removed with the last reference. submit() holds a
+reference while an executor task runs.
+"""
+
+import asyncio
+import mmap
+import os
+import tempfile
+import threading
+from collections.abc import Callable
+from concurrent.futures import Executor, Future
+from enum import Enum
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from viewcomfy.api import PromptResult
+from viewcomfy.sinks import TRANSFER_CHUNK_BYTES, OutputSink, SinkWriter, transfer_output
+
+if TYPE_CHECKING:
+    import httpx
+
+
+class SharedOutputKindEnum(str, Enum):
+    SharedMemory = "shared_memory"
+    MemoryMappedFile = "mmap"
+
+
+class SharedOutputHandle:
+    def __init__(self, *, name: str, size: int, kind: SharedOutputKindEnum, filename: str, content_type: str) -> None:
+        """Picklable reference to an output held by a SharedOutputStore.
+
+        Args:
+            name (str): Name of the shared memory segment, or path of the temp file
+            size (int): Size of the output in bytes, the segment may be larger
+            kind (SharedOutputKindEnum): Where the output is held
+            filename (str): Name of the output file
+            content_type (str): MIME type of the output
+
+        """
+        self.name = name
+        self.size = size
+        self.kind = kind
+        self.filename = filename
+        self.content_type = content_type
+
+    def attach(self) -> "AttachedOutput":
+        """Map the output in this process. Use as a context manager, or call close()."""
+        return AttachedOutput(self)
+
+    def read_bytes(self) -> bytes:
+        """Copy of the output, for consumers that need bytes."""
+        with self.attach() as attached:
+            return bytes(attached.view)
+
+    def __repr__(self) -> str:
+        return f"SharedOutputHandle({self.filename!r}, {self.size} bytes in {self.kind.value} {self.name!r})"
+
+
+class AttachedOutput:
+    def __init__(self, handle: SharedOutputHandle) -> None:
+        """Read-only mapping of a shared output. Release every view taken from view before close().
+
+        Args:
+            handle (SharedOutputHandle): The output to map
+
+        """
+        self.handle = handle
+        self._mmap: mmap.mmap | None = None
+        if handle.size == 0:
+            self.view = memoryview(b"")
+            return
+        if handle.kind == SharedOutputKindEnum.SharedMemory:
+            self._mmap = _map_shared_memory(handle.name, handle.size)
+        else:
+            with open(handle.name, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), handle.size, access=mmap.ACCESS_READ)
+        self.view = memoryview(self._mmap)[: handle.size]
+
+    def close(self) -> None:
+        self.view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self) -> "AttachedOutput":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def _map_shared_memory(name: str, size: int) -> mmap.mmap:
+    # Attaching with SharedMemory(name=...) registers the segment with the resource
+    # tracker of this process before Python 3.13, which removes it when the process
+    # exits. Map it directly instead, which is what track=False does on 3.13.
+    if os.name == "nt":
+        return mmap.mmap(-1, size, tagname=name, access=mmap.ACCESS_READ)
+    import _posixshmem
+
+    fd = _posixshmem.shm_open("/" + name, os.O_RDONLY, mode=0o600)
+    try:
+        return mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+
+
+class _Segment:
+    def __init__(
+        self,
+        handle: SharedOutputHandle,
+        shared: shared_memory.SharedMemory | None,
+    ) -> None:
+        self.handle = handle
+        # Kept open until the last reference is released: on Windows the segment
+        # disappears as soon as no process has it open.
+        self.shared = shared
+        self.references = 1
+
+
+class _SharedOutputWriter(SinkWriter):
+    def __init__(self, store: "SharedOutputStore", key: str, content_type: str, size: int | None) -> None:
+        self.store = store
+        self.filename = Path(key).name
+        self.content_type = content_type
+        self._written = 0
+        self._shared: shared_memory.SharedMemory | None = None
+        self._path: str | None = None
+        if store.kind == SharedOutputKindEnum.SharedMemory:
+            self._shared = shared_memory.SharedMemory(create=True, size=max(1, size or store.initial_capacity))
+        else:
+            fd, self._path = tempfile.mkstemp(prefix="viewcomfy-", dir=store.directory)
+            self._file = open(fd, "wb")
+
+    async def write(self, chunk: bytes | memoryview) -> None:
+        length = len(chunk)
+        if self._shared is None:
+            self._file.write(chunk)
+        else:
+            if self._written + length > self._shared.size:
+                self._grow(self._written + length)
+            self._shared.buf[self._written : self._written + length] = chunk
+        self._written += length
+
+    def _grow(self, needed: int) -> None:
+        # Only happens when the announced size was missing or wrong.
+        grown = shared_memory.SharedMemory(create=True, size=max(needed, 2 * self._shared.size))
+        grown.buf[: self._written] = self._shared.buf[: self._written]
+        self._shared.close()
+        self._shared.unlink()
+        self._shared = grown
+
+    async def close(self) -> str:
+        if self._shared is None:
+            self._file.close()
+            name = self._path
+        else:
+            name = self._shared.name
+        handle = SharedOutputHandle(
+            name=name,
+            size=self._written,
+            kind=self.store.kind,
+            filename=self.filename,
+            content_type=self.content_type,
+        )
+        self.store._add(_Segment(handle, self._shared))
+        return name
+
+    async def abort(self) -> None:
+        if self._shared is None:
+            self._file.close()
+            os.unlink(self._path)
+        else:
+            self._shared.close()
+            self._shared.unlink()
+
+
+class SharedOutputStore(OutputSink):
+    def __init__(
+        self,
+        *,
+        kind: SharedOutputKindEnum = SharedOutputKindEnum.SharedMemory,
+        directory: str | Path | None = None,
+        initial_capacity: int = TRANSFER_CHUNK_BYTES,
+    ) -> None:
+        """Download outputs into shared memory and hand them to other processes as handles.
+
+        Segments are allocated with the size the API reports for the output and grown
+        if the download turns out larger. Use the store as a context manager, or call
+        close(), to remove the segments that are still referenced when you are done.
+
+        Args:
+            kind (SharedOutputKindEnum): multiprocessing.shared_memory segments, or temp
+                files that consumers memory-map
+            directory (str | Path, optional): Folder of the temp files, e.g. /dev/shm to
+                keep them in RAM. Defaults to the system temp folder
+            initial_capacity (int): Segment size when the output size is unknown
+
+        """
+        self.kind = SharedOutputKindEnum(kind)
+        self.directory = str(directory) if directory is not None else None
+        self.initial_capacity = initial_capacity
+        self._segments: dict[str, _Segment] = {}
+        # release() is called from executor callback threads.
+        self._lock = threading.Lock()
+
+    async def open(
+        self,
+        key: str,
+        *,
+        content_type: str = "application/octet-stream",
+        size: int | None = None,
+    ) -> SinkWriter:
+        return _SharedOutputWriter(self, key, content_type, size)
+
+    async def fetch(
+        self,
+        prompt_result: PromptResult,
+        *,
+        http_client: "httpx.AsyncClient",
+        concurrency: int = 4,
+    ) -> list[SharedOutputHandle]:
+        """Download every output of a job into the store.
+
+        Args:
+            prompt_result (PromptResult): The finished job
+            http_client (httpx.AsyncClient): Client the outputs are downloaded with
+            concurrency (int): Number of outputs downloaded at the same time
+
+        Returns:
+            list[SharedOutputHandle]: One handle per output, in order, each holding a
+                reference the caller must release
+
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_one(index: int) -> str:
+            async with semaphore:
+                output = prompt_result.outputs[index]
+                return await transfer_output(output, self, output.filename, http_client=http_client)
+
+        results = await asyncio.gather(*(fetch_one(i) for i in range(len(prompt_result.outputs))), return_exceptions=True)
+        names = [result for result in results if isinstance(result, str)]
+        errors = [result for result in results if isinstance(result, BaseException)]
+        with self._lock:
+            handles = [self._segments[name].handle for name in names]
+        if errors:
+            for handle in handles:
+                self.release(handle)
+            raise errors[0]
+        return handles
+
+    def acquire(self, handle: SharedOutputHandle) -> SharedOutputHandle:
+        """Add a reference to the output, e.g. before handing it to another consumer."""
+        with self._lock:
+            segment = self._segments.get(handle.name)
+            if segment is None:
+                msg = f"{handle!r} was already released"
+                raise Exception(msg)
+            segment.references += 1
+        return handle
+
+    def release(self, handle: SharedOutputHandle) -> None:
+        """Drop a reference to the output, and remove it with the last one."""
+        with self._lock:
+            segment = self._segments.get(handle.name)
+            if segment is None:
+                msg = f"{handle!r} was already released"
+                raise Exception(msg)
+            segment.references -= 1
+            if segment.references > 0:
+                return
+            del self._segments[handle.name]
+        _remove(segment)
+
+    def submit(self, executor: Executor, fn: Callable[..., Any], handle: SharedOutputHandle, *args: Any, **kwargs: Any) -> Future:
+        """Run fn(handle, *args, **kwargs) on the executor, keeping the output alive until it returns."""
+        self.acquire(handle)
+        try:
+            future = executor.submit(fn, handle, *args, **kwargs)
+        except BaseException:
+            self.release(handle)
+            raise
+        future.add_done_callback(lambda _: self.release(handle))
+        return future
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "outputs": len(self._segments),
+                "bytes": sum(segment.handle.size for segment in self._segments.values()),
+            }
+
+    def close(self) -> None:
+        """Remove every output, whatever its references."""
+        with self._lock:
+            segments = list(self._segments.values())
+            self._segments.clear()
+        for segment in segments:
+            _remove(segment)
+
+    async def aclose(self) -> None:
+        self.close()
+
+    def _add(self, segment: _Segment) -> None:
+        with self._lock:
+            self._segments[segment.handle.name] = segment
+
+    def __enter__(self) -> "SharedOutputStore":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def _remove(segment: _Segment) -> None:
+    if segment.shared is not None:
+        segment.shared.close()
+        segment.shared.unlink()
+    else:
+        Path(segment.handle.name).unlink(missing_ok=True)
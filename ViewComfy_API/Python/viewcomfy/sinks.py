@@ -0,0 +1,548 @@
+"""Stream job outputs to a storage sink without going through local disk.
+
+Outputs are downloaded from their S3 filepath in chunks and each chunk is handed
+to the sink as soon as it arrives, through a bounded queue, so the download and
+the upload overlap and memory stays bounded whatever the output size. Inline
+outputs are sent from their decoded buffer.
+
+Sinks: LocalFileSink, MemorySink, and S3Sink for any S3-compatible object store
+(AWS S3, MinIO, R2, ...), which uploads large outputs with a multipart upload.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import os
+import re
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO
+from urllib.parse import quote, urlsplit
+
+from viewcomfy.api import PromptResult, S3FileOutput, _import_httpx
+
+if TYPE_CHECKING:
+    import httpx
+
+TRANSFER_CHUNK_BYTES = 1024 * 1024
+# Chunks downloaded ahead of the upload, per output
+TRANSFER_BUFFERED_CHUNKS = 4
+# S3 parts must be at least 5 MiB, except the last one
+S3_MIN_PART_BYTES = 5 * 1024 * 1024
+S3_PART_BYTES = 8 * 1024 * 1024
+_UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+
+class SinkWriter(ABC):
+    """One object being written to a sink. Call close() to commit it or abort() to drop it."""
+
+    @abstractmethod
+    async def write(self, chunk: bytes | memoryview) -> None: ...
+
+    @abstractmethod
+    async def close(self) -> str:
+        """Commit the object and return its location."""
+
+    @abstractmethod
+    async def abort(self) -> None:
+        """Drop the object, also after a close() that failed."""
+
+
+class OutputSink(ABC):
+    """Destination of job outputs."""
+
+    @abstractmethod
+    async def open(
+        self,
+        key: str,
+        *,
+        content_type: str = "application/octet-stream",
+        size: int | None = None,
+    ) -> SinkWriter:
+        """Start writing the object stored under key, e.g. "<prompt_id>/<filename>".
+
+        size is the expected size of the object when known, which sinks may use to
+        allocate it up front.
+        """
+
+    async def aclose(self) -> None:
+        pass
+
+
+def _open_partial(partial: Path) -> BinaryIO:
+    partial.parent.mkdir(parents=True, exist_ok=True)
+    return open(partial, "wb")
+
+
+class _LocalFileWriter(SinkWriter):
+    def __init__(self, path: Path, partial: Path, file: BinaryIO) -> None:
+        self.path = path
+        self._partial = partial
+        self._file = file
+
+    async def write(self, chunk: bytes | memoryview) -> None:
+        await asyncio.to_thread(self._file.write, chunk)
+
+    def _close(self) -> None:
+        self._file.close()
+        os.replace(self._partial, self.path)
+
+    def _abort(self) -> None:
+        self._file.close()
+        self._partial.unlink(missing_ok=True)
+
+    async def close(self) -> str:
+        # Flushing and renaming both block.
+        await asyncio.to_thread(self._close)
+        return str(self.path)
+
+    async def abort(self) -> None:
+        await asyncio.to_thread(self._abort)
+
+
+class LocalFileSink(OutputSink):
+    def __init__(self, root: str | Path) -> None:
+        """Write outputs under a local folder. Objects only appear under their name once complete.
+
+        Args:
+            root (str | Path): Folder the keys are relative to
+
+        """
+        self.root = Path(root)
+
+    async def open(
+        self,
+        key: str,
+        *,
+        content_type: str = "application/octet-stream",
+        size: int | None = None,
+    ) -> SinkWriter:
+        path = self.root / key
+        partial = path.with_name(path.name + ".part")
+        file = await asyncio.to_thread(_open_partial, partial)
+        return _LocalFileWriter(path, partial, file)
+
+
+class _MemoryWriter(SinkWriter):
+    def __init__(self, sink: "MemorySink", key: str, content_type: str) -> None:
+        self.sink = sink
+        self.key = key
+        self.content_type = content_type
+        self._buffer = bytearray()
+
+    async def write(self, chunk: bytes | memoryview) -> None:
+        self._buffer += chunk
+
+    async def close(self) -> str:
+        self.sink.objects[self.key] = bytes(self._buffer)
+        self.sink.content_types[self.key] = self.content_type
+        self._buffer = bytearray()
+        return f"memory://{self.key}"
+
+    async def abort(self) -> None:
+        self._buffer = bytearray()
+
+
+class MemorySink(OutputSink):
+    def __init__(self) -> None:
+        """Keep outputs in a dict, for tests and for outputs consumed in-process."""
+        self.objects: dict[str, bytes] = {}
+        self.content_types: dict[str, str] = {}
+
+    async def open(
+        self,
+        key: str,
+        *,
+        content_type: str = "application/octet-stream",
+        size: int | None = None,
+    ) -> SinkWriter:
+        return _MemoryWriter(self, key, content_type)
+
+
+class _S3Writer(SinkWriter):
+    def __init__(self, sink: "S3Sink", key: str, content_type: str) -> None:
+        self.sink = sink
+        self.key = key
+        self.content_type = content_type
+        self._buffer = bytearray()
+        self._upload_id: str | None = None
+        # (part number, ETag) of the uploaded parts
+        self._parts: list[tuple[int, str]] = []
+
+    async def write(self, chunk: bytes | memoryview) -> None:
+        self._buffer += chunk
+        while len(self._buffer) >= self.sink.part_size:
+            part = bytes(self._buffer[: self.sink.part_size])
+            del self._buffer[: self.sink.part_size]
+            await self._upload_part(part)
+
+    async def _upload_part(self, part: bytes) -> None:
+        if self._upload_id is None:
+            response = await self.sink._request(
+                "POST",
+                self.key,
+                query={"uploads": ""},
+                headers={"content-type": self.content_type},
+            )
+            match = re.search(rb"<UploadId>([^<]+)</UploadId>", response.content)
+            if match is None:
+                msg = f"No UploadId in the response to CreateMultipartUpload of {self.key}"
+                raise Exception(msg)
+            self._upload_id = match.group(1).decode()
+
+        part_number = len(self._parts) + 1
+        response = await self.sink._request(
+            "PUT",
+            self.key,
+            query={"partNumber": str(part_number), "uploadId": self._upload_id},
+            content=part,
+        )
+        self._parts.append((part_number, response.headers["etag"]))
+
+    async def close(self) -> str:
+        if self._upload_id is None:
+            # Small enough for a single request.
+            await self.sink._request(
+                "PUT",
+                self.key,
+                headers={"content-type": self.content_type},
+                content=bytes(self._buffer),
+            )
+        else:
+            if self._buffer:
+                await self._upload_part(bytes(self._buffer))
+            parts = "".join(
+                f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>" for number, etag in self._parts
+            )
+            response = await self.sink._request(
+                "POST",
+                self.key,
+                query={"uploadId": self._upload_id},
+                headers={"content-type": "application/xml"},
+                content=f"<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>".encode(),
+            )
+            # S3 can report a failed completion with a 200 status and an Error body.
+            if b"<Error>" in response.content:
+                msg = f"Completing the upload of {self.sink.location(self.key)} failed: {response.text}"
+                raise Exception(msg)
+        self._buffer = bytearray()
+        return self.sink.location(self.key)
+
+    async def abort(self) -> None:
+        self._buffer = bytearray()
+        if self._upload_id is not None:
+            await self.sink._request("DELETE", self.key, query={"uploadId": self._upload_id})
+            self._upload_id = None
+
+
+class S3Sink(OutputSink):
+    def __init__(
+        self,
+        *,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        prefix: str = "",
+        part_size: int = S3_PART_BYTES,
+        http_client: "httpx.AsyncClient | None" = None,
+    ) -> None:
+        """Upload outputs to an S3-compatible object store, with path-style URLs and SigV4.
+
+        Objects smaller than part_size are uploaded with one PUT, larger ones with a
+        multipart upload, so at most part_size bytes are buffered per object.
+        Payloads are sent as UNSIGNED-PAYLOAD, so parts are not hashed before upload.
+
+        Args:
+            endpoint_url (str): e.g. "https://s3.eu-west-1.amazonaws.com" or "http://127.0.0.1:9000"
+            bucket (str): Bucket the outputs are written to
+            access_key (str): Access key id
+            secret_key (str): Secret access key
+            region (str): Region used in the signature
+            prefix (str): Prefix added to every key
+            part_size (int): Size of the multipart upload parts, at least 5 MiB
+            http_client (httpx.AsyncClient, optional): Connection pool to use, e.g. the
+                one the outputs are downloaded with
+
+        """
+        if part_size < S3_MIN_PART_BYTES:
+            msg = f"part_size must be at least {S3_MIN_PART_BYTES} bytes"
+            raise Exception(msg)
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix
+        self.part_size = part_size
+        endpoint = urlsplit(self.endpoint_url)
+        # Signed like the Host header httpx sends, which leaves out default ports
+        default_port = {"http": 80, "https": 443}.get(endpoint.scheme)
+        self._host = endpoint.hostname if endpoint.port in (None, default_port) else endpoint.netloc
+        self._http_client = http_client
+        self._owns_http_client = http_client is None
+
+    def location(self, key: str) -> str:
+        return f"s3://{self.bucket}/{self.prefix}{key}"
+
+    async def open(
+        self,
+        key: str,
+        *,
+        content_type: str = "application/octet-stream",
+        size: int | None = None,
+    ) -> SinkWriter:
+        return _S3Writer(self, key, content_type)
+
+    def _get_http_client(self) -> "httpx.AsyncClient":
+        if self._http_client is None:
+            httpx = _import_httpx()
+            self._http_client = httpx.AsyncClient(timeout=httpx.Timeout(300.0))
+        return self._http_client
+
+    async def _request(
+        self,
+        method: str,
+        key: str,
+        *,
+        query: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+        content: bytes = b"",
+    ) -> "httpx.Response":
+        path = "/" + quote(f"{self.bucket}/{self.prefix}{key}", safe="/-_.~")
+        query_string = _canonical_query(query or {})
+        signed_headers = sign_v4(
+            method=method,
+            host=self._host,
+            path=path,
+            query_string=query_string,
+            headers=headers or {},
+            access_key=self.access_key,
+            secret_key=self.secret_key,
+            region=self.region,
+        )
+        url = f"{self.endpoint_url}{path}" + (f"?{query_string}" if query_string else "")
+        response = await self._get_http_client().request(method, url, headers=signed_headers, content=content)
+        if response.status_code >= 300:
+            msg = f"{method} {self.location(key)} failed with status {response.status_code}: {response.text}"
+            raise Exception(msg)
+        return response
+
+    async def aclose(self) -> None:
+        if self._owns_http_client and self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+
+def _canonical_query(query: dict[str, str]) -> str:
+    return "&".join(f"{quote(key, safe='-_.~')}={quote(value, safe='-_.~')}" for key, value in sorted(query.items()))
+
+
+def sign_v4(
+    *,
+    method: str,
+    host: str,
+    path: str,
+    query_string: str,
+    headers: dict[str, str],
+    access_key: str,
+    secret_key: str,
+    region: str,
+    payload_hash: str = _UNSIGNED_PAYLOAD,
+    now: datetime | None = None,
+) -> dict[str, str]:
+    """Return headers with the AWS Signature Version 4 of an S3 request added.
+
+    Args:
+        method (str): HTTP method
+        host (str): Host header of the request
+        path (str): URI-encoded path
+        query_string (str): Canonical query string, keys sorted and URI-encoded
+        headers (dict): Headers to sign along with host and the x-amz-* headers
+        access_key (str): Access key id
+        secret_key (str): Secret access key
+        region (str): Region of the bucket
+        payload_hash (str): Hex SHA-256 of the body, or UNSIGNED-PAYLOAD
+        now (datetime, optional): Signing time, defaults to the current time
+
+    """
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date = amz_date[:8]
+
+    signed = {key.lower(): str(value).strip() for key, value in headers.items()}
+    signed["host"] = host
+    signed["x-amz-content-sha256"] = payload_hash
+    signed["x-amz-date"] = amz_date
+    names = sorted(signed)
+    canonical_request = "\n".join(
+        [
+            method,
+            path,
+            query_string,
+            "".join(f"{name}:{signed[name]}\n" for name in names),
+            ";".join(names),
+            payload_hash,
+        ],
+    )
+    scope = f"{date}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join(
+        ["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()],
+    )
+
+    signing_key = f"AWS4{secret_key}".encode()
+    for part in (date, region, "s3", "aws4_request"):
+        signing_key = hmac.new(signing_key, part.encode(), hashlib.sha256).digest()
+    signature = hmac.new(signing_key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+    signed["authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, SignedHeaders={';'.join(names)}, Signature={signature}"
+    )
+    # httpx sets the Host header itself
+    del signed["host"]
+    return signed
+
+
+async def transfer_output(
+    output: S3FileOutput,
+    sink: OutputSink,
+    key: str,
+    *,
+    http_client: "httpx.AsyncClient",
+    chunk_size: int = TRANSFER_CHUNK_BYTES,
+    buffered_chunks: int = TRANSFER_BUFFERED_CHUNKS,
+) -> str:
+    """Copy one output to the sink, piping download chunks into the upload.
+
+    Args:
+        output (S3FileOutput): Output of a finished job
+        sink (OutputSink): Destination
+        key (str): Key of the object in the sink
+        http_client (httpx.AsyncClient): Client the output is downloaded with
+        chunk_size (int): Size of the downloaded chunks
+        buffered_chunks (int): Chunks the download may get ahead of the upload
+
+    Returns:
+        str: Location of the object in the sink
+
+    """
+    size = len(output.inline.view) if output.is_inline else output.size or None
+    writer = await sink.open(key, content_type=output.content_type or "application/octet-stream", size=size)
+    try:
+        if output.is_inline:
+            view = output.inline.view
+            for offset in range(0, len(view), chunk_size):
+                await writer.write(view[offset : offset + chunk_size])
+        else:
+            await _pipe_download(output.filepath, writer, http_client, chunk_size, buffered_chunks)
+        # Inside the guard: a failed commit, e.g. CompleteMultipartUpload, must not
+        # leave the multipart upload or the partial file behind.
+        return await writer.close()
+    except BaseException:
+        try:
+            await writer.abort()
+        except Exception as e:
+            print(f"Unable to abort the write of {key}: {e!s}")
+        raise
+
+
+async def _pipe_download(
+    url: str,
+    writer: SinkWriter,
+    http_client: "httpx.AsyncClient",
+    chunk_size: int,
+    buffered_chunks: int,
+) -> None:
+    queue: asyncio.Queue[bytes | Exception | None] = asyncio.Queue(maxsize=buffered_chunks)
+
+    async def download() -> None:
+        try:
+            async with http_client.stream("GET", url) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(chunk_size):
+                    await queue.put(chunk)
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(None)
+
+    downloader = asyncio.create_task(download())
+    try:
+        while (item := await queue.get()) is not None:
+            if isinstance(item, Exception):
+                msg = f"Error downloading {url}: {item!s}"
+                raise Exception(msg) from item
+            await writer.write(item)
+    finally:
+        downloader.cancel()
+
+
+async def transfer_outputs(
+    prompt_result: PromptResult,
+    sink: OutputSink,
+    *,
+    http_client: "httpx.AsyncClient",
+    key_prefix: str | None = None,
+    concurrency: int = 4,
+) -> list[str]:
+    """Copy every output of a job to the sink, several at a time.
+
+    Args:
+        prompt_result (PromptResult): The finished job
+        sink (OutputSink): Destination
+        http_client (httpx.AsyncClient): Client the outputs are downloaded with
+        key_prefix (str, optional): Prefix of the keys, defaults to "<prompt_id>/"
+        concurrency (int): Number of outputs transferred at the same time
+
+    Returns:
+        list[str]: Location of each output in the sink, in the order of prompt_result.outputs
+
+    """
+    if key_prefix is None:
+        key_prefix = f"{prompt_result.prompt_id}/"
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def transfer(output: S3FileOutput) -> str:
+        async with semaphore:
+            key = f"{key_prefix}{Path(output.filename).name}"
+            return await transfer_output(output, sink, key, http_client=http_client)
+
+    return list(await asyncio.gather(*(transfer(output) for output in prompt_result.outputs)))
+
+
+def sink_from_url(url: str, **options: Any) -> OutputSink:
+    """Build a sink from "s3://bucket/prefix", "memory://" or a local path.
+
+    S3 options (endpoint_url, access_key, secret_key, region) default to the
+    AWS_ENDPOINT_URL, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY and AWS_REGION
+    environment variables.
+    """
+    if url.startswith("memory://"):
+        return MemorySink()
+    if not url.startswith("s3://"):
+        return LocalFileSink(url)
+
+    bucket, _, prefix = url[len("s3://") :].partition("/")
+    if prefix and not prefix.endswith("/"):
+        prefix += "/"
+    region = options.get("region") or os.environ.get("AWS_REGION", "us-east-1")
+    endpoint_url = options.get("endpoint_url") or os.environ.get(
+        "AWS_ENDPOINT_URL",
+        f"https://s3.{region}.amazonaws.com",
+    )
+    access_key = options.get("access_key") or os.environ.get("AWS_ACCESS_KEY_ID")
+    secret_key = options.get("secret_key") or os.environ.get("AWS_SECRET_ACCESS_KEY")
+    if not access_key or not secret_key:
+        msg = "S3 sinks need an access key and a secret key (AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY)"
+        raise Exception(msg)
+    return S3Sink(
+        endpoint_url=endpoint_url,
+        bucket=bucket,
+        access_key=access_key,
+        secret_key=secret_key,
+        region=region,
+        prefix=prefix,
+        http_client=options.get("http_client"),
+    )
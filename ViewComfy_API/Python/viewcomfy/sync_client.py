@@ -0,0 +1,139 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any
+
+from viewcomfy.api import ComfyAPIClient, PromptResult, PromptScheduled
+
+
+class SyncComfyAPIClient:
+    def __init__(
+        self,
+        *,
+        view_comfy_api_url: str,
+        client_id: str,
+        client_secret: str,
+    ) -> None:
+        """Initialize a thread-safe synchronous client for Celery, Flask and other sync workers.
+
+        One background thread runs an asyncio event loop that owns a persistent
+        ComfyAPIClient, so every call reuses the same HTTP connection pool instead
+        of paying for a new loop, client and pool per job with asyncio.run().
+
+        Every method returns a concurrent.futures.Future; call .result() to block
+        until the job is done, or submit several jobs first to run them concurrently.
+        Cancelling the future of an infer_with_logs job also cancels the remote prompt.
+
+        Args:
+            view_comfy_api_url (str): The ViewComfy endpoint
+            client_id (str): ViewComfy API client id
+            client_secret (str): ViewComfy API client secret
+
+        """
+        self.view_comfy_api_url = view_comfy_api_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="viewcomfy-sync-client",
+            daemon=True,
+        )
+        self._thread.start()
+        self._closed = False
+        self._client = ComfyAPIClient(
+            infer_url=view_comfy_api_url,
+            client_id=client_id,
+            client_secret=client_secret,
+        )
+
+    def __enter__(self) -> "SyncComfyAPIClient":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def infer(
+        self,
+        *,
+        params: dict[str, Any],
+        override_workflow_api: dict[str, Any] | None = None,
+    ) -> "Future[PromptScheduled]":
+        return self._submit(
+            self._client.infer(
+                params=params,
+                view_comfy_api_url=self.view_comfy_api_url,
+                override_workflow_api=override_workflow_api,
+            ),
+        )
+
+    def infer_with_logs(
+        self,
+        *,
+        params: dict[str, Any],
+        override_workflow_api: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> "Future[PromptResult | None]":
+        return self._submit(
+            self._infer_with_logs(
+                params=params,
+                override_workflow_api=override_workflow_api,
+                timeout=timeout,
+            ),
+        )
+
+    def infer_info(self, *, prompt_ids: list[str]) -> "Future[list[PromptResult]]":
+        return self._submit(self._client._infer_info(prompt_ids=prompt_ids))
+
+    def cancel(self, *, prompt_id: str) -> "Future[dict]":
+        return self._submit(
+            self._client._cancel_infer(
+                prompt_id=prompt_id,
+                view_comfy_api_url=self.view_comfy_api_url,
+            ),
+        )
+
+    def cancel_many(self, *, prompt_ids: list[str]) -> "Future[dict[str, dict | Exception]]":
+        return self._submit(
+            self._client.cancel_many(
+                prompt_ids=prompt_ids,
+                view_comfy_api_url=self.view_comfy_api_url,
+            ),
+        )
+
+    def close(self, timeout: float | None = 30.0) -> None:
+        """Close the HTTP pool and stop the background event loop."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._loop.close()
+
+    async def _infer_with_logs(
+        self,
+        *,
+        params: dict[str, Any],
+        override_workflow_api: dict[str, Any] | None,
+        timeout: float | None,
+    ) -> PromptResult | None:
+        client = self._client._clone_for_job()
+        return await client.infer_with_logs(
+            params=params,
+            view_comfy_api_url=self.view_comfy_api_url,
+            override_workflow_api=override_workflow_api,
+            timeout=timeout,
+        )
+
+    def _submit(self, coro: Any) -> Future:
+        with self._lock:
+            if self._closed:
+                coro.close()
+                msg = "SyncComfyAPIClient is closed"
+                raise Exception(msg)
+            return asyncio.run_coroutine_threadsafe(coro, self._loop)
@@ -0,0 +1,193 @@
+"""Transports that deliver the live events of an infer_with_logs job.
+
+SocketIOTransport submits the job with the sid of a socket.io connection and
+receives the events on that connection. SSETransport asks the infer endpoint
+for a Server-Sent Events response and reads the events from the submission
+response itself, on the same pooled HTTP connection.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator
+from enum import Enum
+from typing import TYPE_CHECKING, Any
+
+from viewcomfy import _json
+
+if TYPE_CHECKING:
+    import httpx
+
+    from viewcomfy.api import ComfyAPIClient
+
+SSE_UNSUPPORTED_STATUS_CODES = {404, 405, 406, 415}
+
+
+class TransportEnum(str, Enum):
+    Auto = "auto"
+    SocketIO = "socketio"
+    SSE = "sse"
+
+
+class TransportUnavailable(Exception):
+    def __init__(self, msg: str, *, accepted: bool = False, response_data: dict | None = None) -> None:
+        """Raised by a transport that cannot deliver live events for a job.
+
+        Args:
+            msg (str): Reason the transport is unavailable
+            accepted (bool): Whether the server still scheduled the job, in which case
+                it must not be submitted again
+            response_data (dict, optional): Data of the submission response when accepted
+
+        """
+        super().__init__(msg)
+        self.accepted = accepted
+        self.response_data = response_data
+
+
+class SocketIOTransport:
+    name = TransportEnum.SocketIO
+
+    def __init__(self, client: "ComfyAPIClient") -> None:
+        self.client = client
+
+    @property
+    def is_open(self) -> bool:
+        return self.client.sio.connected
+
+    async def submit(self, *, data: dict[str, Any], files: list, auth: dict[str, str]) -> dict | None:
+        sio = self.client.sio
+        try:
+            await sio.connect(self.client.api_url, auth=auth, transports=["websocket"])
+        except Exception as e:
+            msg = f"Unable to connect to to websocket server, e: {e}"
+            raise TransportUnavailable(msg) from e
+        self.client.is_ws_connected = True
+
+        data = {**data, "sid": sio.get_sid(namespace="/")}
+        return await self.client._post_infer(
+            data=data,
+            files=files,
+            auth=auth,
+            operation="infer_with_logs",
+        )
+
+    async def reconnect(self, *, prompt_id: str) -> bool:
+        """Open a new connection and re-join the room of prompt_id."""
+        from viewcomfy.api import InferEmitEventEnum
+
+        sio = self.client.sio
+        if sio.connected:
+            await sio.disconnect()
+        auth = {
+            "client_id": self.client.client_id,
+            "client_secret": self.client.client_secret,
+        }
+        await sio.connect(self.client.api_url, auth=auth, transports=["websocket"])
+        await sio.emit(InferEmitEventEnum.JoinRoom, {"prompt_id": prompt_id})
+        self.client.is_ws_connected = True
+        return True
+
+    async def close(self) -> None:
+        if self.client._sio is not None:
+            await self.client._sio.disconnect()
+
+
+class SSETransport:
+    name = TransportEnum.SSE
+
+    def __init__(self, client: "ComfyAPIClient") -> None:
+        self.client = client
+        self._response: "httpx.Response | None" = None
+        self._reader: asyncio.Task | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._reader is not None and not self._reader.done()
+
+    async def submit(self, *, data: dict[str, Any], files: list, auth: dict[str, str]) -> dict | None:
+        request = self.client._build_infer_request(
+            data=data,
+            files=files,
+            headers={**auth, "accept": "text/event-stream"},
+        )
+        response = await self.client._send_request(
+            request,
+            operation="infer_with_logs",
+            stream=True,
+        )
+        self.client._observe_status(data["view_comfy_api_url"], response.status_code)
+
+        if response.status_code in SSE_UNSUPPORTED_STATUS_CODES:
+            await response.aclose()
+            msg = f"Server-Sent Events are not supported (status {response.status_code})"
+            raise TransportUnavailable(msg)
+
+        if response.status_code not in (200, 201):
+            error_text = (await response.aread()).decode(errors="replace")
+            await response.aclose()
+            self.client._check_workflow_base(data, response.status_code)
+            err_msg = f"API request failed with status {response.status_code}: {error_text}"
+            raise Exception(err_msg)
+
+        content_type = response.headers.get("content-type", "")
+        if not content_type.startswith("text/event-stream"):
+            # The server ignored the Accept header and scheduled the job as a
+            # plain request, so the job is running but no events will follow.
+            body = await response.aread()
+            await response.aclose()
+            msg = "Server answered without an event stream"
+            raise TransportUnavailable(
+                msg,
+                accepted=True,
+                response_data=_json.loads(body).get("data", None) if body else None,
+            )
+
+        self._response = response
+        self.client.is_ws_connected = True
+        self._reader = asyncio.create_task(self._read_events())
+        return None
+
+    async def reconnect(self, *, prompt_id: str) -> bool:
+        # An event stream is tied to its submission request and cannot be resumed.
+        return False
+
+    async def _read_events(self) -> None:
+        try:
+            async for event, data in iter_sse_events(self._response.aiter_lines()):
+                await self.client._handle_event(event, data)
+        except Exception as e:
+            print(f"Event stream interrupted: {e!s}")
+        finally:
+            self.client.is_ws_connected = False
+
+    async def close(self) -> None:
+        if self._reader is not None and not self._reader.done():
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._response is not None:
+            await self._response.aclose()
+
+
+async def iter_sse_events(lines: AsyncIterator[str]) -> AsyncIterator[tuple[str, Any]]:
+    """Parse a Server-Sent Events stream into (event name, decoded JSON data) pairs."""
+    event = "message"
+    data_lines: list[str] = []
+    async for line in lines:
+        if not line:
+            if data_lines:
+                payload = "\n".join(data_lines)
+                try:
+                    decoded = _json.loads(payload)
+                except ValueError:
+                    decoded = payload
+                yield event, decoded
+            event = "message"
+            data_lines = []
+        elif line.startswith(":"):
+            continue
+        elif line.startswith("event:"):
+            event = line[len("event:") :].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:") :].removeprefix(" "))
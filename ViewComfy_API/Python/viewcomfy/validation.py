@@ -0,0 +1,295 @@
+"""Client-side validation of job params against the inputs described in a view_comfy.json file."""
+
+import json
+from io import BufferedReader
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import Any
+
+# valueTypes whose value is uploaded as a file
+MEDIA_VALUE_TYPES = {"image", "video", "audio", "file", "mask"}
+TEXT_VALUE_TYPES = {"string", "long-text"}
+
+_MISSING = object()
+
+
+class ParamValidationError(Exception):
+    def __init__(self, errors: list[str]) -> None:
+        """Raised when job params do not match the workflow inputs.
+
+        Args:
+            errors (list[str]): One message per invalid or missing param
+
+        """
+        super().__init__("Invalid params: " + "; ".join(errors))
+        self.errors = errors
+
+
+class InputSpec:
+    def __init__(
+        self,
+        *,
+        key: str,
+        title: str,
+        value_type: str,
+        required: bool,
+        default: Any,
+        options: list[Any] | None,
+    ) -> None:
+        """Initialize an InputSpec object.
+
+        Args:
+            key (str): Param key, e.g. "6-inputs-text"
+            title (str): Title of the input in the ViewComfy app
+            value_type (str): The view_comfy.json valueType, e.g. "image" or "number"
+            required (bool): Whether the input is required
+            default (Any): Value used by the deployment when the param is omitted
+            options (list, optional): Allowed values of a "select" input
+
+        """
+        self.key = key
+        self.title = title
+        self.value_type = value_type
+        self.required = required
+        self.default = default
+        self.options = options
+
+    @property
+    def has_default(self) -> bool:
+        return self.default not in (None, "", {}, [])
+
+
+def _compile_check(spec: InputSpec) -> tuple[Callable[[list[Any]], list[int]], Callable[[Any], str | None]]:
+    """Build (column filter, full check) for one input.
+
+    The column filter takes the values of the input across a batch and returns,
+    in a single comprehension, the indexes of the values that may be invalid.
+    Only those go through the full check, which builds the error message.
+    """
+    value_type = spec.value_type
+
+    if value_type in MEDIA_VALUE_TYPES:
+
+        def suspects(column: list[Any]) -> list[int]:
+            return [index for index, value in enumerate(column) if type(value) is not BufferedReader]
+
+        def check(value: Any) -> str | None:
+            # parse_parameters() only uploads BufferedReader values as files
+            if not isinstance(value, BufferedReader):
+                return f"expects a file opened in binary mode (open(path, 'rb')), got {type(value).__name__}"
+            return None
+
+        return suspects, check
+
+    if value_type in TEXT_VALUE_TYPES:
+        if spec.required:
+
+            def suspects(column: list[Any]) -> list[int]:
+                return [
+                    index for index, value in enumerate(column) if type(value) is not str or not value.strip()
+                ]
+
+        else:
+
+            def suspects(column: list[Any]) -> list[int]:
+                return [index for index, value in enumerate(column) if type(value) is not str]
+
+        def check(value: Any) -> str | None:
+            if not isinstance(value, str):
+                return f"expects a string, got {type(value).__name__}"
+            if spec.required and not value.strip():
+                return "is required and cannot be empty"
+            return None
+
+        return suspects, check
+
+    if value_type == "number":
+
+        def suspects(column: list[Any]) -> list[int]:
+            return [index for index, value in enumerate(column) if type(value) is not int and type(value) is not float]
+
+        def check(value: Any) -> str | None:
+            if isinstance(value, bool) or not isinstance(value, int | float):
+                return f"expects a number, got {type(value).__name__}"
+            return None
+
+        return suspects, check
+
+    if value_type == "seed":
+
+        def suspects(column: list[Any]) -> list[int]:
+            return [index for index, value in enumerate(column) if type(value) is not int or value < 0]
+
+        def check(value: Any) -> str | None:
+            if isinstance(value, bool) or not isinstance(value, int):
+                return f"expects an integer seed, got {type(value).__name__}"
+            if value < 0:
+                return "expects a non-negative seed"
+            return None
+
+        return suspects, check
+
+    if value_type == "boolean":
+
+        def suspects(column: list[Any]) -> list[int]:
+            return [index for index, value in enumerate(column) if type(value) is not bool]
+
+        def check(value: Any) -> str | None:
+            if not isinstance(value, bool):
+                return f"expects a boolean, got {type(value).__name__}"
+            return None
+
+        return suspects, check
+
+    if value_type == "select" and spec.options:
+        allowed = []
+        for option in spec.options:
+            allowed.append(option.get("value") if isinstance(option, dict) else option)
+
+        def suspects(column: list[Any]) -> list[int]:
+            return [index for index, value in enumerate(column) if value not in allowed]
+
+        def check(value: Any) -> str | None:
+            if value in allowed:
+                return None
+            return f"expects one of {allowed}, got {value!r}"
+
+        return suspects, check
+
+    # Unknown valueTypes are accepted as is.
+    return lambda column: [], lambda value: None
+
+
+class ParamsValidator:
+    def __init__(self, specs: Iterable[InputSpec], *, strict: bool = False) -> None:
+        """Initialize a validator from input specs. Use from_view_comfy_json() to load one.
+
+        Args:
+            specs (Iterable[InputSpec]): The workflow inputs
+            strict (bool): Reject params whose key is not one of the inputs. Off by default
+                since any flattened "nodeId-inputs-name" key can be sent to the API.
+
+        """
+        self.specs = {spec.key: spec for spec in specs}
+        self.strict = strict
+        # Required inputs without a default value must be present in every job.
+        self.required_keys = frozenset(
+            key for key, spec in self.specs.items() if spec.required and not spec.has_default
+        )
+        self._suspects: dict[str, Callable[[list[Any]], list[int]]] = {}
+        self._checks: dict[str, Callable[[Any], str | None]] = {}
+        for key, spec in self.specs.items():
+            self._suspects[key], self._checks[key] = _compile_check(spec)
+        self._keys = frozenset(self.specs)
+
+    @classmethod
+    def from_view_comfy_json(
+        cls,
+        view_comfy: str | Path | dict[str, Any],
+        *,
+        workflow: int | str = 0,
+        strict: bool = False,
+    ) -> "ParamsValidator":
+        """Compile the inputs of one workflow of a view_comfy.json file.
+
+        Args:
+            view_comfy (str | Path | dict): Path to the file or its parsed content
+            workflow (int | str): Index, title or viewcomfyEndpoint of the workflow to use
+            strict (bool): Reject params whose key is not one of the inputs
+
+        """
+        if not isinstance(view_comfy, dict):
+            with open(view_comfy) as f:
+                view_comfy = json.load(f)
+
+        workflows = [item["viewComfyJSON"] for item in view_comfy.get("workflows", [])]
+        if isinstance(workflow, int):
+            if workflow >= len(workflows):
+                msg = f"view_comfy.json has {len(workflows)} workflows, no index {workflow}"
+                raise Exception(msg)
+            view_comfy_json = workflows[workflow]
+        else:
+            matches = [
+                item
+                for item in workflows
+                if workflow in (item.get("title"), item.get("viewcomfyEndpoint"))
+            ]
+            if not matches:
+                msg = f"No workflow titled or deployed at {workflow!r} in view_comfy.json"
+                raise Exception(msg)
+            view_comfy_json = matches[0]
+
+        specs = []
+        for group in view_comfy_json.get("inputs", []) + view_comfy_json.get("advancedInputs", []):
+            for item in group.get("inputs", []):
+                specs.append(
+                    InputSpec(
+                        key=item["key"],
+                        title=item.get("title", item["key"]),
+                        value_type=item.get("valueType", ""),
+                        required=bool((item.get("validations") or {}).get("required", False)),
+                        default=item.get("value"),
+                        options=item.get("options"),
+                    ),
+                )
+        return cls(specs, strict=strict)
+
+    def validate(self, params: dict[str, Any]) -> list[str]:
+        """Return the error messages for params, an empty list when they are valid."""
+        errors = [
+            f"{key} ({self.specs[key].title}) is required"
+            for key in sorted(self.required_keys - params.keys())
+        ]
+        for key, check in self._checks.items():
+            value = params.get(key, _MISSING)
+            if value is _MISSING:
+                continue
+            error = check(value)
+            if error is not None:
+                errors.append(f"{key} ({self.specs[key].title}) {error}")
+        if self.strict:
+            errors.extend(
+                f"{key} is not an input of this workflow"
+                for key in sorted(params.keys() - self._keys)
+                if not key.startswith("_")
+            )
+        return errors
+
+    def check(self, params: dict[str, Any]) -> None:
+        """Raise ParamValidationError if params are invalid."""
+        errors = self.validate(params)
+        if errors:
+            raise ParamValidationError(errors)
+
+    def validate_batch(self, rows: Iterable[dict[str, Any]]) -> dict[int, list[str]]:
+        """Validate many jobs in one pass, column by column.
+
+        Returns:
+            dict[int, list[str]]: Errors of each invalid row, keyed by row index
+
+        """
+        rows = list(rows)
+        errors: dict[int, list[str]] = {}
+
+        for key, check in self._checks.items():
+            title = self.specs[key].title
+            required = key in self.required_keys
+            column = [row.get(key, _MISSING) for row in rows]
+            for index in self._suspects[key](column):
+                value = column[index]
+                if value is _MISSING:
+                    if required:
+                        errors.setdefault(index, []).append(f"{key} ({title}) is required")
+                    continue
+                error = check(value)
+                if error is not None:
+                    errors.setdefault(index, []).append(f"{key} ({title}) {error}")
+
+        if self.strict:
+            for index, row in enumerate(rows):
+                unknown = [key for key in row.keys() - self._keys if not key.startswith("_")]
+                if unknown:
+                    errors.setdefault(index, []).extend(
+                        f"{key} is not an input of this workflow" for key in sorted(unknown)
+                    )
+        return errors
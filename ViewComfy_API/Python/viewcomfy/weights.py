@@ -0,0 +1,321 @@
+"""Preflight check of the model weights referenced by a workflow_api.json.
+
+SupportedWeights parses supported_weights.md (a "## Category" heading followed by
+"- filename" lines) into an index, and check_workflow() reports every weight a
+workflow references that is not in it, with the closest supported names.
+
+Run it from the command line with:
+
+    python -m viewcomfy.weights supported_weights.md workflow_api.json
+"""
+
+import argparse
+import bisect
+import difflib
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Any
+
+WEIGHT_EXTENSIONS = (
+    ".safetensors",
+    ".sft",
+    ".ckpt",
+    ".pt",
+    ".pth",
+    ".bin",
+    ".gguf",
+    ".onnx",
+    ".engine",
+)
+# Inputs that hold a weight even when its name has no file extension, e.g. a diffusers folder
+WEIGHT_INPUT_NAMES = {
+    "ckpt_name",
+    "unet_name",
+    "vae_name",
+    "lora_name",
+    "clip_name",
+    "clip_name1",
+    "clip_name2",
+    "clip_name3",
+    "control_net_name",
+    "model_name",
+    "upscale_model",
+    "ipadapter_file",
+    "pulid_file",
+    "instantid_file",
+    "style_model_name",
+    "gligen_name",
+}
+FUZZY_CUTOFF = 0.75
+MAX_SUGGESTIONS = 3
+MAX_PREFIX_MATCHES = 20
+
+_ALSO_AVAILABLE_RE = re.compile(r"^(?P<name>.+?)\s*\(Also available as (?P<alias>.+?)\)\s*$")
+
+
+def _normalize(name: str) -> str:
+    return name.strip().replace("\\", "/").lower()
+
+
+def _basename(name: str) -> str:
+    return name.rsplit("/", 1)[-1]
+
+
+def _extension(name: str) -> str:
+    _, dot, extension = name.rpartition(".")
+    return f".{extension}" if dot and f".{extension}" in WEIGHT_EXTENSIONS else ""
+
+
+def _stem(basename: str) -> str:
+    extension = _extension(basename)
+    return basename[: -len(extension)] if extension else basename
+
+
+# Workflows saved from the ComfyUI editor have top-level "nodes" and "links" and no "inputs"
+def _is_ui_workflow(workflow: dict[str, Any]) -> bool:
+    return isinstance(workflow.get("nodes"), list) and isinstance(workflow.get("links"), list)
+
+
+class WeightReference:
+    def __init__(self, *, node_id: str, class_type: str, input_name: str, value: str) -> None:
+        """Initialize a WeightReference object.
+
+        Args:
+            node_id (str): Id of the node in workflow_api.json
+            class_type (str): Class of the node, e.g. "LoraLoader"
+            input_name (str): Input holding the weight, e.g. "lora_name"
+            value (str): The referenced weight, e.g. "bbox/face_yolov8m.pt"
+
+        """
+        self.node_id = node_id
+        self.class_type = class_type
+        self.input_name = input_name
+        self.value = value
+
+
+class WeightIssue:
+    def __init__(self, *, reference: WeightReference, suggestions: list[str]) -> None:
+        """Initialize a WeightIssue object.
+
+        Args:
+            reference (WeightReference): The unsupported weight reference
+            suggestions (list[str]): Closest supported weights, most likely first. When
+                not empty the reference is probably misspelled.
+
+        """
+        self.reference = reference
+        self.suggestions = suggestions
+
+    def __str__(self) -> str:
+        reference = self.reference
+        msg = (
+            f'node {reference.node_id} ({reference.class_type}) input "{reference.input_name}": '
+            f'"{reference.value}" is not a supported weight'
+        )
+        if self.suggestions:
+            msg += ", did you mean " + " or ".join(f'"{name}"' for name in self.suggestions) + "?"
+        return msg
+
+
+class UnsupportedWeightsError(Exception):
+    def __init__(self, issues: list[WeightIssue]) -> None:
+        """Raised when a workflow references weights that are not supported.
+
+        Args:
+            issues (list[WeightIssue]): One issue per unsupported weight reference
+
+        """
+        super().__init__("Unsupported weights: " + "; ".join(str(issue) for issue in issues))
+        self.issues = issues
+
+
+class SupportedWeights:
+    def __init__(self, weights: dict[str, str]) -> None:
+        """Index supported weights. Use from_markdown() to load supported_weights.md.
+
+        Args:
+            weights (dict[str, str]): Weight filename (or folder) to its category
+
+        """
+        self.weights = weights
+        # normalized name -> category. A weight is supported only with its folder, as
+        # "bbox/face_yolov8m.pt" is not found under another folder.
+        self._exact: dict[str, str] = {}
+        # Suggestions compare names without their folder and extension, which otherwise
+        # dominate the similarity of short names. stem -> normalized names sharing it
+        self._by_stem: dict[str, list[str]] = {}
+        self._display: dict[str, str] = {}
+        for name, category in weights.items():
+            normalized = _normalize(name)
+            if normalized in self._exact:
+                continue
+            self._exact[normalized] = category
+            self._by_stem.setdefault(_stem(_basename(normalized)), []).append(normalized)
+            self._display[normalized] = name
+        # sorted stems, for the prefix and fuzzy lookups
+        self._all_stems = sorted(self._by_stem)
+        # Lookups repeat across the jobs of a batch, so their results are memoized.
+        self._lookup_cache: dict[str, list[str] | None] = {}
+
+    @classmethod
+    def from_markdown(cls, path: str | Path) -> "SupportedWeights":
+        """Parse supported_weights.md.
+
+        Args:
+            path (str | Path): Path to supported_weights.md
+
+        """
+        weights: dict[str, str] = {}
+        category = ""
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("#"):
+                    category = line.lstrip("#").strip()
+                elif line.startswith("- "):
+                    entry = line[2:].strip()
+                    match = _ALSO_AVAILABLE_RE.match(entry)
+                    if match:
+                        weights.setdefault(match.group("alias").strip(), category)
+                        entry = match.group("name")
+                    weights.setdefault(entry, category)
+        return cls(weights)
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def __contains__(self, name: str) -> bool:
+        return self.lookup(name) is None
+
+    def category(self, name: str) -> str | None:
+        """Return the category of a supported weight, None if it is not supported."""
+        return self._exact.get(_normalize(name))
+
+    def lookup(self, name: str) -> list[str] | None:
+        """Look a weight up.
+
+        Returns:
+            None if the weight is supported, otherwise the closest supported names
+            (possibly an empty list)
+
+        """
+        if name in self._lookup_cache:
+            return self._lookup_cache[name]
+
+        if _normalize(name) in self._exact:
+            result = None
+        else:
+            result = self.suggest(name)
+        self._lookup_cache[name] = result
+        return result
+
+    def suggest(self, name: str, limit: int = MAX_SUGGESTIONS) -> list[str]:
+        """Return the supported weights closest to name, either similar or starting with the same stem.
+
+        Stems, names without folder and extension, are compared, then mapped back to
+        the supported names. Names with the filename of name, e.g. the same weight in
+        another folder, come first, then names with the extension of name, if it has one.
+        """
+        basename = _basename(_normalize(name))
+        extension = _extension(basename)
+        stem = _stem(basename)
+        stems = set(difflib.get_close_matches(stem, self._all_stems, n=limit, cutoff=FUZZY_CUTOFF))
+        if len(stem) >= 4:
+            # Names that extend what was typed, e.g. "flux1-dev" -> "flux1-dev-fp8.safetensors"
+            start = bisect.bisect_left(self._all_stems, stem)
+            for candidate in self._all_stems[start : start + MAX_PREFIX_MATCHES]:
+                if not candidate.startswith(stem):
+                    break
+                stems.add(candidate)
+
+        suggestions = [candidate for candidate_stem in stems for candidate in self._by_stem[candidate_stem]]
+        ranked = sorted(
+            suggestions,
+            key=lambda candidate: (
+                _basename(candidate) != basename,
+                bool(extension) and _extension(candidate) != extension,
+                -difflib.SequenceMatcher(None, stem, _stem(candidate)).ratio(),
+                candidate,
+            ),
+        )
+        return [self._display[candidate] for candidate in ranked[:limit]]
+
+    def check_workflow(self, workflow_api: dict[str, Any]) -> list[WeightIssue]:
+        """Return an issue for every weight the workflow references that is not supported."""
+        issues = []
+        for reference in find_weight_references(workflow_api):
+            suggestions = self.lookup(reference.value)
+            if suggestions is not None:
+                issues.append(WeightIssue(reference=reference, suggestions=suggestions))
+        return issues
+
+    def check(self, workflow_api: dict[str, Any]) -> None:
+        """Raise UnsupportedWeightsError if the workflow references unsupported weights."""
+        issues = self.check_workflow(workflow_api)
+        if issues:
+            raise UnsupportedWeightsError(issues)
+
+
+def find_weight_references(workflow_api: dict[str, Any]) -> list[WeightReference]:
+    """Find the inputs of a workflow_api.json that reference a model weight.
+
+    An input references a weight if its value ends with a weight file extension,
+    or if its name is one of WEIGHT_INPUT_NAMES. A workflow saved from the ComfyUI
+    editor has no "inputs" to look at, so it raises instead of finding nothing:
+    convert it with viewcomfy.workflow_convert first.
+    """
+    if _is_ui_workflow(workflow_api):
+        msg = (
+            "The workflow is in the ComfyUI editor format, not the API format: export it with "
+            '"Save (API)" or convert it with python -m viewcomfy.workflow_convert'
+        )
+        raise Exception(msg)
+    references = []
+    for node_id, node in workflow_api.items():
+        if not isinstance(node, dict):
+            continue
+        for input_name, value in node.get("inputs", {}).items():
+            if not isinstance(value, str) or not value:
+                continue
+            if input_name in WEIGHT_INPUT_NAMES or value.lower().endswith(WEIGHT_EXTENSIONS):
+                references.append(
+                    WeightReference(
+                        node_id=node_id,
+                        class_type=node.get("class_type", ""),
+                        input_name=input_name,
+                        value=value,
+                    ),
+                )
+    return references
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check the weights used by workflow_api.json files")
+    parser.add_argument("supported_weights", help="Path to supported_weights.md")
+    parser.add_argument("workflows", nargs="+", help="workflow_api.json files to check")
+    args = parser.parse_args()
+
+    supported_weights = SupportedWeights.from_markdown(args.supported_weights)
+    failed = False
+    for path in args.workflows:
+        with open(path) as f:
+            workflow = json.load(f)
+        try:
+            issues = supported_weights.check_workflow(workflow)
+        except Exception as e:
+            failed = True
+            print(f"{path}: {e!s}")
+            continue
+        if issues:
+            failed = True
+            for issue in issues:
+                print(f"{path}: {issue}")
+        else:
+            print(f"{path}: all weights supported")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,443 @@
+"""Convert ComfyUI workflows from the UI format (workflow.json) to the API format (workflow_api.json).
+
+The UI format stores widget values by position (widgets_values) and connections as
+a separate list of links, with Reroute, PrimitiveNode and Set/Get nodes that only
+exist in the editor. The converter indexes nodes and links by id once, so every
+input is resolved with dictionary lookups whatever the size of the graph.
+
+Widget values have no names in the UI format, so the converter needs the widget
+names of each node type, held by NodeSchemas. They are read from the object_info
+of a ComfyUI server (GET /object_info), or learned from a UI workflow and its API
+export, e.g. the last export of the workflow being converted.
+
+Usage:
+
+    viewcomfy-workflow-api workflow.json --learn workflow.json workflow_api.json -o workflow_api.json
+    python -m viewcomfy.workflow_convert workflow.json --object-info object_info.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from viewcomfy import _json
+
+# Values of the "control after generate" widget that follows seed inputs in widgets_values
+CONTROL_VALUES = {"fixed", "increment", "decrement", "randomize"}
+# Inputs the editor adds a "control after generate" widget to without the option
+CONTROL_INPUT_NAMES = {"seed", "noise_seed"}
+WIDGET_TYPES = {"INT", "FLOAT", "STRING", "BOOLEAN", "COMBO"}
+# Options of an input that add an upload button widget after it
+UPLOAD_OPTIONS = ("image_upload", "video_upload", "audio_upload")
+
+# Editor-only nodes, never sent to the API
+REROUTE_TYPES = {"Reroute", "Reroute (rgthree)"}
+VIRTUAL_TYPES = REROUTE_TYPES | {"PrimitiveNode", "Note", "MarkdownNote", "SetNode", "GetNode"}
+MODE_MUTED = 2
+MODE_BYPASSED = 4
+
+MAX_CACHED_WORKFLOWS = 64
+
+
+class NodeSchemas:
+    def __init__(self, schemas: dict[str, dict[str, Any]] | None = None) -> None:
+        """Widget names and display names of node types.
+
+        Each schema is {"widgets": [...], "display_name": str}, where widgets lists
+        the name of each value of widgets_values in order, None for values that are
+        not inputs (the control after generate of seeds, upload buttons).
+
+        Args:
+            schemas (dict, optional): Schemas by class_type, e.g. loaded from a file saved with save()
+
+        """
+        self.schemas: dict[str, dict[str, Any]] = dict(schemas or {})
+        self._fingerprint: str | None = None
+
+    @classmethod
+    def from_object_info(cls, object_info: dict[str, Any]) -> "NodeSchemas":
+        """Build the schemas of every node type of a ComfyUI server from its /object_info response."""
+        schemas = cls()
+        for class_type, info in object_info.items():
+            inputs = info.get("input", {})
+            order = info.get("input_order") or {section: list(inputs.get(section, {})) for section in ("required", "optional")}
+            widgets: list[str | None] = []
+            for section in ("required", "optional"):
+                for name in order.get(section, []):
+                    spec = inputs.get(section, {}).get(name)
+                    if not spec:
+                        continue
+                    input_type = spec[0]
+                    options = spec[1] if len(spec) > 1 and isinstance(spec[1], dict) else {}
+                    if options.get("forceInput") or not (isinstance(input_type, list) or input_type in WIDGET_TYPES):
+                        continue
+                    widgets.append(name)
+                    if input_type == "INT" and (options.get("control_after_generate") or name in CONTROL_INPUT_NAMES):
+                        widgets.append(None)
+                    if any(options.get(option) for option in UPLOAD_OPTIONS):
+                        widgets.append(None)
+            schemas.schemas[class_type] = {"widgets": widgets, "display_name": info.get("display_name") or class_type}
+        return schemas
+
+    def learn(self, ui_workflow: dict[str, Any], api_workflow: dict[str, Any]) -> list[str]:
+        """Learn the schemas of the node types of a UI workflow from its API export.
+
+        Returns:
+            list[str]: Node types whose widgets could not be matched with the export
+
+        """
+        nodes = {str(node["id"]): node for node in ui_workflow.get("nodes", [])}
+        unmatched = []
+        for node_id, api_node in api_workflow.items():
+            node = nodes.get(node_id)
+            class_type = api_node.get("class_type")
+            if node is None or node.get("type") != class_type:
+                continue
+            widgets = _match_widgets(node, api_node["inputs"])
+            if widgets is None:
+                unmatched.append(class_type)
+                continue
+            schema = self.schemas.setdefault(class_type, {"widgets": widgets, "display_name": class_type})
+            if len(widgets) > len(schema["widgets"]):
+                schema["widgets"] = widgets
+            if "title" not in node and api_node.get("_meta", {}).get("title"):
+                schema["display_name"] = api_node["_meta"]["title"]
+        self._fingerprint = None
+        return unmatched
+
+    def widgets(self, node: dict[str, Any]) -> list[str | None]:
+        schema = self.schemas.get(node["type"])
+        if schema is not None:
+            return schema["widgets"]
+        # Recent versions of the editor list every widget among the node inputs.
+        names = [entry["widget"]["name"] for entry in node.get("inputs", []) if entry.get("widget")]
+        values = node.get("widgets_values") or []
+        if isinstance(values, list) and names and len(names) >= len(values) - _control_count(values):
+            return _with_control_slots(names, values)
+        msg = (
+            f"Unknown widgets of {node['type']} (node {node['id']}): pass the object_info of your ComfyUI "
+            "server, or an API export of a workflow that uses it"
+        )
+        raise Exception(msg)
+
+    def display_name(self, class_type: str) -> str:
+        schema = self.schemas.get(class_type)
+        return schema["display_name"] if schema is not None else class_type
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the schemas, part of the cache key of converted workflows."""
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.sha256(json.dumps(self.schemas, sort_keys=True).encode()).hexdigest()
+        return self._fingerprint
+
+    def save(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(self.schemas, indent=2, sort_keys=True))
+
+    @classmethod
+    def load(cls, path: str | Path) -> "NodeSchemas":
+        return cls(json.loads(Path(path).read_text()))
+
+
+def _match_widgets(node: dict[str, Any], api_inputs: dict[str, Any]) -> list[str | None] | None:
+    """Align the widgets_values of a UI node with the inputs of its API export."""
+    link_inputs = {entry["name"] for entry in node.get("inputs", []) if not entry.get("widget")}
+    names = [name for name in api_inputs if name not in link_inputs]
+    values = node.get("widgets_values") or []
+    if isinstance(values, dict):
+        return names
+    widgets: list[str | None] = []
+    index = 0
+    for name in names:
+        expected = api_inputs[name]
+        if not _is_link(expected):
+            # Skip the values that are not inputs, up to the one sent for this name.
+            while index < len(values) and values[index] != expected:
+                widgets.append(None)
+                index += 1
+            if index == len(values):
+                return None
+        widgets.append(name)
+        index += 1
+        if _is_control(values, index):
+            widgets.append(None)
+            index += 1
+    return widgets
+
+
+def _is_link(value: Any) -> bool:
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[0], str) and isinstance(value[1], int)
+
+
+def _is_control(values: list[Any], index: int) -> bool:
+    previous = values[index - 1] if index > 0 else None
+    return (
+        index < len(values)
+        and values[index] in CONTROL_VALUES
+        and isinstance(previous, int)
+        and not isinstance(previous, bool)
+    )
+
+
+def _control_count(values: list[Any]) -> int:
+    return sum(1 for index in range(len(values)) if _is_control(values, index))
+
+
+def _with_control_slots(names: list[str], values: list[Any]) -> list[str | None]:
+    widgets: list[str | None] = []
+    index = 0
+    for name in names:
+        widgets.append(name)
+        index += 1
+        if _is_control(values, index):
+            widgets.append(None)
+            index += 1
+    return widgets
+
+
+class _Graph:
+    def __init__(self, ui_workflow: dict[str, Any]) -> None:
+        self.nodes: dict[int, dict[str, Any]] = {node["id"]: node for node in ui_workflow.get("nodes", [])}
+        # link id -> (origin node id, origin slot, type)
+        self.links: dict[int, tuple[int, int, Any]] = {}
+        for link in ui_workflow.get("links", []):
+            if isinstance(link, dict):
+                self.links[link["id"]] = (link["origin_id"], link["origin_slot"], link.get("type"))
+            else:
+                self.links[link[0]] = (link[1], link[2], link[5] if len(link) > 5 else None)
+        self.setters: dict[Any, dict[str, Any]] = {
+            node["widgets_values"][0]: node
+            for node in self.nodes.values()
+            if node.get("type") == "SetNode" and node.get("widgets_values")
+        }
+
+    def resolve(self, link_id: int | None) -> tuple[str, Any] | None:
+        """Follow a link through editor-only and bypassed nodes.
+
+        Returns:
+            ("link", [node id, slot]), ("value", value) for a PrimitiveNode, or None
+            when the input ends up unconnected
+
+        """
+        seen = set()
+        while link_id is not None and link_id not in seen:
+            seen.add(link_id)
+            link = self.links.get(link_id)
+            if link is None:
+                return None
+            origin_id, origin_slot, link_type = link
+            origin = self.nodes.get(origin_id)
+            if origin is None or origin.get("mode") == MODE_MUTED:
+                return None
+            origin_type = origin.get("type")
+            if origin_type in REROUTE_TYPES:
+                link_id = _first_link(origin)
+            elif origin_type == "PrimitiveNode":
+                values = origin.get("widgets_values") or [None]
+                return ("value", values[0])
+            elif origin_type == "GetNode":
+                setter = self.setters.get((origin.get("widgets_values") or [None])[0])
+                link_id = _first_link(setter) if setter is not None else None
+            elif origin_type == "SetNode":
+                link_id = _first_link(origin)
+            elif origin.get("mode") == MODE_BYPASSED:
+                link_id = _bypass_link(origin, origin_slot, link_type)
+            else:
+                return ("link", [str(origin_id), origin_slot])
+        return None
+
+
+def _first_link(node: dict[str, Any]) -> int | None:
+    for entry in node.get("inputs", []):
+        if entry.get("link") is not None:
+            return entry["link"]
+    return None
+
+
+def _bypass_link(node: dict[str, Any], slot: int, link_type: Any) -> int | None:
+    """Input a bypassed node passes through to its output slot: the first connected input of the same type."""
+    outputs = node.get("outputs", [])
+    output_type = outputs[slot].get("type") if slot < len(outputs) else link_type
+    for entry in node.get("inputs", []):
+        if entry.get("link") is not None and entry.get("type") in (output_type, "*"):
+            return entry["link"]
+    return None
+
+
+def convert_ui_workflow(ui_workflow: dict[str, Any], schemas: NodeSchemas) -> dict[str, Any]:
+    """Convert a UI workflow to the API format, with the nodes sorted by id like the ComfyUI export.
+
+    Muted and bypassed nodes are left out, inputs connected to them are dropped or,
+    for bypassed nodes, connected to the input they pass through.
+    """
+    graph = _graph_for(ui_workflow)
+    prompt: dict[str, Any] = {}
+    for node_id in sorted(graph.nodes):
+        node = graph.nodes[node_id]
+        class_type = node.get("type")
+        if class_type in VIRTUAL_TYPES or node.get("mode") in (MODE_MUTED, MODE_BYPASSED):
+            continue
+
+        inputs: dict[str, Any] = {}
+        values = node.get("widgets_values")
+        if isinstance(values, dict):
+            inputs.update((name, value) for name, value in values.items() if name != "videopreview")
+        elif values:
+            for name, value in zip(schemas.widgets(node), values):
+                if name is not None:
+                    inputs[name] = value
+
+        for entry in node.get("inputs", []):
+            if entry.get("link") is None:
+                continue
+            name = entry["widget"]["name"] if entry.get("widget") else entry["name"]
+            source = graph.resolve(entry["link"])
+            if source is None:
+                continue
+            inputs[name] = source[1]
+
+        prompt[str(node["id"])] = {
+            "inputs": inputs,
+            "class_type": class_type,
+            "_meta": {"title": node.get("title") or schemas.display_name(class_type)},
+        }
+    return prompt
+
+
+def _graph_for(ui_workflow: dict[str, Any]) -> _Graph:
+    if ui_workflow.get("definitions", {}).get("subgraphs"):
+        msg = "Workflows with subgraphs are not supported, convert them from the ComfyUI editor"
+        raise Exception(msg)
+    return _Graph(ui_workflow)
+
+
+def dump_api_workflow(api_workflow: dict[str, Any]) -> str:
+    """Serialize like the ComfyUI "Export (API)" menu, so regenerated files diff cleanly."""
+    return json.dumps(api_workflow, indent=2, ensure_ascii=False)
+
+
+class WorkflowConverter:
+    def __init__(
+        self,
+        schemas: NodeSchemas,
+        *,
+        cache_dir: str | Path | None = None,
+        max_cached: int = MAX_CACHED_WORKFLOWS,
+    ) -> None:
+        """Convert UI workflows, caching the results by the hash of the input and of the schemas.
+
+        Files that were already converted are served from the cache without being
+        parsed, from memory or from cache_dir across runs.
+
+        Args:
+            schemas (NodeSchemas): Widget names of the node types
+            cache_dir (str | Path, optional): Folder the converted workflows are kept in
+            max_cached (int): Number of converted workflows kept in memory
+
+        """
+        self.schemas = schemas
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_cached = max_cached
+        # cache key -> serialized API workflow
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def convert_text(self, ui_workflow: str | bytes) -> str:
+        """Convert the text of a workflow.json and return the text of its workflow_api.json."""
+        data = ui_workflow.encode() if isinstance(ui_workflow, str) else ui_workflow
+        key = hashlib.sha256(data + self.schemas.fingerprint.encode()).hexdigest()
+        text = self._cached(key)
+        if text is not None:
+            self.hits += 1
+            return text
+
+        self.misses += 1
+        text = dump_api_workflow(convert_ui_workflow(_json.loads(data), self.schemas))
+        self._store(key, text)
+        return text
+
+    def convert_file(self, path: str | Path) -> dict[str, Any]:
+        return _json.loads(self.convert_text(Path(path).read_bytes()))
+
+    def _cached(self, key: str) -> str | None:
+        text = self._cache.get(key)
+        if text is not None:
+            self._cache.move_to_end(key)
+            return text
+        if self.cache_dir is not None:
+            path = self.cache_dir / f"{key}.json"
+            if path.exists():
+                text = path.read_text()
+                self._remember(key, text)
+                return text
+        return None
+
+    def _store(self, key: str, text: str) -> None:
+        self._remember(key, text)
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            partial = self.cache_dir / f"{key}.json.part"
+            partial.write_text(text)
+            os.replace(partial, self.cache_dir / f"{key}.json")
+
+    def _remember(self, key: str, text: str) -> None:
+        self._cache[key] = text
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert a ComfyUI UI workflow (workflow.json) to the API format")
+    parser.add_argument("workflow", help="The UI workflow.json")
+    parser.add_argument("-o", "--output", help="Defaults to <workflow>_api.json next to the input, - for stdout")
+    parser.add_argument("--object-info", help="Response of GET /object_info of a ComfyUI server with the workflow's nodes")
+    parser.add_argument(
+        "--learn",
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("UI_JSON", "API_JSON"),
+        help="Learn widget names from a UI workflow and its API export. Repeat for several pairs.",
+    )
+    parser.add_argument("--schemas", help="Node schemas saved with --save-schemas")
+    parser.add_argument("--save-schemas", help="Write the node schemas used, to reuse them with --schemas")
+    parser.add_argument("--cache-dir", help="Keep converted workflows here, keyed by the hash of the input")
+    args = parser.parse_args(argv)
+
+    schemas = NodeSchemas.load(args.schemas) if args.schemas else NodeSchemas()
+    if args.object_info:
+        with open(args.object_info) as f:
+            schemas.schemas.update(NodeSchemas.from_object_info(json.load(f)).schemas)
+    for ui_path, api_path in args.learn:
+        with open(ui_path) as ui_file, open(api_path) as api_file:
+            unmatched = schemas.learn(json.load(ui_file), json.load(api_file))
+        if unmatched:
+            print(f"Could not learn the widgets of {', '.join(sorted(set(unmatched)))} from {api_path}", file=sys.stderr)
+    if args.save_schemas:
+        schemas.save(args.save_schemas)
+
+    converter = WorkflowConverter(schemas, cache_dir=args.cache_dir)
+    try:
+        text = converter.convert_text(Path(args.workflow).read_bytes())
+    except Exception as e:
+        print(f"Error converting {args.workflow}: {e!s}", file=sys.stderr)
+        return 1
+
+    if args.output == "-":
+        print(text)
+        return 0
+    workflow = Path(args.workflow)
+    output = Path(args.output) if args.output else workflow.with_name(f"{workflow.stem}_api.json")
+    output.write_text(text)
+    print(f"Wrote {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Send override workflows as a JSON Patch against a base workflow the server already has.
+
+Base workflows are identified by workflow_hash(), the SHA-256 of their canonical
+JSON. Patches are RFC 6902 operations ("add", "remove", "replace"): dicts are
+diffed key by key, and lists that differ are replaced as a whole, which keeps the
+node links of a workflow_api.json atomic.
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+from typing import Any
+
+
+def canonical_json(workflow_api: dict[str, Any]) -> str:
+    return json.dumps(workflow_api, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def workflow_hash(workflow_api: dict[str, Any]) -> str:
+    return hashlib.sha256(canonical_json(workflow_api).encode()).hexdigest()
+
+
+def _escape(key: str) -> str:
+    return key.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def diff_workflow(base: dict[str, Any], target: dict[str, Any]) -> list[dict[str, Any]]:
+    """Return the JSON Patch that turns base into target."""
+    patch: list[dict[str, Any]] = []
+    _diff(base, target, "", patch)
+    return patch
+
+
+def _diff(base: Any, target: Any, path: str, patch: list[dict[str, Any]]) -> None:
+    if isinstance(base, dict) and isinstance(target, dict):
+        for key in base.keys() - target.keys():
+            patch.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in target.items():
+            key_path = f"{path}/{_escape(key)}"
+            if key not in base:
+                patch.append({"op": "add", "path": key_path, "value": value})
+            else:
+                _diff(base[key], value, key_path, patch)
+    elif base != target or type(base) is not type(target):
+        patch.append({"op": "replace", "path": path, "value": target})
+
+
+def apply_patch(base: dict[str, Any], patch: list[dict[str, Any]]) -> dict[str, Any]:
+    """Return a copy of base with the patch applied. Supports add, remove and replace."""
+    result = copy.deepcopy(base)
+    for operation in patch:
+        op = operation["op"]
+        tokens = [_unescape(token) for token in operation["path"].split("/")[1:]]
+        if not tokens:
+            if op != "replace":
+                msg = f"Unsupported patch operation on the root: {op}"
+                raise Exception(msg)
+            result = copy.deepcopy(operation["value"])
+            continue
+
+        parent = result
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        if isinstance(parent, list):
+            index = len(parent) if last == "-" else int(last)
+            if op == "add":
+                parent.insert(index, copy.deepcopy(operation["value"]))
+            elif op == "remove":
+                del parent[index]
+            elif op == "replace":
+                parent[index] = copy.deepcopy(operation["value"])
+            else:
+                msg = f"Unsupported patch operation: {op}"
+                raise Exception(msg)
+        elif op in ("add", "replace"):
+            parent[last] = copy.deepcopy(operation["value"])
+        elif op == "remove":
+            del parent[last]
+        else:
+            msg = f"Unsupported patch operation: {op}"
+            raise Exception(msg)
+    return result
+
+
+class UnknownWorkflowBaseError(Exception):
+    def __init__(self, base_hash: str) -> None:
+        """Raised when the API rejects a patch because it does not have its base workflow.
+
+        Args:
+            base_hash (str): Hash of the base the patch was made against
+
+        """
+        super().__init__(f"The API does not have base workflow {base_hash}")
+        self.base_hash = base_hash
+
+
+class WorkflowBaseRegistry:
+    def __init__(self) -> None:
+        """Base workflows that override workflows can be sent as a patch against.
+
+        Share one registry between the clients that send the same overrides, so
+        each base is only uploaded to the API once.
+        """
+        self.bases: dict[str, dict[str, Any]] = {}
+        # Hashes of the bases the API already has
+        self.registered: set[str] = set()
+        # None until the first registration tells us whether the API accepts bases
+        self.supported: bool | None = None
+        self._lock: asyncio.Lock | None = None
+
+    def register(self, workflow_api: dict[str, Any]) -> str:
+        """Add a base workflow and return its hash."""
+        base_hash = workflow_hash(workflow_api)
+        self.bases[base_hash] = copy.deepcopy(workflow_api)
+        return base_hash
+
+    def closest_patch(self, workflow_api: dict[str, Any]) -> tuple[str, list[dict[str, Any]]] | None:
+        """Return the hash of the base with the smallest patch to workflow_api, and that patch."""
+        best = None
+        for base_hash, base in self.bases.items():
+            patch = diff_workflow(base, workflow_api)
+            if best is None or len(patch) < len(best[1]):
+                best = (base_hash, patch)
+        return best
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
@@ -1,7 +1,9 @@
 import uuid
 import websocket
 import json
+import copy
 import random
+import time
 import asyncio
 import requests
 
@@ -15,10 +17,285 @@ generation_parameters = {
     "positive_prompt": "a cat walking on a fence",
 }
 
+class WorkflowIndex():
+    """Index of a workflow_api.json, built once per loaded workflow.
+
+    Maps class_type, _meta.title and input names to node ids, and keeps the links
+    between nodes in both directions, so updates do not rescan the graph. The index
+    only depends on the structure of the workflow, so it stays valid for every copy
+    of the workflow it was built from.
+    """
+
+    def __init__(self, workflow):
+        self.by_class_type = {}
+        self.by_title = {}
+        self.by_input = {}
+        # node id -> {input name: (source node id, output index)}
+        self.upstream = {}
+        # node id -> [(target node id, input name, output index)]
+        self.downstream = {}
+        self.class_types = {}
+        self.titles = {}
+
+        for node_id, node in workflow.items():
+            class_type = node.get('class_type')
+            title = node.get('_meta', {}).get('title')
+            self.class_types[node_id] = class_type
+            self.titles[node_id] = title
+            self.by_class_type.setdefault(class_type, []).append(node_id)
+            if title is not None:
+                self.by_title.setdefault(title, []).append(node_id)
+            for input_name, value in node.get('inputs', {}).items():
+                self.by_input.setdefault(input_name, []).append(node_id)
+                if isinstance(value, list) and len(value) == 2 and str(value[0]) in workflow:
+                    source = str(value[0])
+                    self.upstream.setdefault(node_id, {})[input_name] = (source, value[1])
+                    self.downstream.setdefault(source, []).append((node_id, input_name, value[1]))
+
+    def find(self, class_type=None, title=None, has_input=None):
+        """Return the ids of the nodes matching every given criterion"""
+        candidates = None
+        for index, key in ((self.by_class_type, class_type), (self.by_title, title), (self.by_input, has_input)):
+            if key is None:
+                continue
+            matches = index.get(key, [])
+            candidates = list(matches) if candidates is None else [node_id for node_id in candidates if node_id in matches]
+        return candidates if candidates is not None else list(self.class_types)
+
+    def one(self, class_type=None, title=None, has_input=None):
+        """Return the id of the only node matching the criteria, raise if there are none or several"""
+        matches = self.find(class_type=class_type, title=title, has_input=has_input)
+        if len(matches) != 1:
+            criteria = {'class_type': class_type, 'title': title, 'has_input': has_input}
+            criteria = ', '.join(f'{key}={value!r}' for key, value in criteria.items() if value is not None)
+            found = ', '.join(f'{node_id} ({self.titles[node_id]})' for node_id in matches) or 'none'
+            raise ValueError(f"Expected one node with {criteria}, found: {found}. Add a title to narrow it down.")
+        return matches[0]
+
+    def feeding(self, node_id, input_name, class_type=None):
+        """Return the id of the node feeding an input, e.g. the text node feeding a KSampler's positive input.
+
+        Without class_type this is the node directly linked to the input. With class_type, links
+        are followed upstream through the nodes in between (e.g. ControlNetApplyAdvanced), taking
+        the input with the same name when a node has one, until a node of that class is reached.
+        """
+        link = self.upstream.get(node_id, {}).get(input_name)
+        if link is None:
+            raise ValueError(f"Input {input_name} of node {node_id} is not linked to another node")
+        source = link[0]
+        if class_type is None:
+            return source
+
+        while self.class_types[source] != class_type:
+            same_input = self.upstream.get(source, {}).get(input_name)
+            if same_input is None:
+                break
+            source = same_input[0]
+        if self.class_types[source] == class_type:
+            return source
+
+        """No input with the same name to follow, search every input of the last node"""
+        matches, seen, pending = [], set(), [source]
+        while pending:
+            current = pending.pop()
+            for upstream_id, _ in self.upstream.get(current, {}).values():
+                if upstream_id in seen:
+                    continue
+                seen.add(upstream_id)
+                if self.class_types[upstream_id] == class_type:
+                    matches.append(upstream_id)
+                else:
+                    pending.append(upstream_id)
+        if len(matches) != 1:
+            found = ', '.join(matches) or 'none'
+            raise ValueError(f"Expected one {class_type} feeding {node_id}.{input_name}, found: {found}")
+        return matches[0]
+
+    def fed_by(self, node_id, class_type=None):
+        """Return the ids of the nodes that use an output of node_id"""
+        return [target for target, _, _ in self.downstream.get(node_id, [])
+                if class_type is None or self.class_types[target] == class_type]
+
+
+class NodeProfiler():
+    """Per-node timings of prompts, built from the websocket messages received by track_progress.
+
+    A node runs from its "executing" message until its "executed" message or the next "executing",
+    whichever comes first. Runs are kept so the timings can be aggregated across prompts, and
+    exported as JSON or as collapsed stacks that flamegraph.pl and speedscope can render.
+    """
+
+    def __init__(self, workflow_name='workflow'):
+        self.workflow_name = workflow_name
+        self.runs = []
+        self._current = None
+        self._index = None
+
+    def start_prompt(self, prompt_id, index=None):
+        """Start timing a prompt. The WorkflowIndex from load_workflow is used to name the nodes"""
+        self._current = {
+            'prompt_id': prompt_id,
+            'started_at': time.time(),
+            'start': time.perf_counter(),
+            'nodes': {},
+            'running': None,
+            'running_since': None,
+        }
+        self._index = index
+
+    def _node(self, node_id):
+        nodes = self._current['nodes']
+        if node_id not in nodes:
+            nodes[node_id] = {
+                'class_type': self._index.class_types.get(node_id) if self._index else None,
+                'title': self._index.titles.get(node_id) if self._index else None,
+                'cached': False,
+                'outputs': False,
+                'wall_seconds': 0.0,
+                'steps': 0,
+                'first_step_at': None,
+                'last_step_at': None,
+            }
+        return nodes[node_id]
+
+    def _stop_running(self, now):
+        current = self._current
+        if current['running'] is not None:
+            self._node(current['running'])['wall_seconds'] += now - current['running_since']
+        current['running'] = None
+        current['running_since'] = None
+
+    def record(self, message):
+        """Timestamp one websocket message of the prompt being profiled"""
+        if self._current is None or not isinstance(message, dict):
+            return
+        now = time.perf_counter()
+        data = message.get('data') or {}
+        if data.get('prompt_id') not in (None, self._current['prompt_id']):
+            return
+
+        if message.get('type') == 'execution_cached':
+            for node_id in data.get('nodes', []):
+                self._node(node_id)['cached'] = True
+        elif message.get('type') == 'executing':
+            self._stop_running(now)
+            if data.get('node') is not None:
+                self._current['running'] = data['node']
+                self._current['running_since'] = now
+                self._node(data['node'])
+        elif message.get('type') == 'executed':
+            '''The node is done: stop its clock here rather than at the next "executing"'''
+            node_id = data.get('node')
+            if node_id is None:
+                return
+            if node_id == self._current['running']:
+                self._stop_running(now)
+            self._node(node_id)['outputs'] = True
+        elif message.get('type') == 'execution_success':
+            self._stop_running(now)
+        elif message.get('type') == 'progress':
+            node_id = data.get('node') or self._current['running']
+            if node_id is None:
+                return
+            node = self._node(node_id)
+            node['steps'] = data['value']
+            if node['first_step_at'] is None:
+                node['first_step_at'] = now
+            node['last_step_at'] = now
+
+    def finish_prompt(self):
+        """Stop timing the prompt and return its per-node timing table"""
+        current = self._current
+        if current is None:
+            return None
+        now = time.perf_counter()
+        self._stop_running(now)
+        nodes = {}
+        for node_id, node in current['nodes'].items():
+            steps_per_second = None
+            if node['steps'] > 1 and node['last_step_at'] > node['first_step_at']:
+                '''The first progress message is sent when step 1 is done'''
+                steps_per_second = (node['steps'] - 1) / (node['last_step_at'] - node['first_step_at'])
+            nodes[node_id] = {
+                'class_type': node['class_type'],
+                'title': node['title'],
+                'cached': node['cached'],
+                'outputs': node['outputs'],
+                'wall_seconds': node['wall_seconds'],
+                'steps': node['steps'],
+                'steps_per_second': steps_per_second,
+            }
+        run = {
+            'prompt_id': current['prompt_id'],
+            'started_at': current['started_at'],
+            'wall_seconds': now - current['start'],
+            'nodes': nodes,
+        }
+        self.runs.append(run)
+        self._current = None
+        return run
+
+    def summary(self):
+        """Aggregate the runs per node, slowest first: runs, cache hit rate, total and mean wall time, mean steps/s"""
+        summary = {}
+        for run in self.runs:
+            for node_id, node in run['nodes'].items():
+                entry = summary.setdefault(node_id, {
+                    'class_type': node['class_type'],
+                    'title': node['title'],
+                    'runs': 0,
+                    'cached': 0,
+                    'total_wall_seconds': 0.0,
+                    'steps_per_second': [],
+                })
+                entry['runs'] += 1
+                entry['cached'] += int(node['cached'])
+                entry['total_wall_seconds'] += node['wall_seconds']
+                if node['steps_per_second'] is not None:
+                    entry['steps_per_second'].append(node['steps_per_second'])
+        for entry in summary.values():
+            executed = entry['runs'] - entry['cached']
+            entry['executed'] = executed
+            entry['cache_hit_rate'] = entry['cached'] / entry['runs']
+            entry['mean_wall_seconds'] = entry['total_wall_seconds'] / executed if executed else 0.0
+            rates = entry.pop('steps_per_second')
+            entry['mean_steps_per_second'] = sum(rates) / len(rates) if rates else None
+        return dict(sorted(summary.items(), key=lambda item: -item[1]['total_wall_seconds']))
+
+    def print_table(self):
+        print(f"{'node':<8}{'class_type':<32}{'runs':>6}{'cached':>8}{'total s':>10}{'mean s':>9}{'steps/s':>9}")
+        for node_id, entry in self.summary().items():
+            steps = f"{entry['mean_steps_per_second']:.2f}" if entry['mean_steps_per_second'] else '-'
+            print(f"{node_id:<8}{str(entry['class_type'])[:31]:<32}{entry['runs']:>6}{entry['cache_hit_rate']:>8.0%}"
+                  f"{entry['total_wall_seconds']:>10.2f}{entry['mean_wall_seconds']:>9.2f}{steps:>9}")
+
+    def export_json(self, path):
+        with open(path, 'w') as file:
+            json.dump({'workflow': self.workflow_name, 'runs': self.runs, 'summary': self.summary()}, file, indent=2)
+
+    def export_flamegraph(self, path):
+        """Write collapsed stacks ("workflow;node microseconds" lines) summed over all runs,
+        e.g. for flamegraph.pl profile.folded > profile.svg"""
+        with open(path, 'w') as file:
+            for node_id, entry in self.summary().items():
+                microseconds = int(entry['total_wall_seconds'] * 1_000_000)
+                if microseconds == 0:
+                    continue
+                frame = f"{entry['class_type'] or 'node'} #{node_id}"
+                if entry['title'] and entry['title'] != entry['class_type']:
+                    frame += f" ({entry['title']})"
+                frame = frame.replace(';', ',')
+                file.write(f"{self.workflow_name};{frame} {microseconds}\n")
+
+
 class ComfyUIService():
-    def __init__(self, server_address='127.0.0.1:2222', workflow_path='workflow_api.json'):
+    def __init__(self, server_address='127.0.0.1:2222', workflow_path='workflow_api.json', profiler=None):
         self.server_address = server_address
         self.workflow_path = workflow_path
+        # Optional NodeProfiler timing the nodes of every prompt
+        self.profiler = profiler
+        # workflow_path -> (workflow, WorkflowIndex), loaded once and copied for each job
+        self._workflows = {}
        
     async def establish_connection(self):
         client_id = str(uuid.uuid4())
@@ -27,8 +304,13 @@ class ComfyUIService():
         return ws, self.server_address, client_id
     
     def load_workflow(self, workflow_path):
-        with open(workflow_path, 'r') as file:
-            return json.load(file)
+        """Return a copy of the workflow and its index. The file is only read and indexed once"""
+        if workflow_path not in self._workflows:
+            with open(workflow_path, 'r') as file:
+                workflow = json.load(file)
+            self._workflows[workflow_path] = (workflow, WorkflowIndex(workflow))
+        workflow, index = self._workflows[workflow_path]
+        return copy.deepcopy(workflow), index
         
     async def queue_prompt(self, prompt, client_id, server_address):
         """Queue a workflow for execution. The prompt here is the full workflow_api.json file"""
@@ -37,21 +319,24 @@ class ComfyUIService():
         response = requests.post(f"http://{server_address}/prompt", json=data, headers=headers)
         return response.json()
         
-    def update_workflow(self, prompt, input_path, positive_prompt):
-        id_to_class_type = {id: details['class_type'] for id, details in prompt.items()}
-        k_sampler = [key for key, value in id_to_class_type.items() if value == 'KSampler'][0]
+    def update_workflow(self, prompt, input_path, positive_prompt, index=None, image_loader_title=None):
+        """Set a random seed, the positive prompt and the input image. Pass image_loader_title when
+        the workflow has several LoadImage nodes, and the index from load_workflow to skip re-indexing"""
+        if index is None:
+            index = WorkflowIndex(prompt)
+        k_sampler = index.one(class_type='KSampler')
 
         """Set the seed to random"""
-        prompt.get(k_sampler)['inputs']['seed'] = random.randint(10**14, 10**15 - 1)
+        prompt[k_sampler]['inputs']['seed'] = random.randint(10**14, 10**15 - 1)
 
         """Update the positive prompt"""
-        text_prompt = prompt.get(k_sampler)['inputs']['positive'][0]
-        prompt.get(text_prompt)['inputs']['text'] = positive_prompt
+        text_prompt = index.feeding(k_sampler, 'positive', class_type='CLIPTextEncode')
+        prompt[text_prompt]['inputs']['text'] = positive_prompt
 
         """Update the path to the input image"""
-        image_loader = [key for key, value in id_to_class_type.items() if value == 'LoadImage'][0]
+        image_loader = index.one(class_type='LoadImage', title=image_loader_title)
         filename = input_path.split('/')[-1]
-        prompt.get(image_loader)['inputs']['image'] = filename
+        prompt[image_loader]['inputs']['image'] = filename
 
         return prompt
     
@@ -59,7 +344,14 @@ class ComfyUIService():
         """Track the progress of image generation"""
         while True:
             try:
-                message = json.loads(ws.recv())
+                out = ws.recv()
+                if not isinstance(out, str):
+                    '''Binary frames are previews of the sampler'''
+                    continue
+                message = json.loads(out)
+                if self.profiler is not None:
+                    self.profiler.record(message)
+
                 if message['type'] == 'progress':
                     '''If the workflow is running print k-sampler current step over total steps'''
                     print(f"Progress: {message['data']['value']}/{message['data']['max']}")
@@ -72,12 +364,21 @@ class ComfyUIService():
                     '''Print list of nodes that are cached'''
                     print(f"Cached execution: {message['data']}")
                 
-                '''Check for completion'''
-                if (message['type'] == 'executed' and 
-                    'prompt_id' in message['data'] and 
-                    message['data']['prompt_id'] == prompt_id):
+                elif message['type'] == 'executed':
+                    '''Print the node that produced an output, the prompt may still have nodes to run'''
+                    print(f"Executed node: {message['data'].get('node')}")
+
+                '''Check for completion: "executing" with no node, or "execution_success" on recent servers'''
+                data = message.get('data') or {}
+                if data.get('prompt_id') != prompt_id:
+                    continue
+                if ((message['type'] == 'executing' and data.get('node') is None) or
+                    message['type'] == 'execution_success'):
                     print("Generation completed")
                     return True
+                if message['type'] in ('execution_error', 'execution_interrupted'):
+                    print(f"Generation failed: {data}")
+                    return False
                 
             except Exception as e:
                 print(f"Error processing message: {e}")
@@ -114,10 +415,11 @@ class ComfyUIService():
        
         try:
             """Update the workflow with the generation parameters"""
-            workflow = self.load_workflow('workflow_api.json')
+            workflow, index = self.load_workflow(self.workflow_path)
             workflow = self.update_workflow(workflow, 
                                             input_path=generation_parameters['input_path'],
-                                            positive_prompt=generation_parameters['positive_prompt']
+                                            positive_prompt=generation_parameters['positive_prompt'],
+                                            index=index
                                             )
             
             """Upload the input image to the server"""
@@ -128,7 +430,11 @@ class ComfyUIService():
             prompt_id = prompt_id['prompt_id']
 
             """Track the progress"""
+            if self.profiler is not None:
+                self.profiler.start_prompt(prompt_id, index)
             completed = self.track_progress(ws, prompt_id)
+            if self.profiler is not None:
+                self.profiler.finish_prompt()
             if not completed:
                 print("Generation failed or interrupted")
                 return None
@@ -156,5 +462,16 @@ async def main():
     with open('output.png', 'wb') as file:
         file.write(image_output[0])
 
+async def profile(runs=5):
+    """Run the workflow several times and show which nodes dominate its runtime"""
+    service = ComfyUIService(profiler=NodeProfiler(workflow_name='workflow_api'))
+    for _ in range(runs):
+        await service.generate_image(generation_parameters)
+    service.profiler.print_table()
+    service.profiler.export_json('profile.json')
+    service.profiler.export_flamegraph('profile.folded')
+
 if __name__ == "__main__":
     asyncio.run(main())
+    # To profile the nodes of the workflow instead:
+    # asyncio.run(profile())
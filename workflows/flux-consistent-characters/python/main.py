@@ -4,7 +4,7 @@ import base64
 import aiofiles
 import httpx
 
-from api import infer
+from viewcomfy import infer_with_logs
 
 
 async def api_examples():
@@ -39,7 +39,7 @@ async def api_examples():
     # the console.log is the function that will be use to log the messages
     # you can use any function that you want
     try:
-        prompt_result = await infer(
+        prompt_result = await infer_with_logs(
             view_comfy_api_url=view_comfy_api_url,
             params=params,
             client_id=client_id,
@@ -55,6 +55,11 @@ async def api_examples():
         return
 
     for file in prompt_result.outputs:
+        if file.is_inline:
+            # Outputs can also come back inlined as base64 instead of as an S3 link
+            file.inline.save(file.filename)
+            print(f"Successfully saved {file.filename}")
+            continue
         try:
             print(f"Downloading file from {file.filepath}")  # noqa: T201
             async with httpx.AsyncClient() as client:
@@ -1,5 +1,5 @@
 import json
-from workflow_api_parameter_creator import workflow_api_parameters_creator
+from viewcomfy import workflow_api_parameters_creator
 import argparse
 
 parser = argparse.ArgumentParser(description="Process workflow API parameters")